@@ -1,6 +1,7 @@
 import { Hono } from 'hono'
 import prisma from '../client/client'
 import { z } from 'zod'
+import { stream } from 'hono/streaming'
 
 
 const userRouter = new Hono()
@@ -33,20 +34,105 @@ const userSchema = z.object({
     ])
 })
 
-userRouter.get('/all', async (c) => {
+// Upper bound on leads accepted by one /bulk request
+const MAX_BULK_LEADS = 500
+
+const userSelect = {
+    id: true,
+    name: true,
+    preferredlanguage: true,
+    interestScore: true,
+    Sentiment: true,
+    phoneNumber: true,
+    callduration: true,
+    car_details: true
+}
+
+type ParsedUser = z.infer<typeof userSchema>
+
+const toUserData = ({ name, preferredlanguage, interestScore, Sentiment, phoneNumber, callduration, car_details }: ParsedUser) => ({
+    name,
+    preferredlanguage,
+    interestScore,
+    Sentiment,
+    phoneNumber,
+    callduration,
+    // Convert car_details to JSON string if it's an object
+    car_details: typeof car_details === 'string' ? car_details : JSON.stringify(car_details)
+})
+
+const DEFAULT_PAGE_SIZE = 100
+const MAX_PAGE_SIZE = 1000
+
+const listQuerySchema = z.object({
+    limit: z.coerce.number().int().min(1).max(MAX_PAGE_SIZE).default(DEFAULT_PAGE_SIZE),
+    cursor: z.string().min(1).optional(),
+    minScore: z.coerce.number().optional(),
+    maxScore: z.coerce.number().optional(),
+    sentiment: z.string().min(1).optional(),
+    language: z.string().min(1).optional(),
+    from: z.coerce.date().optional(),
+    to: z.coerce.date().optional(),
+    format: z.enum(['json', 'ndjson']).default('json')
+})
+
+type ListQuery = z.infer<typeof listQuerySchema>
+
+// Undefined filters are ignored by Prisma
+const listWhere = (query: ListQuery) => ({
+    interestScore: { gte: query.minScore, lte: query.maxScore },
+    Sentiment: query.sentiment,
+    preferredlanguage: query.language,
+    createdAt: { gte: query.from, lt: query.to }
+})
+
+// Keyset page ordered by (createdAt, id); nextCursor is the id of the last user returned
+const findUserPage = async (query: ListQuery, cursor?: string) => {
     const users = await prisma.user.findMany({
-        select: {
-            id: true,
-            name: true,
-            preferredlanguage: true,
-            interestScore: true,
-            Sentiment: true,
-            phoneNumber: true,
-            callduration: true,
-            car_details: true
-        }
+        where: listWhere(query),
+        select: { ...userSelect, createdAt: true },
+        orderBy: [{ createdAt: 'asc' }, { id: 'asc' }],
+        take: query.limit + 1,
+        ...(cursor ? { cursor: { id: cursor }, skip: 1 } : {})
+    })
+    const hasMore = users.length > query.limit
+    const page = hasMore ? users.slice(0, query.limit) : users
+    return { users: page, nextCursor: hasMore ? page[page.length - 1].id : null }
+}
+
+// Lead listing. Without query parameters it keeps its original response: every
+// lead as one JSON array. With any of them (limit, cursor, a filter or format)
+// it returns one keyset page as { users, nextCursor }, and format=ndjson streams
+// every matching lead, one JSON object per line, fetching `limit` rows from the
+// database at a time.
+userRouter.get('/all', async (c) => {
+    const params = c.req.query()
+    if (Object.keys(params).length === 0) {
+        const users = await prisma.user.findMany({ select: userSelect })
+        return c.json(users)
+    }
+
+    const parsed = listQuerySchema.safeParse(params)
+    if (!parsed.success) {
+        return c.json({ error: parsed.error.message }, 400)
+    }
+    const query = parsed.data
+
+    if (query.format === 'json') {
+        return c.json(await findUserPage(query, query.cursor))
+    }
+
+    c.header('Content-Type', 'application/x-ndjson')
+    return stream(c, async (out) => {
+        let cursor: string | null | undefined = query.cursor
+        do {
+            const page = await findUserPage(query, cursor ?? undefined)
+            for (const user of page.users) {
+                await out.write(JSON.stringify(user) + '\n')
+            }
+            cursor = page.nextCursor
+        } while (cursor)
     })
-    return c.json(users)
 })
 
 userRouter.delete('/delete', async (c) => {
@@ -61,32 +147,10 @@ userRouter.post('/create', async (c) => {
         return c.json({ error: parsed.error.message }, 400)
     }
 
-    const { name, preferredlanguage, interestScore, Sentiment, phoneNumber, callduration, car_details } = parsed.data
-    
-    // Convert car_details to JSON string if it's an object
-    const carDetailsString = typeof car_details === 'string' ? car_details : JSON.stringify(car_details)
-
     try {
         const user = await prisma.user.create({
-            data: { 
-                name, 
-                preferredlanguage, 
-                interestScore, 
-                Sentiment, 
-                phoneNumber, 
-                callduration,
-                car_details: carDetailsString
-            },
-            select: {
-                id: true,
-                name: true,
-                preferredlanguage: true,
-                interestScore: true,
-                Sentiment: true,
-                phoneNumber: true,
-                callduration: true,
-                car_details: true
-            }
+            data: toUserData(parsed.data),
+            select: userSelect
         })
         return c.json(user)
     } catch (error) {
@@ -94,5 +158,33 @@ userRouter.post('/create', async (c) => {
     }
 })
 
+// Batched variant of /create: validates every lead with userSchema, inserts the
+// valid ones in a single createMany and reports the outcome per record.
+userRouter.post('/bulk', async (c) => {
+    const body = await c.req.json()
+    if (!Array.isArray(body) || body.length === 0 || body.length > MAX_BULK_LEADS) {
+        return c.json({ error: `Body must be an array of 1-${MAX_BULK_LEADS} users` }, 400)
+    }
+
+    const results: { index: number, status: 'created' | 'invalid', error?: string }[] = []
+    const valid: ReturnType<typeof toUserData>[] = []
+    body.forEach((item, index) => {
+        const parsed = userSchema.safeParse(item)
+        if (parsed.success) {
+            valid.push(toUserData(parsed.data))
+            results.push({ index, status: 'created' })
+        } else {
+            results.push({ index, status: 'invalid', error: parsed.error.message })
+        }
+    })
+
+    try {
+        const { count } = valid.length > 0 ? await prisma.user.createMany({ data: valid }) : { count: 0 }
+        return c.json({ created: count, invalid: body.length - valid.length, results })
+    } catch (error) {
+        return c.json({ error: "Failed to create users" }, 500)
+    }
+})
+
 
 export default userRouter
\ No newline at end of file
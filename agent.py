@@ -1,12 +1,16 @@
 from dotenv import load_dotenv
+# Before the local imports: several of them read their settings from the environment
+load_dotenv()
+
 import json
-import requests
+import resource
+import time
 from typing import Dict, Any
 
 from base_url import base_url
 
 from livekit import agents
-from livekit.agents import AgentSession, Agent, RoomInputOptions, function_tool
+from livekit.agents import AgentSession, Agent, JobProcess, RoomInputOptions, function_tool
 from livekit.plugins import (
     noise_cancellation,
     silero,
@@ -14,155 +18,150 @@ from livekit.plugins import (
     google
     )
 from livekit.plugins.turn_detector.multilingual import MultilingualModel
-import requests
 from datetime import datetime
 
-load_dotenv()
+from lead_submitter import get_lead_submitter, start_lead_drainer
+from premium import get_rating_table, estimate_premium as premium_estimates
+from vehicle_catalog import get_vehicle_catalog
+from prompts import GREETING, build_instructions, next_stage, normalize_language
+from latency_metrics import LatencyMetrics, attach_session_metrics, timed
+from similarity import find_similar, find_with_features, get_similarity_index
+from phrase_audio import ensure_phrase_audio, get_phrase_audio
+from worker_load import TimedTurnDetector, get_load_reporter, worker_options
 
 class VehicleInsuranceAgent(Agent):
     def __init__(self, context_variables: Dict[str, Any]) -> None:
         self.context_variables = context_variables
-        super().__init__(instructions="""
-[Identity]  
-You are Priya, a friendly vehicle insurance specialist from SecureWheels Insurance. You speak both Hindi and English fluently. Your goal is to qualify leads and book appointments through natural conversation.
-
-[Primary Objectives]
-1. Greet warmly and ask language preference
-2. Gather customer information naturally
-3. Share insurance benefits conversationally
-4. Assess genuine interest
-5. Book appointments for qualified leads
-6. Ask for additional questions before ending
-7. End conversation when customer has no more questions
-8. MUST call send_user_details({context_variables}) function with complete context after gathering all information
-
-[Language Rules]  
-- Ask language preference first: Hindi or English
-- Stick to chosen language throughout the call
-- Hindi numbers: एक, दो, तीन, चार, पांच, छह, सात, आठ, नौ, दस
-- English numbers: one, two, three, four, five, six, seven, eight, nine, ten
-- Use natural conversational flow with acknowledgments
-- Never mix languages or say formatting symbols
-
-[Conversation Flow]
-
-1. Opening and Language Choice
-Hindi: "नमस्ते! मैं प्रिया बोल रही हूँ SecureWheels Insurance से। आप हिंदी में बात करना चाहेंगे या English में?"
-English: "Hello! This is Priya from SecureWheels Insurance. Would you prefer Hindi or English?"
-
-2. Permission and Time Check
-Hindi: "क्या आप अभी पांच-सात मिनट बात कर सकते हैं? मैं vehicle insurance के बारे में अच्छी जानकारी देना चाहती हूँ।"
-English: "Do you have about five to seven minutes? I'd like to share some great vehicle insurance options."
-
-3. Information Gathering
-Ask naturally about:
-- Customer name
-- Vehicle ownership (car, bike, commercial)
-- Vehicle details (manufacturer, model, variant, year)
-- Contact number for callback
-
-4. Share Benefits
-Highlight key features:
-- Zero Depreciation coverage
-- 24/7 roadside assistance  
-- Cashless claims at 4000+ garages
-- Potential 15-20% premium reduction
-
-5. Interest Assessment
-Ask about:
-- Current insurance expiry
-- Premium satisfaction
-- Previous claims experience
-
-6. Appointment Booking
-For interested customers, ask preferred time: morning, afternoon, or evening.
-
-7. Final Questions Check
-After completing main conversation flow, ALWAYS ask:
-Hindi: "[नाम] जी, क्या आपका कोई और सवाल है vehicle insurance के बारे में? या कोई specific doubt?"
-English: "[Name], do you have any other questions about vehicle insurance? Any specific concerns?"
-
-8. Conversation Ending
-When customer indicates no more questions or says goodbye:
-Hindi: "धन्यवाद [नाम] जी! बात करके अच्छा लगा। हम जल्दी contact करेंगे। नमस्ते!"
-English: "Thank you [Name]! It was great talking with you. We'll be in touch soon. Have a great day!"
-
-[Context Management - CRITICAL]
-Throughout the conversation, continuously update the user context with the following information:
-- name: Customer's full name (this should be in string)
-- preferredlanguage: "Hindi" or "English" based on customer choice (this should be in string)
-- interestScore: Rate interest level from 1-10 based on customer responses (this should be in float and no string)
-- Sentiment: "Positive", "Neutral", or "Negative" based on customer tone (this should be in string)
-- phoneNumber: Customer's contact number (this should be in string)
-- callduration: Track conversation duration (automatic) (this should be in seconds and no floating value and no string)
-- car_details: JSON string format: "{\"manufacturer\": \"[brand]\", \"model\": \"[model]\", \"variant\": \"[variant]\", \"year\": \"[year]\"}" (this should be in string)
-
-[Function Calling Rules - MANDATORY]
-1. After gathering ALL essential information (name, phone, vehicle details, language preference)
-2. Before asking final questions (step 7)
-3. MUST call send_user_details(context_variables) function with the complete updated context
-4. Only proceed to final questions and conversation ending AFTER successfully calling the function
-5. If context is incomplete, continue gathering missing information before calling function
-
-EXAMPLE of properly formatted context_variables for function call:
-{
-    "name": "Rahul Sharma", (this should be in string)
-    "preferredlanguage": "Hindi", (this should be in string)
-    "interestScore": 8.0, (this should be in float and no string)
-    "Sentiment": "Positive", (this should be in string)
-    "phoneNumber": "9876543210", (this should be in string)
-    "callduration": 300, (this should be in seconds and no floating value and no string)
-    "car_details": "{\"manufacturer\": \"Maruti\", \"model\": \"Swift\", \"variant\": \"VXI\", \"year\": \"2021\"}" (this should be in string)
-}
-
-[Data Collection - Internal Only]
-Silently track during conversation:
-- Name, language preference, phone number
-- Interest level (1-10), sentiment (Positive/Neutral/Negative)
-- Vehicle manufacturer, model, variant, year (format as JSON string for car_details)
-- Call duration (automatic)
-
-[Guidelines]
-- Keep conversation natural and flowing
-- Use acknowledgments: "अच्छा", "समझ गया" / "I see", "understood"
-- Match customer's energy and pace
-- Never mention data collection to customer
-- Focus on lead qualification, not immediate sales
-- ALWAYS ask for additional questions before ending
-- MANDATORY: Call send_user_details(context_variables) function before ending conversation
-""")
-        
+        self.session_metrics = LatencyMetrics()
+        self.stage = "greeting"
+        self.language = None
+        # What the call has established so far ("vehicle_found", ...); moves the stage on
+        self.milestones = set()
+        # Replies given in the current stage; a stage that runs long moves on by itself
+        self.stage_turns = 0
+        self._staged_message_id = None
+        # Identifies the TTS voice the phrase audio file must have been rendered with
+        self.phrase_voice = None
+        super().__init__(instructions=build_instructions(self.stage, self.language))
+
+    async def tts_node(self, text, model_settings):
+        # Fixed script lines are played from the shared phrase audio file instead of the TTS
+        def synthesize(chunks):
+            return Agent.default.tts_node(self, chunks, model_settings)
+
+        tts = self.session.tts
+        phrase_audio = get_phrase_audio(self.phrase_voice, tts.sample_rate, tts.num_channels) \
+            if tts and self.phrase_voice else None
+        source = phrase_audio.speak(text, synthesize) if phrase_audio else synthesize(text)
+        async for frame in source:
+            yield frame
+
+    async def _apply_stage(self, stage: str, language: str = None):
+        self.stage = stage
+        self.language = normalize_language(language) or self.language
+        self.stage_turns = 0
+        await self.update_instructions(build_instructions(self.stage, self.language))
+
+    async def llm_node(self, chat_ctx, tools, model_settings):
+        # Stages advance in code once per user message, so no LLM round trip is spent switching instructions
+        user_message = next((item for item in reversed(chat_ctx.items) if getattr(item, "role", None) == "user"), None)
+        if user_message is not None and user_message.id != self._staged_message_id:
+            self._staged_message_id = user_message.id
+            stage, language = next_stage(self.stage, self.language, user_message.text_content or "",
+                                         self.milestones, self.stage_turns)
+            if (stage, language) != (self.stage, self.language):
+                await self._apply_stage(stage, language)
+                # chat_ctx is this reply's copy of the context, taken before the switch
+                for item in chat_ctx.items:
+                    if item.type == "message" and item.role == "system":
+                        item.content = [self.instructions]
+                        break
+            self.stage_turns += 1
+        async for chunk in Agent.default.llm_node(self, chat_ctx, tools, model_settings):
+            yield chunk
+
     @function_tool
     async def send_user_details(self, context_variables: Dict[str, Any]): 
+        """Send the gathered user details to the backend after collecting all necessary information during the conversation."""
 
         callduration = datetime.now() - self.context_variables["callduration"]
         context_variables["callduration"] = int(callduration.total_seconds())
-        """Send the gathered user details to the backend after collecting all necessary information during the conversation."""
         url = f"{base_url}/api/user/create"
-        headers = {
-            "Content-Type": "application/json",
-        }
-        
-        
-        print(f"[DEBUG] Sending request to: {url}")
+
+        print(f"[DEBUG] Queueing lead for: {url}")
         print(f"[DEBUG] Data: {context_variables}")
-            
-        response = requests.post(url, headers=headers, json=context_variables, timeout=30)
-            
-        print(f"[DEBUG] Response status: {response.status_code}")
-        print(f"[DEBUG] Response text: {response.text}")
-            
-        if response.status_code == 200:
-                result = response.json()
-                print(f"[DEBUG] Success! Response: {result}")
-                return {"status": "success", "data": result, "message": "User details sent successfully"}
-        else:
-                error_msg = f"API returned status {response.status_code}: {response.text}"
-                print(f"[ERROR] {error_msg}")
-                return {"status": "error", "message": error_msg}
+
+        # Delivery (with retries) happens in the background so a slow backend
+        # never blocks this worker's event loop
+        with timed("tool_send_user_details", self.session_metrics):
+            lead_id = await get_lead_submitter().submit(url, context_variables)
+        await self._apply_stage("closing", context_variables.get("preferredlanguage"))
+        return {"status": "success", "lead_id": lead_id, "message": "User details saved and will be sent shortly"}
+
+    async def _resolve_vehicle(self, manufacturer: str, model: str, variant: str = ""):
+        matches = get_vehicle_catalog().lookup(manufacturer, model, variant)
+        if not matches:
+            return {"status": "not_found", "message": f"No catalog entry for {manufacturer} {model} {variant}".strip()}
+        return {"status": "success", "vehicles": matches}
+
+    @function_tool
+    async def lookup_vehicle(self, manufacturer: str, model: str, variant: str = ""):
+        """Look up car specifications (price, fuel, engine, mileage, power, features) from the vehicle catalog. Names may be partial, misspelled or in Hindi."""
+        with timed("tool_lookup_vehicle", self.session_metrics):
+            result = await self._resolve_vehicle(manufacturer, model, variant)
+        self.milestones.add("vehicle_found" if result["status"] == "success" else "vehicle_not_found")
+        return result
+
+    @function_tool
+    async def estimate_premium(self, manufacturer: str, model: str, variant: str = "", year: str = ""):
+        """Estimate IDV and indicative own-damage, third-party and total yearly premium bands (INR) for the customer's car. year is the registration year, e.g. "2021"."""
+        with timed("tool_estimate_premium", self.session_metrics):
+            estimates = premium_estimates(manufacturer, model, variant, year)
+        if not estimates:
+            self.milestones.add("premium_not_found")
+            return {"status": "not_found", "message": f"No catalog entry for {manufacturer} {model} {variant}".strip()}
+        self.milestones.add("premium_quoted")
+        return {"status": "success", "indicative": True, "estimates": estimates}
+
+    @function_tool
+    async def find_similar_vehicles(self, manufacturer: str, model: str, variant: str = "", same_model: bool = False):
+        """Find catalog cars most similar to the customer's (features, body type, fuel, specs) with the features each one adds or lacks. Use same_model=True to compare variants of the same model for variant or upgrade questions."""
+        with timed("tool_find_similar_vehicles", self.session_metrics):
+            result = find_similar(manufacturer, model, variant, same_model=same_model)
+        if result is None:
+            return {"status": "not_found", "message": f"No catalog entry for {manufacturer} {model} {variant}".strip()}
+        return {"status": "success", **result}
+
+    @function_tool
+    async def find_vehicles_with_features(self, features: str, max_price_lakh: float = 0):
+        """Find the cheapest catalog cars that have all of the comma-separated features (e.g. "sunroof, cruise control"), optionally with a showroom price under max_price_lakh lakh rupees."""
+        with timed("tool_find_vehicles_with_features", self.session_metrics):
+            result = find_with_features(features, max_price_lakh * 100_000 if max_price_lakh else None)
+        return {"status": "success" if result["vehicles"] else "not_found", **result}
+
+
+def rss_mb() -> float:
+    """Peak resident memory of this process in MB (ru_maxrss is KB on Linux)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def prewarm(proc: JobProcess):
+    """Load the VAD and turn-detection models, the vehicle catalog and the indexes built on it once per worker process."""
+    start = time.perf_counter()
+    proc.userdata["vad"] = silero.VAD.load()
+    get_load_reporter().watch_vad(proc.userdata["vad"])
+    # Timed so the worker's load reflects how long end-of-turn predictions queue
+    proc.userdata["turn_detection"] = TimedTurnDetector(MultilingualModel())
+    get_vehicle_catalog()
+    get_rating_table()
+    get_similarity_index()
+    load_time = time.perf_counter() - start
+    print(f"[METRICS] prewarm_seconds={load_time:.3f} rss_mb={rss_mb():.1f}")
 
 
 async def entrypoint(ctx: agents.JobContext):
+    setup_start = time.perf_counter()
+
     # Define context variables before creating agent
     context_variables = {
         "name": "",
@@ -174,7 +173,12 @@ async def entrypoint(ctx: agents.JobContext):
         "car_details": "",
     }
     
+    # Replays any leads left in the outbox by a previous run
+    await get_lead_submitter().start()
+
     vehicle_insurance_assistant = VehicleInsuranceAgent(context_variables)
+    tts_options = {"target_language_code": "hi-IN", "speaker": "anushka"}
+    vehicle_insurance_assistant.phrase_voice = "sarvam " + json.dumps(tts_options, sort_keys=True)
 
     session = AgentSession(
         stt=sarvam.STT(
@@ -182,14 +186,14 @@ async def entrypoint(ctx: agents.JobContext):
             model="saarika:v2.5",
         ),
         llm=google.LLM(model="gemini-2.5-flash"),
-        tts=sarvam.TTS(
-            target_language_code="hi-IN",
-            speaker="anushka",
-        ),
-        vad=silero.VAD.load(),
-        turn_detection=MultilingualModel(),
+        tts=sarvam.TTS(**tts_options),
+        vad=ctx.proc.userdata["vad"],
+        turn_detection=ctx.proc.userdata["turn_detection"],
     )
 
+    attach_session_metrics(session, vehicle_insurance_assistant.session_metrics)
+    get_load_reporter().attach(session)
+
     await session.start(
         room=ctx.room, # livekit room address for communication
         agent=vehicle_insurance_assistant, 
@@ -201,17 +205,40 @@ async def entrypoint(ctx: agents.JobContext):
 
     context_variables["callduration"] = datetime.now()
 
+    # First call on a host renders the script lines once; later calls and other workers map the file
+    tts = session.tts
+    ensure_phrase_audio(tts, vehicle_insurance_assistant.phrase_voice)
+
+    async def log_session_metrics():
+        phrase_audio = get_phrase_audio(vehicle_insurance_assistant.phrase_voice, tts.sample_rate, tts.num_channels)
+        if phrase_audio:
+            print(f"[METRICS] phrase_audio {json.dumps(phrase_audio.stats())}")
+        print(f"[METRICS] session {ctx.room.name} latency:\n{vehicle_insurance_assistant.session_metrics.summary()}")
+        print(f"[METRICS] load {json.dumps(get_load_reporter().last_report)}")
+        # The worker process merges every call's samples and exports them (see worker_load.py)
+        get_load_reporter().report_latency(vehicle_insurance_assistant.session_metrics)
+
+    ctx.add_shutdown_callback(log_session_metrics)
+    async def flush_leads():
+        # This process exits with the call; deliver its lead first (it stays in the outbox if that times out)
+        await get_lead_submitter().flush()
+
+    ctx.add_shutdown_callback(flush_leads)
+
     await ctx.connect() # connect to livekit room for communication
 
-    await session.generate_reply(
-        instructions="""
-        नमस्ते! मैं प्रिया बोल रही हूँ SecureWheels Insurance से।
-        आप हिंदी में बात करना चाहेंगे या English में?
-        मैं आपको vehicle insurance के बारे में कुछ बहुत अच्छी जानकारी देना चाहती हूँ।
-        """
-    )
+    # Time from job assignment until the greeting is handed to the pipeline
+    setup_time = time.perf_counter() - setup_start
+    vehicle_insurance_assistant.session_metrics.observe("job_setup", setup_time)
+    print(f"[METRICS] job_setup_seconds={setup_time:.3f} rss_mb={rss_mb():.1f} room={ctx.room.name}")
+
+    # Fixed greeting: spoken without an LLM turn, and from cached audio once it has been rendered
+    await session.say(GREETING)
 
 
 
 if __name__ == "__main__":
-    agents.cli.run_app(agents.WorkerOptions(entrypoint_fnc=entrypoint))
\ No newline at end of file
+    # With LEAD_BATCH_SIZE above 1 this worker process posts every call's lead to /bulk (see lead_submitter.py)
+    start_lead_drainer()
+    # Refuse new calls before the sessions already running start to degrade (see worker_load.py)
+    agents.cli.run_app(agents.WorkerOptions(entrypoint_fnc=entrypoint, prewarm_fnc=prewarm, **worker_options()))
\ No newline at end of file
@@ -0,0 +1,297 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import time
+from datetime import datetime
+
+import pandas as pd
+
+from catalog_snapshot import build_from_csv, snapshot_path_for
+from models import CSV_COLUMNS
+from scrapper import (
+    app,
+    BRAND_URLS,
+    EXTRACTION_PROMPT,
+    EXTRACTION_SCHEMA,
+    SCRAPE_CONCURRENCY,
+    SCRAPE_REQUESTS_PER_MINUTE,
+    TokenBucket,
+    extract_cars,
+)
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+CANONICAL_DATASET = os.path.join(DATA_DIR, "car_dataset_combined.csv")
+CHECKPOINT_PATH = os.path.join(DATA_DIR, "refresh_checkpoint.json")
+
+KEY_COLUMNS = ["manufacturer", "model_name", "variant_name"]
+COLUMN_ORDER = CSV_COLUMNS
+
+
+def content_hash(value) -> str:
+    if not isinstance(value, (str, bytes)):
+        value = json.dumps(value, sort_keys=True, ensure_ascii=False, default=str)
+    if isinstance(value, str):
+        value = value.encode("utf-8")
+    return hashlib.sha256(value).hexdigest()
+
+
+def _atomic_write(path: str, write):
+    tmp = f"{path}.tmp"
+    write(tmp)
+    os.replace(tmp, path)
+
+
+def load_checkpoint(path: str = CHECKPOINT_PATH) -> dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_checkpoint(checkpoint: dict, path: str = CHECKPOINT_PATH):
+    def write(tmp):
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(checkpoint, f, indent=2, ensure_ascii=False)
+    _atomic_write(path, write)
+
+
+def _key_frame(df: pd.DataFrame) -> pd.DataFrame:
+    return df[KEY_COLUMNS].astype(str).apply(lambda col: col.str.strip().str.lower())
+
+
+def load_dataset(path: str = CANONICAL_DATASET) -> pd.DataFrame:
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=COLUMN_ORDER)
+    df = pd.read_csv(path, dtype=str, keep_default_na=False)
+    return df.loc[:, ~df.columns.str.startswith("Unnamed")]
+
+
+def _cars_frame(cars) -> pd.DataFrame:
+    rows = []
+    for car in cars:
+        row = car.__dict__.copy()
+        if isinstance(row.get('features'), list):
+            row['features'] = ', '.join(row['features'])
+        rows.append({k: str(v) for k, v in row.items()})
+    return pd.DataFrame(rows, columns=COLUMN_ORDER)
+
+
+def page_keys(cars) -> list:
+    """Normalized (manufacturer, model_name, variant_name) keys of one page's cars, for the checkpoint."""
+    keys = _key_frame(_cars_frame(cars))
+    keys = keys[keys["variant_name"] != ""]
+    return sorted(set(keys.itertuples(index=False, name=None)))
+
+
+def remove_page_rows(dataset: pd.DataFrame, previous_keys, cars) -> pd.DataFrame:
+    """Drop the rows a page contributed last time, so variants it no longer lists leave the dataset.
+
+    `previous_keys` comes from the page's checkpoint entry; entries written
+    before keys were recorded fall back to every row of the manufacturers on
+    the page (each brand page lists all of its manufacturer's current cars).
+    """
+    keys = _key_frame(dataset)
+    if previous_keys is None:
+        stale = keys["manufacturer"].isin(set(_key_frame(_cars_frame(cars))["manufacturer"]))
+    else:
+        stale = pd.Series(list(keys.itertuples(index=False, name=None)), index=keys.index, dtype=object) \
+            .isin({tuple(k) for k in previous_keys})
+    return dataset[~stale]
+
+
+def upsert_cars(dataset: pd.DataFrame, cars) -> pd.DataFrame:
+    """Insert or replace `cars` in `dataset`, keyed on (manufacturer, model_name, variant_name)."""
+    new = _cars_frame(cars)
+    if new.empty:
+        return dataset
+
+    merged = pd.concat([dataset, new], ignore_index=True)
+    # Same cleaning the data notebook did by hand
+    merged = merged[merged["variant_name"].astype(str).str.strip() != ""]
+    keys = _key_frame(merged)
+    merged = merged[~keys.duplicated(keep="last")]
+    merged = merged.sort_values(KEY_COLUMNS, kind="stable").reset_index(drop=True)
+    return merged[[c for c in COLUMN_ORDER if c in merged.columns]]
+
+
+def save_dataset(df: pd.DataFrame, path: str = CANONICAL_DATASET):
+    _atomic_write(path, lambda tmp: df.to_csv(tmp, index=False, encoding="utf-8"))
+
+
+async def fetch_source(url: str) -> str:
+    """Cheap change probe: page markdown only, no LLM extraction."""
+    response = await app.scrape_url(url, formats=['markdown'])
+    return response.markdown or ""
+
+
+async def refresh_catalog(urls=BRAND_URLS, fetch_source=fetch_source, extract=None,
+                          dataset_path: str = CANONICAL_DATASET, checkpoint_path: str = CHECKPOINT_PATH,
+                          concurrency: int = SCRAPE_CONCURRENCY,
+                          requests_per_minute: float = SCRAPE_REQUESTS_PER_MINUTE,
+                          max_age_days: float = None, force: bool = False):
+    """Re-extract only the brands whose page changed and replace their rows in the canonical dataset.
+
+    The dataset and the checkpoint are rewritten after every brand, so a
+    crashed run resumes by skipping brands it already finished. `fetch_source`
+    and `extract` can be swapped for offline stand-ins.
+    """
+    limiter = TokenBucket(rate=requests_per_minute / 60, capacity=concurrency)
+    if extract is None:
+        async def extract(url):
+            return await extract_cars(url, EXTRACTION_SCHEMA, EXTRACTION_PROMPT, limiter=limiter)
+
+    checkpoint = load_checkpoint(checkpoint_path)
+    dataset = load_dataset(dataset_path)
+    semaphore = asyncio.Semaphore(concurrency)
+    write_lock = asyncio.Lock()
+    summary = {"skipped": [], "refreshed": [], "failed": []}
+
+    async def refresh_one(url):
+        nonlocal dataset
+        async with semaphore:
+            try:
+                await limiter.acquire()
+                source_hash = content_hash(await fetch_source(url))
+            except Exception as e:
+                print(f"❌ Could not fetch {url}: {e}")
+                summary["failed"].append(url)
+                return
+
+            entry = checkpoint.get(url, {})
+            age_days = (time.time() - entry.get("updated_at", 0)) / 86400
+            unchanged = entry.get("source_hash") == source_hash
+            if unchanged and not force and (max_age_days is None or age_days < max_age_days):
+                print(f"⏭️ Unchanged, skipping {url}")
+                summary["skipped"].append(url)
+                return
+
+            cars = await extract(url)
+            if not cars:
+                # Keep the previous checkpoint so the brand is retried next run
+                summary["failed"].append(url)
+                return
+
+            async with write_lock:
+                # A changed page replaces everything it listed before, so discontinued variants go too
+                dataset = upsert_cars(remove_page_rows(dataset, entry.get("keys"), cars), cars)
+                save_dataset(dataset, dataset_path)
+                checkpoint[url] = {
+                    "source_hash": source_hash,
+                    "extraction_hash": content_hash([car.__dict__ for car in cars]),
+                    "rows": len(cars),
+                    "keys": page_keys(cars),
+                    "updated_at": time.time(),
+                    "updated": datetime.now().isoformat(timespec="seconds"),
+                }
+                save_checkpoint(checkpoint, checkpoint_path)
+            summary["refreshed"].append(url)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(refresh_one(url) for url in urls))
+    if summary["refreshed"]:
+        # Workers map the snapshot at startup; recompile it so they pick up the new rows
+        build_from_csv(dataset_path, snapshot_path_for(dataset_path))
+    print(f"\n🎉 Refresh done in {time.perf_counter() - started:.1f}s: "
+          f"{len(summary['refreshed'])} refreshed, {len(summary['skipped'])} unchanged, "
+          f"{len(summary['failed'])} failed; dataset has {len(dataset)} variants")
+    return dataset, summary
+
+
+async def _demo():
+    """Offline run with a stubbed source and extractor: skip, resume and upsert checks."""
+    import tempfile
+    from models import Car
+
+    def car(brand, model, variant, price):
+        return Car(manufacturer=brand, model_name=model, manufacturing_year="2025", variant_name=variant,
+                   showroom_price=price, fuel_type="Petrol", engine_capacity_cc="1199", body_type="SUV",
+                   seating_capacity="5", torque_nm="170 Nm", mileage_kmpl="17 kmpl", power_bhp="118 bhp",
+                   transmission="Manual", safety_rating="5 Star", features=["ABS"])
+
+    urls = [f"https://example.test/{brand}" for brand in ("tata", "kia", "honda")]
+    pages = {url: f"{url} v1" for url in urls}
+    extractions = {
+        urls[0]: [car("Tata", "Nexon", "XZ", "₹10 Lakh"), car("Tata", "Punch", "Pure", "₹6 Lakh")],
+        urls[1]: [car("Kia", "Seltos", "HTE", "₹11 Lakh")],
+        urls[2]: [car("Honda", "City", "SV", "₹12 Lakh")],
+    }
+    extracted = []
+    crash_on = {urls[2]}
+
+    async def stub_fetch(url):
+        return pages[url]
+
+    async def stub_extract(url):
+        extracted.append(url)
+        if url in crash_on:
+            raise RuntimeError("worker killed mid-run")
+        return extractions[url]
+
+    workdir = tempfile.mkdtemp()
+    paths = {"dataset_path": os.path.join(workdir, "cars.csv"),
+             "checkpoint_path": os.path.join(workdir, "checkpoint.json")}
+
+    async def run():
+        extracted.clear()
+        # One brand at a time, so the crash happens after the first two brands are saved
+        return await refresh_catalog(urls, fetch_source=stub_fetch, extract=stub_extract, concurrency=1,
+                                     requests_per_minute=6000, **paths)
+
+    # 1. Crash on the third brand: the first two are already in the dataset and the checkpoint
+    try:
+        await run()
+        raise AssertionError("the stubbed crash did not happen")
+    except RuntimeError:
+        pass
+    assert len(load_dataset(paths["dataset_path"])) == 3
+    assert set(load_checkpoint(paths["checkpoint_path"])) == set(urls[:2])
+    print("✅ crash after 2 of 3 brands: both saved to the dataset and the checkpoint")
+
+    # 2. Resume: unchanged pages are skipped, only the unfinished brand is extracted
+    crash_on.clear()
+    dataset, summary = await run()
+    assert extracted == [urls[2]] and summary["skipped"] == urls[:2], (extracted, summary)
+    assert len(dataset) == 4
+    print(f"✅ resume: extracted only {extracted}, skipped {len(summary['skipped'])} unchanged pages")
+
+    # 3. A changed page replaces its rows by key instead of appending (including a repeat in one extraction),
+    # and the Punch it no longer lists is removed
+    pages[urls[0]] = f"{urls[0]} v2"
+    extractions[urls[0]] = [car("Tata", "Nexon", "XZ", "₹9 Lakh"), car("tata", "nexon ", "xz", "₹10.5 Lakh"),
+                            car("Tata", "Nexon", "XZ+", "₹11 Lakh"), car("Tata", "Harrier", "", "₹15 Lakh")]
+    dataset, summary = await run()
+    assert extracted == [urls[0]] and summary["refreshed"] == [urls[0]], (extracted, summary)
+    nexon = dataset[(dataset["model_name"].str.strip().str.lower() == "nexon")]
+    assert len(dataset) == 4 and len(nexon) == 2, dataset
+    assert nexon.set_index("variant_name")["showroom_price"].to_dict() == {"xz": "₹10.5 Lakh", "XZ+": "₹11 Lakh"}
+    assert (dataset["variant_name"] != "").all()
+    assert "Punch" not in set(dataset["model_name"]) and {"Seltos", "City"} <= set(dataset["model_name"])
+    print(f"✅ changed page: upserted by key, discontinued variants removed, {len(dataset)} unique variants")
+
+    # 4. A checkpoint entry from before keys were recorded falls back to the page's manufacturers
+    checkpoint = load_checkpoint(paths["checkpoint_path"])
+    del checkpoint[urls[1]]["keys"]
+    save_checkpoint(checkpoint, paths["checkpoint_path"])
+    pages[urls[1]] = f"{urls[1]} v2"
+    extractions[urls[1]] = [car("Kia", "Sonet", "HTK", "₹8 Lakh")]
+    dataset, summary = await run()
+    assert summary["refreshed"] == [urls[1]], summary
+    assert set(dataset["model_name"].str.strip().str.lower()) == {"nexon", "city", "sonet"}, dataset
+    assert "keys" in load_checkpoint(paths["checkpoint_path"])[urls[1]]
+    print("✅ checkpoint without keys: the manufacturer's old rows were replaced")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Incrementally refresh the canonical car dataset")
+    parser.add_argument("--force", action="store_true", help="re-extract every brand")
+    parser.add_argument("--max-age-days", type=float, default=None,
+                        help="re-extract brands older than this even if unchanged")
+    parser.add_argument("--demo", action="store_true",
+                        help="offline check with a stubbed source and extractor (writes to a temp dir)")
+    args = parser.parse_args()
+    if args.demo:
+        asyncio.run(_demo())
+    else:
+        asyncio.run(refresh_catalog(force=args.force, max_age_days=args.max_age_days))
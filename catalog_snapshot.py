@@ -0,0 +1,335 @@
+"""Versioned binary snapshot of the car catalog, opened with mmap.
+
+Compiled from car_dataset_combined.csv by `python catalog_snapshot.py build`
+(and after every catalog refresh). Every worker maps the same file
+read-only, so its pages are shared between processes instead of each one
+re-parsing the CSV into its own objects. A VehicleCatalog built from a
+snapshot keeps its columns as CodedColumns over the map; what each process
+still owns is its lookup indexes and the strings it has decoded.
+
+Layout: MAGIC, a little-endian u32 header length, a JSON header, then
+8-byte aligned sections described by the header ([offset, dtype, shape]):
+
+  string_offsets / string_data  interned UTF-8 string pool and its offset table
+  col_<name>                    u32 string ids per row for every catalog column
+  key_<name>                    u32 string ids of the precomputed name_key()s
+  feature_names                 u32 string id of every distinct feature
+  feature_offsets / feature_ids each row's features in order (offset table)
+  feature_bitmap                u64 words per row, bit i set when the row has feature i
+"""
+import csv
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+from vehicle_catalog import CATALOG_PATH, COLUMNS, name_key
+
+MAGIC = b"VCSNAP01"
+# 2: name keys from the phrase-level alias matching in normalize_name
+FORMAT_VERSION = 2
+KEY_COLUMNS = ["manufacturer", "model_name", "variant_name"]
+
+
+def snapshot_path_for(csv_path: str) -> str:
+    return os.path.splitext(csv_path)[0] + ".snapshot"
+
+
+def snapshot_path() -> str:
+    """VEHICLE_SNAPSHOT_PATH, read when used so a .env loaded after import applies."""
+    return os.getenv("VEHICLE_SNAPSHOT_PATH") or snapshot_path_for(CATALOG_PATH)
+
+
+def source_hash(path: str) -> str:
+    """Content hash of the CSV a snapshot was compiled from."""
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()[:16]
+
+
+def split_features(value: str) -> List[str]:
+    return [f.strip() for f in (value or "").split(",") if f.strip()]
+
+
+def feature_bitmap(offsets: np.ndarray, ids: np.ndarray, feature_count: int) -> np.ndarray:
+    """Rows x u64 words bitmap from each row's feature ids (row r owns ids[offsets[r]:offsets[r + 1]])."""
+    count = len(offsets) - 1
+    bitmap = np.zeros((count, max(1, (feature_count + 63) // 64)), dtype=np.uint64)
+    row_of = np.repeat(np.arange(count), np.diff(offsets).astype(np.int64))
+    np.bitwise_or.at(bitmap, (row_of, ids // 64), np.left_shift(np.uint64(1), (ids % 64).astype(np.uint64)))
+    return bitmap
+
+
+class _StringPool:
+    def __init__(self):
+        self.ids: Dict[str, int] = {}
+
+    def intern(self, value: str) -> int:
+        string_id = self.ids.get(value)
+        if string_id is None:
+            string_id = self.ids[value] = len(self.ids)
+        return string_id
+
+
+def build_snapshot(rows: Iterable[Dict[str, Any]], path: str, source: str = "") -> Dict[str, Any]:
+    """Compile catalog rows (dicts with the COLUMNS keys) into a snapshot file; returns its header."""
+    pool = _StringPool()
+    columns = {name: [] for name in COLUMNS}
+    keys = {name: [] for name in KEY_COLUMNS}
+    key_ids: Dict[str, int] = {}
+    feature_index: Dict[str, int] = {}
+    feature_offsets, feature_ids = [0], []
+
+    for row in rows:
+        for name in COLUMNS:
+            value = row.get(name, "")
+            if isinstance(value, list):
+                value = ", ".join(value)
+            columns[name].append(pool.intern("" if value is None else str(value)))
+        for name in KEY_COLUMNS:
+            value = row.get(name, "") or ""
+            # name_key() is the expensive part of building the catalog indexes; do it once per distinct name
+            if value not in key_ids:
+                key_ids[value] = pool.intern(name_key(value))
+            keys[name].append(key_ids[value])
+        for feature in split_features(row.get("features", "")):
+            feature_ids.append(feature_index.setdefault(feature, len(feature_index)))
+        feature_offsets.append(len(feature_ids))
+
+    count = len(feature_offsets) - 1
+    offsets = np.asarray(feature_offsets, dtype=np.uint32)
+    ids = np.asarray(feature_ids, dtype=np.uint32)
+    bitmap = feature_bitmap(offsets, ids, len(feature_index))
+
+    feature_names = [pool.intern(f) for f in feature_index]
+    strings = [s.encode("utf-8") for s in pool.ids]
+    string_offsets = np.zeros(len(strings) + 1, dtype=np.uint32)
+    np.cumsum([len(s) for s in strings], out=string_offsets[1:])
+
+    sections = {
+        "string_offsets": string_offsets,
+        "string_data": np.frombuffer(b"".join(strings), dtype=np.uint8),
+        **{f"col_{name}": np.asarray(values, dtype=np.uint32) for name, values in columns.items()},
+        **{f"key_{name}": np.asarray(values, dtype=np.uint32) for name, values in keys.items()},
+        "feature_names": np.asarray(feature_names, dtype=np.uint32),
+        "feature_offsets": offsets,
+        "feature_ids": ids,
+        "feature_bitmap": bitmap,
+    }
+
+    header = {
+        "format": FORMAT_VERSION,
+        "source_hash": source,
+        "rows": count,
+        "features": len(feature_index),
+        "sections": {},
+    }
+    # Section offsets depend on the header length, which depends on the offsets; repeat until it settles
+    header_bytes = b""
+    while True:
+        offset = len(MAGIC) + 4 + len(header_bytes)
+        for name, array in sections.items():
+            offset += -offset % 8
+            header["sections"][name] = [offset, array.dtype.str, list(array.shape)]
+            offset += array.nbytes
+        encoded = json.dumps(header).encode()
+        if len(encoded) == len(header_bytes):
+            header_bytes = encoded
+            break
+        header_bytes = encoded
+
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(MAGIC + struct.pack("<I", len(header_bytes)) + header_bytes)
+        for name, array in sections.items():
+            f.write(b"\0" * (header["sections"][name][0] - f.tell()))
+            f.write(array.tobytes())
+    os.replace(tmp, path)
+    return header
+
+
+def build_from_csv(csv_path: str = CATALOG_PATH, path: Optional[str] = None) -> Dict[str, Any]:
+    path = path or snapshot_path()
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        return build_snapshot(csv.DictReader(f), path, source=source_hash(csv_path))
+
+
+class CodedColumn(Sequence):
+    """Read-only column of u32 string ids over the map; a value is decoded from the pool when it is read."""
+
+    def __init__(self, snapshot: "CatalogSnapshot", codes: np.ndarray):
+        self.snapshot = snapshot
+        self.codes = codes
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def __getitem__(self, row_id):
+        if isinstance(row_id, slice):
+            return [self[r] for r in range(*row_id.indices(len(self)))]
+        return self.snapshot.string(int(self.codes[row_id]))
+
+    def __iter__(self) -> Iterator[str]:
+        # A full scan decodes each distinct string once
+        decoded: Dict[int, str] = {}
+        for code in self.codes.tolist():
+            value = decoded.get(code)
+            if value is None:
+                value = decoded[code] = self.snapshot.string(code)
+            yield value
+
+    def __array__(self, dtype=None, copy=None) -> np.ndarray:
+        return np.array(list(self), dtype=object)
+
+
+class CatalogSnapshot:
+    """Zero-copy, read-only view of a snapshot file.
+
+    Sections are NumPy arrays over the shared map; strings are decoded from
+    the pool only when asked for.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        path = self.path = path or snapshot_path()
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a catalog snapshot")
+        (header_len,) = struct.unpack_from("<I", self._mmap, len(MAGIC))
+        start = len(MAGIC) + 4
+        self.header = json.loads(self._mmap[start:start + header_len])
+        if self.header["format"] != FORMAT_VERSION:
+            raise ValueError(f"{path} has snapshot format {self.header['format']}, expected {FORMAT_VERSION}")
+        self.size = self.header["rows"]
+        self.sections = {
+            name: np.frombuffer(self._mmap, dtype=np.dtype(dtype), count=int(np.prod(shape)),
+                                offset=offset).reshape(shape)
+            for name, (offset, dtype, shape) in self.header["sections"].items()
+        }
+        self._strings: Optional[List[str]] = None
+
+    @property
+    def strings(self) -> List[str]:
+        if self._strings is None:
+            offsets = self.sections["string_offsets"].tolist()
+            data = self.sections["string_data"].tobytes()
+            self._strings = [data[offsets[i]:offsets[i + 1]].decode("utf-8") for i in range(len(offsets) - 1)]
+        return self._strings
+
+    def string(self, string_id: int) -> str:
+        """One string decoded straight from the pool."""
+        offsets = self.sections["string_offsets"]
+        return self.sections["string_data"][offsets[string_id]:offsets[string_id + 1]].tobytes().decode("utf-8")
+
+    def codes(self, name: str) -> np.ndarray:
+        """Dictionary codes (string ids) of a catalog column, one per row."""
+        return self.sections[f"col_{name}"]
+
+    def column(self, name: str) -> CodedColumn:
+        return CodedColumn(self, self.codes(name))
+
+    def keys(self, name: str) -> CodedColumn:
+        """The precomputed name_key() of every row's `name` column."""
+        return CodedColumn(self, self.sections[f"key_{name}"])
+
+    @property
+    def feature_names(self) -> List[str]:
+        strings = self.strings
+        return [strings[i] for i in self.sections["feature_names"].tolist()]
+
+    @property
+    def feature_bitmap(self) -> np.ndarray:
+        return self.sections["feature_bitmap"]
+
+    def features(self, row_id: int) -> List[str]:
+        offsets, names = self.sections["feature_offsets"], self.feature_names
+        return [names[i] for i in self.sections["feature_ids"][offsets[row_id]:offsets[row_id + 1]].tolist()]
+
+    def to_dataframe(self):
+        """pandas DataFrame with categorical columns built straight from the dictionary codes."""
+        import pandas as pd
+
+        categories = pd.Index(self.strings)
+        frame = {name: pd.Categorical.from_codes(self.codes(name).astype(np.int64), categories=categories)
+                 for name in COLUMNS if name != "features"}
+        frame["features"] = [self.features(r) for r in range(self.size)]
+        return pd.DataFrame(frame)
+
+    def close(self):
+        self.sections.clear()
+        self._mmap.close()
+
+
+def open_snapshot(path: Optional[str] = None, csv_path: Optional[str] = CATALOG_PATH) -> Optional[CatalogSnapshot]:
+    """The snapshot at `path` if it exists and was compiled from the current `csv_path`, else None."""
+    path = path or snapshot_path()
+    if not os.path.exists(path):
+        return None
+    try:
+        snapshot = CatalogSnapshot(path)
+    except (OSError, ValueError) as e:
+        print(f"[ERROR] Could not open catalog snapshot {path}: {e}")
+        return None
+    if csv_path and os.path.exists(csv_path) and snapshot.header["source_hash"] != source_hash(csv_path):
+        print(f"[DEBUG] Catalog snapshot {path} is stale, falling back to {csv_path}")
+        return None
+    return snapshot
+
+
+def _benchmark(csv_path: str, path: str, label: str):
+    import pandas as pd
+    from vehicle_catalog import VehicleCatalog
+
+    start = time.perf_counter()
+    header = build_from_csv(csv_path, path)
+    build = time.perf_counter() - start
+
+    start = time.perf_counter()
+    df = pd.read_csv(csv_path)
+    df["features"] = df["features"].fillna("").map(split_features)
+    pandas_load = time.perf_counter() - start
+
+    start = time.perf_counter()
+    VehicleCatalog.load(csv_path)
+    catalog_csv = time.perf_counter() - start
+
+    start = time.perf_counter()
+    snapshot = CatalogSnapshot(path)
+    mapped = time.perf_counter() - start
+    VehicleCatalog.from_snapshot(snapshot)
+    catalog_snapshot = time.perf_counter() - start
+    snapshot.to_dataframe()
+    frame_snapshot = time.perf_counter() - start - catalog_snapshot + mapped
+
+    print(f"📊 {label}: {header['rows']} rows, {header['features']} features, "
+          f"{os.path.getsize(csv_path) / 2**20:.1f} MB CSV -> {os.path.getsize(path) / 2**20:.1f} MB snapshot "
+          f"(built in {build:.2f}s)")
+    print(f"  pandas read_csv + split features  {pandas_load * 1000:9.1f}ms")
+    print(f"  snapshot -> DataFrame             {frame_snapshot * 1000:9.1f}ms")
+    print(f"  VehicleCatalog from CSV           {catalog_csv * 1000:9.1f}ms")
+    print(f"  VehicleCatalog from snapshot      {catalog_snapshot * 1000:9.1f}ms (mmap open {mapped * 1000:.2f}ms)")
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["build"]:
+        header = build_from_csv()
+        print(f"✅ Wrote {snapshot_path()}: {header['rows']} rows, {header['features']} features")
+        sys.exit(0)
+
+    import tempfile
+    from vehicle_catalog import _synthetic_rows
+
+    workdir = tempfile.mkdtemp()
+    _benchmark(CATALOG_PATH, os.path.join(workdir, "catalog.snapshot"), "catalog")
+
+    synthetic_csv = os.path.join(workdir, "synthetic.csv")
+    with open(synthetic_csv, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=COLUMNS)
+        writer.writeheader()
+        writer.writerows(_synthetic_rows(100_000))
+    _benchmark(synthetic_csv, os.path.join(workdir, "synthetic.snapshot"), "synthetic")
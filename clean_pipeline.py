@@ -0,0 +1,387 @@
+"""Streaming clean-up of raw Firecrawl extraction results into a deduplicated car table.
+
+Raw JSON batches (one brand page each, {"variants": [...]}) are validated
+against models.Car in bulk, normalized, and deduplicated across brands and
+runs. Variants count as the same when manufacturer, model and variant names
+agree after name_key() normalization, or nearly agree ("Fortuner" /
+"Fortunner"; model names only, since trims like "Smart MT" and
+"Smart AT" differ by one letter, and only for edits inside the name, since
+"Scorpio N" is not "Scorpio"). The newest record for a variant wins. Every
+accepted batch is appended to a journal with the file or URL it came from,
+so a crashed or repeated ingest skips the archive files it already has, and
+the CSV is rewritten atomically every few batches.
+
+    python clean_pipeline.py ingest data/raw/*.json --out data/car_dataset_clean.csv --workers 4
+    python clean_pipeline.py bench
+"""
+import argparse
+import csv
+import difflib
+import glob
+import json
+import os
+import re
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+from pydantic import TypeAdapter, ValidationError
+
+from models import CSV_COLUMNS, Car
+from vehicle_catalog import name_key
+
+RAW_ARCHIVE_DIR = os.getenv("RAW_ARCHIVE_DIR", "")
+# difflib ratio above which two model keys of the same manufacturer are merged
+FUZZY_CUTOFF = 0.88
+# Shorter keys are trim codes ("lxi", "vxi", "zx") where one letter is a different car
+MIN_FUZZY_LENGTH = 5
+FLUSH_EVERY = 50
+
+_cars = TypeAdapter(List[Car])
+_STRING_FIELDS = [name for name in Car.model_fields if name != "features"]
+
+Row = Dict[str, str]
+
+
+def raw_items(raw: Any) -> List[Any]:
+    """The variant records in one extraction result ({"variants": [...]}, a list, or one record)."""
+    if isinstance(raw, dict):
+        return raw.get("variants", []) if "variants" in raw else [raw]
+    return list(raw or [])
+
+
+def _coerce(obj: Dict[str, Any]) -> Dict[str, Any]:
+    # The schema asks for integers for cc and seats; Car stores everything as text
+    record = {}
+    for name in _STRING_FIELDS:
+        value = obj.get(name)
+        record[name] = "" if value is None else " ".join(str(value).split())
+    record["manufacturing_year"] = record["manufacturing_year"] or "2025"
+    features = obj.get("features") or []
+    if isinstance(features, str):
+        features = features.split(",")
+    record["features"] = [f.strip() for f in features if isinstance(f, str) and f.strip()]
+    return record
+
+
+def validate_records(items: Iterable[Any]) -> Tuple[List[Car], int]:
+    """Validate a whole batch with one pydantic call; returns (cars, number of records rejected)."""
+    items = list(items)
+    records = [_coerce(obj) for obj in items if isinstance(obj, dict)]
+    rejected = len(items) - len(records)
+    while records:
+        try:
+            return _cars.validate_python(records), rejected
+        except ValidationError as e:
+            # Drop every record with an error and validate the rest again
+            bad = {error["loc"][0] for error in e.errors() if error["loc"]}
+            rejected += len(bad)
+            records = [r for i, r in enumerate(records) if i not in bad]
+    return [], rejected
+
+
+def _variant_key(value: str) -> str:
+    # "Alpha+" and "Alpha" are different trims; name_key alone would drop the "+"
+    return name_key(value.replace("+", " plus "))
+
+
+def clean_rows(raw: Any) -> Tuple[List[Row], Dict[str, int]]:
+    """Validate and normalize one raw extraction result into CSV rows plus their name keys.
+
+    Pure function of its input, so it can run in a worker process.
+    """
+    cars, rejected = validate_records(raw_items(raw))
+    rows, empty = [], 0
+    # Pages repeat the same few names hundreds of times; normalize each once
+    keys: Dict[str, str] = {}
+    variant_keys: Dict[str, str] = {}
+    for car in cars:
+        row = car.model_dump()
+        if not row["variant_name"]:
+            # Same rule as the data notebook's dropna(subset=['variant_name'])
+            empty += 1
+            continue
+        # "Tata Nexon" from one page and "Nexon" from another are the same model
+        if row["model_name"].lower().startswith(row["manufacturer"].lower() + " "):
+            row["model_name"] = row["model_name"][len(row["manufacturer"]) + 1:]
+        row["features"] = ", ".join(dict.fromkeys(row["features"]))
+        manufacturer, model, variant = row["manufacturer"], row["model_name"], row["variant_name"]
+        if manufacturer not in keys:
+            keys[manufacturer] = name_key(manufacturer)
+        if model not in keys:
+            keys[model] = name_key(model)
+        if variant not in variant_keys:
+            variant_keys[variant] = _variant_key(variant)
+        row["_keys"] = (keys[manufacturer], keys[model], variant_keys[variant])
+        rows.append(row)
+    return rows, {"records": len(cars) + rejected, "invalid": rejected, "empty_variant": empty}
+
+
+def _clean_file(path: str) -> Tuple[str, List[Row], Dict[str, int]]:
+    with open(path, encoding="utf-8") as f:
+        rows, stats = clean_rows(json.load(f))
+    return path, rows, stats
+
+
+def _inner_edit(a: str, b: str) -> bool:
+    """True when a and b agree at both ends, so they differ by a typo and not an extra word or trim letter."""
+    ops = difflib.SequenceMatcher(None, a, b, autojunk=False).get_opcodes()
+    return ops[0][0] == "equal" and ops[-1][0] == "equal"
+
+
+class _FuzzyKeys:
+    """Maps a name key to the first near-identical key seen under the same parent."""
+
+    def __init__(self, cutoff: float = FUZZY_CUTOFF):
+        self.cutoff = cutoff
+        self.aliases: Dict[Any, Dict[str, str]] = {}
+        self.merged = 0
+
+    def canonical(self, parent: Any, key: str) -> str:
+        aliases = self.aliases.setdefault(parent, {})
+        if key in aliases:
+            return aliases[key]
+        canonical = key
+        if len(key) >= MIN_FUZZY_LENGTH:
+            # Only merge keys with the same numbers: "1.2 Petrol" is not "1.5 Petrol"
+            digits = re.findall(r"\d+", key)
+            candidates = [k for k in set(aliases.values()) if re.findall(r"\d+", k) == digits]
+            # "scorpion" (Scorpio N) is "scorpio" plus a letter, but a different car
+            close = [k for k in difflib.get_close_matches(key, candidates, n=3, cutoff=self.cutoff)
+                     if _inner_edit(key, k)]
+            if close:
+                canonical = close[0]
+                self.merged += 1
+        aliases[key] = canonical
+        return canonical
+
+
+class CleaningPipeline:
+    """Deduplicated car table fed one raw extraction batch at a time.
+
+    Rows are keyed on canonical (manufacturer, model, variant) keys. The
+    journal holds every accepted batch in arrival order with its source;
+    replaying it on start rebuilds the table and `sources`, so an interrupted
+    ingest loses nothing it had already journaled and does not add it twice.
+    """
+
+    def __init__(self, output_path: str, journal_path: Optional[str] = None, flush_every: int = FLUSH_EVERY,
+                 cutoff: float = FUZZY_CUTOFF):
+        self.output_path = output_path
+        self.journal_path = journal_path or f"{output_path}.journal.ndjson"
+        self.flush_every = flush_every
+        self.rows: Dict[Tuple[str, str, str], Row] = {}
+        self.models = _FuzzyKeys(cutoff)
+        # How often each spelling of a manufacturer / model was seen; the most common one is written
+        self.spellings: Dict[Any, Counter] = {}
+        self.stats = {"batches": 0, "records": 0, "invalid": 0, "empty_variant": 0, "duplicates": 0,
+                      "already_journaled": 0}
+        # Files and URLs whose batches are in the journal
+        self.sources = set()
+        self._pending = 0
+        if os.path.exists(self.journal_path):
+            with open(self.journal_path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        batch = json.loads(line)
+                    except json.JSONDecodeError:
+                        # A batch cut off by a crash; it is fed again when the ingest reruns
+                        continue
+                    # Journals written before sources were recorded hold bare row lists
+                    rows = batch["rows"] if isinstance(batch, dict) else batch
+                    if isinstance(batch, dict) and batch["source"]:
+                        self.sources.add(batch["source"])
+                    for row in rows:
+                        row["_keys"] = tuple(row["_keys"])
+                        self._add(row)
+            print(f"[DEBUG] Replayed {len(self.rows)} variants from {self.journal_path}")
+        self._journal = open(self.journal_path, "a", encoding="utf-8")
+
+    def _add(self, row: Row) -> Tuple[str, str, str]:
+        manufacturer, model, variant = row["_keys"]
+        model = self.models.canonical(manufacturer, model)
+        key = (manufacturer, model, variant)
+        if key in self.rows:
+            self.stats["duplicates"] += 1
+        self.rows[key] = row
+        self.spellings.setdefault(manufacturer, Counter())[row["manufacturer"]] += 1
+        self.spellings.setdefault((manufacturer, model), Counter())[row["model_name"]] += 1
+        return key
+
+    def feed(self, source: str, raw: Any) -> Dict[str, int]:
+        """Clean, dedupe and journal one raw extraction result; usable as extract_cars' raw_sink.
+
+        Live pages are always fed, even from a URL already in the journal: a
+        page scraped again later may have changed, and its rows replace the old ones.
+        """
+        rows, stats = clean_rows(raw)
+        return self.feed_rows(rows, stats, source)
+
+    def feed_rows(self, rows: List[Row], stats: Dict[str, int], source: str = "") -> Dict[str, int]:
+        """Add rows already produced by clean_rows (possibly in another process)."""
+        for name, value in stats.items():
+            self.stats[name] += value
+        self.stats["batches"] += 1
+        for row in rows:
+            self._add(row)
+        # One line per batch, so a crash mid-write loses at most that batch
+        self._journal.write(json.dumps({"source": source, "rows": rows}, ensure_ascii=False) + "\n")
+        self._journal.flush()
+        if source:
+            self.sources.add(source)
+        self._pending += 1
+        if self._pending >= self.flush_every:
+            self.flush()
+        return stats
+
+    def sorted_rows(self) -> List[List[str]]:
+        """CSV rows in the dataset's column order, sorted like catalog_refresh.upsert_cars."""
+        spelled = {key: counts.most_common(1)[0][0] for key, counts in self.spellings.items()}
+        rows = []
+        for (manufacturer, model, _), row in self.rows.items():
+            values = [row[c] for c in CSV_COLUMNS]
+            values[0], values[1] = spelled[manufacturer], spelled[(manufacturer, model)]
+            rows.append(values)
+        rows.sort(key=lambda r: (r[0], r[1], r[2]))
+        return rows
+
+    def dataframe(self) -> pd.DataFrame:
+        return pd.DataFrame(self.sorted_rows(), columns=CSV_COLUMNS)
+
+    def flush(self):
+        tmp = f"{self.output_path}.tmp"
+        # csv.writer instead of DataFrame.to_csv: same output, a fraction of the cost on every flush
+        with open(tmp, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(CSV_COLUMNS)
+            writer.writerows(self.sorted_rows())
+        os.replace(tmp, self.output_path)
+        self._pending = 0
+
+    def summary(self) -> Dict[str, int]:
+        return {**self.stats, "fuzzy_merged": self.models.merged, "variants": len(self.rows)}
+
+    def close(self):
+        self.flush()
+        self._journal.close()
+
+
+def ingest_archive(paths: List[str], pipeline: CleaningPipeline, workers: int = 0) -> Dict[str, int]:
+    """Feed archived raw JSON files through the pipeline in order.
+
+    Archive files never change once written, so ones already in the journal
+    are skipped. With workers > 0, parsing, validation and normalization run
+    in a process pool; the order-dependent dedupe stays in this process.
+    """
+    paths = [os.path.abspath(p) for p in paths]
+    pending = [p for p in paths if p not in pipeline.sources]
+    pipeline.stats["already_journaled"] += len(paths) - len(pending)
+    paths = pending
+    if workers > 0:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            chunksize = max(1, len(paths) // (workers * 8))
+            for path, rows, stats in pool.map(_clean_file, paths, chunksize=chunksize):
+                pipeline.feed_rows(rows, stats, path)
+    else:
+        for path in paths:
+            _, rows, stats = _clean_file(path)
+            pipeline.feed_rows(rows, stats, path)
+    pipeline.flush()
+    return pipeline.summary()
+
+
+def archive_raw_json(directory: str = RAW_ARCHIVE_DIR):
+    """raw_sink for extract_cars that saves every extraction result for later re-ingests."""
+    os.makedirs(directory, exist_ok=True)
+
+    def sink(url: str, raw: Any):
+        slug = re.sub(r"\W+", "_", url.rstrip("/").rsplit("/", 1)[-1]).strip("_") or "page"
+        path = os.path.join(directory, f"{slug}_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"url": url, **(raw if isinstance(raw, dict) else {"variants": raw})}, f, ensure_ascii=False)
+
+    return sink
+
+
+def synthetic_archive(directory: str, records: int = 100_000, per_file: int = 500, seed: int = 7) -> List[str]:
+    """Raw extraction files with the mess real runs produce: repeats across runs, typos,
+    brand-prefixed model names, missing variants and malformed records."""
+    import random
+
+    rng = random.Random(seed)
+    brands = ["Tata", "Maruti Suzuki", "Hyundai", "Mahindra", "Toyota", "Honda", "Kia", "MG", "Skoda", "Renault"]
+    models = [f"{word}{suffix}" for word in ["Nexon", "Creta", "Fortuner", "Seltos", "Hector", "Kushaq",
+                                             "Kiger", "Scorpio", "Baleno", "Venue"]
+              for suffix in ["", " Prime", " Max", " Sport", " Cross"]]
+    trims = ["LXi", "VXi", "ZXi", "ZXi Plus", "Alpha", "Alpha+", "Smart", "Pure", "Creative", "Fearless"]
+    paths = []
+    os.makedirs(directory, exist_ok=True)
+    for file_no in range(0, records, per_file):
+        variants = []
+        for _ in range(min(per_file, records - file_no)):
+            brand, model = rng.choice(brands), rng.choice(models)
+            trim = f"{rng.choice(trims)} {rng.choice(['1.2', '1.5', '2.0'])} {rng.choice(['MT', 'AT'])}"
+            roll = rng.random()
+            if roll < 0.05 and len(model) > 6:
+                model = model[:3] + model[3] * 2 + model[4:]  # "Fortuner" -> "Fortuuner"
+            elif roll < 0.10:
+                model = f"{brand} {model}"
+            record = {
+                "manufacturer": brand, "model_name": model, "variant_name": "" if roll > 0.98 else trim,
+                "manufacturing_year": "2025", "showroom_price": f"₹{rng.randint(5, 40)}.{rng.randint(0, 99)} Lakh",
+                "fuel_type": rng.choice(["Petrol", "Diesel", "Petrol/CNG"]), "engine_capacity_cc": rng.choice([1197, 1498, 1956]),
+                "body_type": rng.choice(["SUV", "Sedan", "Hatchback"]), "seating_capacity": rng.choice([5, 7]),
+                "torque_nm": "200 Nm", "mileage_kmpl": "18 kmpl", "power_bhp": "118 bhp",
+                "transmission": "Manual", "safety_rating": "5 Star",
+                "features": rng.sample(["Cruise Control", "Sunroof", "Alloy Wheels", "Rear AC Vents", "ABS"], 3),
+            }
+            # The model sometimes returns a bare string instead of a record
+            variants.append("N/A" if roll < 0.005 else record)
+        path = os.path.join(directory, f"raw_{file_no // per_file:05d}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"variants": variants}))
+        paths.append(path)
+    return paths
+
+
+def _bench(workers_options: List[int], records: int):
+    import tempfile
+
+    workdir = tempfile.mkdtemp()
+    start = time.perf_counter()
+    paths = synthetic_archive(os.path.join(workdir, "raw"), records)
+    print(f"📦 Synthetic archive: {records} raw variant records in {len(paths)} files "
+          f"({time.perf_counter() - start:.1f}s to write)")
+    for workers in workers_options:
+        out = os.path.join(workdir, f"clean_{workers}.csv")
+        pipeline = CleaningPipeline(out)
+        start = time.perf_counter()
+        summary = ingest_archive(paths, pipeline, workers)
+        elapsed = time.perf_counter() - start
+        pipeline.close()
+        print(f"📊 workers={workers or 'none':<4} {elapsed:6.2f}s  {records / elapsed:>9,.0f} records/s  {summary}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    ingest = sub.add_parser("ingest", help="clean archived raw extraction JSON files")
+    ingest.add_argument("paths", nargs="+")
+    ingest.add_argument("--out", default=os.path.join("data", "car_dataset_clean.csv"))
+    ingest.add_argument("--workers", type=int, default=0, help="process pool size (0 = in process)")
+    bench = sub.add_parser("bench", help="throughput on a synthetic archive")
+    bench.add_argument("--records", type=int, default=100_000)
+    bench.add_argument("--workers", type=int, nargs="+", default=[0, 2, 4])
+    args = parser.parse_args()
+
+    if args.command == "bench":
+        _bench(args.workers, args.records)
+    else:
+        paths = sorted(p for pattern in args.paths for p in glob.glob(pattern))
+        pipeline = CleaningPipeline(args.out)
+        summary = ingest_archive(paths, pipeline, args.workers)
+        pipeline.close()
+        print(f"✅ Wrote {summary['variants']} variants to {args.out}: {summary}")
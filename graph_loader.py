@@ -0,0 +1,263 @@
+import argparse
+import os
+import time
+
+import pandas as pd
+from dotenv import load_dotenv
+
+from normalize import normalize_car_data
+
+DEFAULT_BATCH_SIZE = 500
+
+CONSTRAINTS = [
+    "CREATE CONSTRAINT manufacturer_name IF NOT EXISTS FOR (m:Manufacturer) REQUIRE m.name IS UNIQUE",
+    "CREATE CONSTRAINT body_type_name IF NOT EXISTS FOR (bt:BodyType) REQUIRE bt.name IS UNIQUE",
+    "CREATE CONSTRAINT fuel_type_name IF NOT EXISTS FOR (ft:FuelType) REQUIRE ft.name IS UNIQUE",
+    "CREATE CONSTRAINT feature_name IF NOT EXISTS FOR (f:Feature) REQUIRE f.name IS UNIQUE",
+    "CREATE CONSTRAINT vehicle_key IF NOT EXISTS FOR (v:Vehicle) "
+    "REQUIRE (v.manufacturer, v.model_name, v.variant_name) IS UNIQUE",
+]
+
+# Category nodes are created once per distinct name, before any vehicle
+CATEGORY_QUERY = "UNWIND $rows AS name MERGE (:{label} {{name: name}})"
+
+VEHICLE_QUERY = """
+UNWIND $rows AS row
+MATCH (m:Manufacturer {name: row.manufacturer})
+MATCH (bt:BodyType {name: row.body_type})
+MATCH (ft:FuelType {name: row.fuel_type})
+MERGE (v:Vehicle {
+    manufacturer: row.manufacturer,
+    model_name: row.model_name,
+    variant_name: row.variant_name
+})
+SET v.manufacturing_year = row.manufacturing_year,
+    v.showroom_price = row.showroom_price,
+    v.engine_capacity_cc = row.engine_capacity_cc,
+    v.body_type = row.body_type,
+    v.fuel_type = row.fuel_type,
+    v.seating_capacity = row.seating_capacity,
+    v.transmission = row.transmission,
+    v.power_bhp = row.power_bhp,
+    v.torque_nm = row.torque_nm,
+    v.mileage_kmpl = row.mileage_kmpl,
+    v.safety_rating = row.safety_rating,
+    v.features = row.features
+MERGE (v)-[:MANUFACTURED_BY]->(m)
+MERGE (v)-[:HAS_BODY_TYPE]->(bt)
+MERGE (v)-[:USES_FUEL]->(ft)
+"""
+
+FEATURE_QUERY = """
+UNWIND $rows AS row
+MATCH (v:Vehicle {manufacturer: row.manufacturer, model_name: row.model_name, variant_name: row.variant_name})
+MATCH (f:Feature {name: row.feature})
+MERGE (v)-[:HAS_FEATURE]->(f)
+"""
+
+
+def _value(value):
+    """pandas missing values (NaN/NA) become Cypher null."""
+    return None if pd.isna(value) else value
+
+
+def split_features(value) -> list:
+    if pd.isna(value):
+        return []
+    return [f.strip() for f in str(value).split(',') if f.strip() and f.strip() != 'nan']
+
+
+def vehicle_rows(df: pd.DataFrame) -> list:
+    """One parameter map per vehicle, with the numeric specs already typed."""
+    normalized = normalize_car_data(df)
+    rows = []
+    for record in normalized.to_dict("records"):
+        year = pd.to_numeric(record.get("manufacturing_year"), errors="coerce")
+        rows.append({
+            'manufacturer': str(record['manufacturer']),
+            'model_name': str(record['model_name']),
+            'variant_name': str(record['variant_name']),
+            'manufacturing_year': None if pd.isna(year) else int(year),
+            'showroom_price': str(record['showroom_price']),
+            'fuel_type': str(record['fuel_type']),
+            'engine_capacity_cc': _value(record['engine_cc']),
+            'body_type': str(record['body_type']),
+            'seating_capacity': _value(record['seating']),
+            'transmission': str(record['transmission']),
+            'power_bhp': str(record['power_bhp']),
+            'torque_nm': str(record['torque_nm']),
+            'mileage_kmpl': _value(record['mileage_kmpl_value']),
+            'safety_rating': _value(record['safety_stars']),
+            'features': split_features(record['features']),
+        })
+    return rows
+
+
+def _batches(items: list, size: int):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+class GraphLoader:
+    """Loads the car catalog into Neo4j with one UNWIND statement per batch.
+
+    `driver` is a neo4j.Driver or anything exposing `session()` whose
+    sessions have `run(query, **params)`.
+    """
+
+    def __init__(self, driver, batch_size: int = DEFAULT_BATCH_SIZE, database: str = None):
+        self.driver = driver
+        self.batch_size = batch_size
+        self.database = database
+
+    def _session(self):
+        if self.database:
+            return self.driver.session(database=self.database)
+        return self.driver.session()
+
+    def create_constraints(self):
+        with self._session() as session:
+            for statement in CONSTRAINTS:
+                session.run(statement).consume()
+
+    def _run_batches(self, session, query: str, items: list) -> int:
+        batches = 0
+        for batch in _batches(items, self.batch_size):
+            session.run(query, rows=batch).consume()
+            batches += 1
+        return batches
+
+    def load(self, df: pd.DataFrame) -> dict:
+        df = df.dropna(subset=['variant_name'])
+        start = time.perf_counter()
+        self.create_constraints()
+
+        rows = vehicle_rows(df)
+        # Dedupe client-side so each category/feature node is sent once
+        categories = {
+            "Manufacturer": sorted({r['manufacturer'] for r in rows}),
+            "BodyType": sorted({r['body_type'] for r in rows}),
+            "FuelType": sorted({r['fuel_type'] for r in rows}),
+            "Feature": sorted({f for r in rows for f in r['features']}),
+        }
+        edges = list({
+            (r['manufacturer'], r['model_name'], r['variant_name'], f): None
+            for r in rows for f in r['features']
+        })
+        feature_rows = [
+            {'manufacturer': m, 'model_name': mo, 'variant_name': va, 'feature': f}
+            for m, mo, va, f in edges
+        ]
+
+        batches = 0
+        with self._session() as session:
+            for label, names in categories.items():
+                batches += self._run_batches(session, CATEGORY_QUERY.format(label=label), names)
+            batches += self._run_batches(session, VEHICLE_QUERY, rows)
+            batches += self._run_batches(session, FEATURE_QUERY, feature_rows)
+
+        elapsed = time.perf_counter() - start
+        stats = {
+            "vehicles": len(rows),
+            "features": len(categories["Feature"]),
+            "feature_edges": len(feature_rows),
+            "batches": batches,
+            "seconds": elapsed,
+            "rows_per_sec": len(rows) / elapsed if elapsed else float("inf"),
+        }
+        print(f"✅ Loaded {stats['vehicles']} vehicles, {stats['features']} features, "
+              f"{stats['feature_edges']} feature edges in {batches} batches "
+              f"({elapsed:.2f}s, {stats['rows_per_sec']:.0f} rows/sec)")
+        return stats
+
+
+class _RecordingDriver:
+    """Offline stand-in for neo4j.Driver that records every statement and its batch size."""
+
+    def __init__(self):
+        self.statements = []
+
+    def session(self, **kwargs):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def run(self, query, **params):
+        rows = params.get("rows")
+        self.statements.append((query, None if rows is None else len(rows)))
+        return self
+
+    def consume(self):
+        return None
+
+
+def _check(df: pd.DataFrame, batch_size: int):
+    """Load `df` into a recording driver and check the statements that would reach Neo4j."""
+    driver = _RecordingDriver()
+    stats = GraphLoader(driver, batch_size=batch_size).load(df)
+
+    # Constraints go first, unparameterised, so every MERGE below can use them
+    head = driver.statements[:len(CONSTRAINTS)]
+    assert [q for q, _ in head] == CONSTRAINTS, "constraints must be created before any data"
+    assert all(size is None for _, size in head)
+    data = driver.statements[len(CONSTRAINTS):]
+    assert all(size is not None for _, size in data), "data statements must all be UNWIND batches"
+    assert len(data) == stats["batches"]
+
+    def sizes(query):
+        return [size for q, size in data if q == query]
+
+    rows = vehicle_rows(df)
+    expected = {
+        CATEGORY_QUERY.format(label="Manufacturer"): len({r['manufacturer'] for r in rows}),
+        CATEGORY_QUERY.format(label="BodyType"): len({r['body_type'] for r in rows}),
+        CATEGORY_QUERY.format(label="FuelType"): len({r['fuel_type'] for r in rows}),
+        CATEGORY_QUERY.format(label="Feature"): stats["features"],
+        VEHICLE_QUERY: stats["vehicles"],
+        FEATURE_QUERY: stats["feature_edges"],
+    }
+    for query, total in expected.items():
+        got = sizes(query)
+        # Full batches, then one remainder; nothing is sent twice
+        assert sum(got) == total, (query.split()[:6], sum(got), total)
+        assert len(got) == -(-total // batch_size), (len(got), total, batch_size)
+        assert all(size == batch_size for size in got[:-1]) and 0 < got[-1] <= batch_size
+    # Category nodes exist before the vehicles that MATCH them, vehicles before their feature edges
+    order = [q for q, _ in data]
+    assert max(i for i, q in enumerate(order) if q.startswith("UNWIND $rows AS name")) < order.index(VEHICLE_QUERY)
+    assert max(i for i, q in enumerate(order) if q == VEHICLE_QUERY) < order.index(FEATURE_QUERY)
+
+    per_kind = {}
+    for q, size in data:
+        kind = "Vehicle" if q == VEHICLE_QUERY else "HAS_FEATURE" if q == FEATURE_QUERY else q.split(":")[1].split()[0]
+        per_kind.setdefault(kind, []).append(size)
+    print(f"✅ batch size {batch_size}: {len(CONSTRAINTS)} constraints, then {len(data)} UNWIND statements ("
+          + ", ".join(f"{k} {sum(v)} rows in {len(v)}" for k, v in per_kind.items()) + ")")
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Bulk-load a scraped car CSV into Neo4j")
+    parser.add_argument("csv", nargs="?", default=os.path.join("data", "car_dataset_combined.csv"))
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--check", action="store_true",
+                        help="load into a recording fake driver instead of Neo4j and check the statements")
+    args = parser.parse_args()
+
+    if args.check:
+        df = pd.read_csv(args.csv)
+        for size in (args.batch_size, 50, 7):
+            _check(df, size)
+    else:
+        from neo4j import GraphDatabase
+
+        driver = GraphDatabase.driver(
+            os.getenv("NEO4J_URI"),
+            auth=(os.getenv("NEO4J_USERNAME"), os.getenv("NEO4J_PASSWORD")),
+        )
+        with driver:
+            GraphLoader(driver, batch_size=args.batch_size).load(pd.read_csv(args.csv))
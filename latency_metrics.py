@@ -0,0 +1,180 @@
+import os
+import re
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+from livekit.agents import metrics, MetricsCollectedEvent
+
+MAX_SAMPLES = 10_000
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+def metrics_dir() -> str:
+    """METRICS_DIR, read when used so a .env loaded after import applies; empty disables the export."""
+    return os.getenv("METRICS_DIR", "")
+
+
+class LatencyHistogram:
+    """Keeps the most recent samples of one pipeline stage and reports quantiles."""
+
+    def __init__(self, max_samples: int = MAX_SAMPLES):
+        self.samples = deque(maxlen=max_samples)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, seconds: float):
+        self.samples.append(seconds)
+        self.count += 1
+        self.total += seconds
+
+    def quantiles(self) -> Dict[float, float]:
+        if not self.samples:
+            return {}
+        ordered = sorted(self.samples)
+        last = len(ordered) - 1
+        return {q: ordered[min(last, int(round(q * last)))] for q in QUANTILES}
+
+
+class LatencyMetrics:
+    """Latency histograms keyed by pipeline stage.
+
+    Stages recorded by attach_session_metrics: eou_delay (end of speech to
+    end-of-turn decision), stt_final_delay, llm_ttft, tts_ttfb, plus one
+    tool_<name> stage per timed function tool.
+    """
+
+    def __init__(self):
+        self.histograms: Dict[str, LatencyHistogram] = {}
+
+    def observe(self, stage: str, seconds: float):
+        if seconds is None or seconds < 0:
+            return
+        self.histograms.setdefault(stage, LatencyHistogram()).observe(seconds)
+
+    def to_report(self) -> dict:
+        """JSON-serializable samples, for merging into another process's metrics."""
+        return {
+            "histograms": {stage: {"samples": list(h.samples), "count": h.count, "total": h.total}
+                           for stage, h in self.histograms.items()},
+        }
+
+    def merge_report(self, report: dict):
+        for stage, h in report.get("histograms", {}).items():
+            histogram = self.histograms.setdefault(stage, LatencyHistogram())
+            histogram.samples.extend(h["samples"])
+            histogram.count += h["count"]
+            histogram.total += h["total"]
+
+    def summary(self) -> str:
+        lines = []
+        for stage, histogram in sorted(self.histograms.items()):
+            q = histogram.quantiles()
+            lines.append(
+                f"{stage:<28} n={histogram.count:<5} "
+                + " ".join(f"p{int(k * 100)}={v * 1000:.0f}ms" for k, v in q.items())
+            )
+        return "\n".join(lines)
+
+    def prometheus_text(self) -> str:
+        """Prometheus text exposition format (summary type), one series per stage."""
+        name = "agent_turn_latency_seconds"
+        lines = [
+            f"# HELP {name} Voice pipeline latency per stage.",
+            f"# TYPE {name} summary",
+        ]
+        for stage, histogram in sorted(self.histograms.items()):
+            for q, value in histogram.quantiles().items():
+                lines.append(f'{name}{{stage="{stage}",quantile="{q}"}} {value:.6f}')
+            lines.append(f'{name}_sum{{stage="{stage}"}} {histogram.total:.6f}')
+            lines.append(f'{name}_count{{stage="{stage}"}} {histogram.count}')
+        return "\n".join(lines) + "\n"
+
+    def export(self, directory: Optional[str] = None) -> Optional[str]:
+        """Write this worker's .prom file for the node_exporter textfile collector."""
+        directory = metrics_dir() if directory is None else directory
+        if not directory:
+            return None
+        os.makedirs(directory, exist_ok=True)
+        path = export_path(directory)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            f.write(self.prometheus_text())
+        os.replace(tmp, path)
+        return path
+
+
+def export_path(directory: Optional[str] = None, pid: Optional[int] = None) -> str:
+    directory = metrics_dir() if directory is None else directory
+    return os.path.join(directory, f"agent_latency_{pid or os.getpid()}.prom")
+
+
+def _running(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def remove_stale_exports(directory: Optional[str] = None):
+    """Delete the .prom files of workers that are no longer running, so node_exporter stops serving them."""
+    directory = metrics_dir() if directory is None else directory
+    if not directory:
+        return
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return
+    for name in names:
+        match = re.fullmatch(r"agent_latency_(\d+)\.prom", name)
+        if match and not _running(int(match.group(1))):
+            try:
+                os.remove(os.path.join(directory, name))
+            except OSError:
+                pass
+
+
+@contextmanager
+def timed(stage: str, *targets: "LatencyMetrics"):
+    """Time the enclosed block and record it under `stage` in every target."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        for target in targets:
+            target.observe(stage, elapsed)
+
+
+def attach_session_metrics(session, *targets: "LatencyMetrics"):
+    """Record every metrics_collected event of `session` into every target."""
+
+    def observe(stage, seconds):
+        for target in targets:
+            target.observe(stage, seconds)
+
+    @session.on("metrics_collected")
+    def _on_metrics_collected(ev: MetricsCollectedEvent):
+        m = ev.metrics
+        if isinstance(m, metrics.EOUMetrics):
+            observe("eou_delay", m.end_of_utterance_delay)
+            observe("stt_final_delay", m.transcription_delay)
+        elif isinstance(m, metrics.LLMMetrics):
+            observe("llm_ttft", m.ttft)
+        elif isinstance(m, metrics.TTSMetrics):
+            observe("tts_ttfb", m.ttfb)
+
+
+_worker_metrics: Optional[LatencyMetrics] = None
+
+
+def get_worker_metrics() -> LatencyMetrics:
+    """In the worker process: every call its job processes have reported (see worker_load.collect_latency)."""
+    global _worker_metrics
+    if _worker_metrics is None:
+        _worker_metrics = LatencyMetrics()
+    return _worker_metrics
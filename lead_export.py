@@ -0,0 +1,81 @@
+import argparse
+import json
+import sys
+from typing import Any, Dict, Iterator, Optional
+
+import requests
+
+DEFAULT_PAGE_SIZE = 500
+
+
+def _filters(min_score: Optional[float] = None, max_score: Optional[float] = None,
+             sentiment: Optional[str] = None, language: Optional[str] = None,
+             date_from: Optional[str] = None, date_to: Optional[str] = None) -> Dict[str, Any]:
+    params = {
+        "minScore": min_score,
+        "maxScore": max_score,
+        "sentiment": sentiment,
+        "language": language,
+        "from": date_from,
+        "to": date_to,
+    }
+    return {k: v for k, v in params.items() if v is not None}
+
+
+def iter_leads(base_url: str, page_size: int = DEFAULT_PAGE_SIZE, session: Optional[requests.Session] = None,
+               timeout: float = 30, **filters) -> Iterator[Dict[str, Any]]:
+    """Yield leads from GET /api/user/all one page at a time.
+
+    Only one page is held in memory, so this runs in constant memory however
+    large the lead table gets. `filters` are the keyword arguments of _filters
+    (min_score, max_score, sentiment, language, date_from, date_to).
+    """
+    session = session or requests.Session()
+    params = {**_filters(**filters), "limit": page_size}
+    cursor = None
+    while True:
+        if cursor:
+            params["cursor"] = cursor
+        response = session.get(f"{base_url}/api/user/all", params=params, timeout=timeout)
+        response.raise_for_status()
+        page = response.json()
+        yield from page["users"]
+        cursor = page["nextCursor"]
+        if not cursor:
+            return
+
+
+def stream_leads(base_url: str, page_size: int = DEFAULT_PAGE_SIZE, session: Optional[requests.Session] = None,
+                 timeout: float = 30, **filters) -> Iterator[Dict[str, Any]]:
+    """Yield leads from the NDJSON export, parsing one line at a time as it arrives."""
+    session = session or requests.Session()
+    params = {**_filters(**filters), "limit": page_size, "format": "ndjson"}
+    with session.get(f"{base_url}/api/user/all", params=params, stream=True, timeout=timeout) as response:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            if line:
+                yield json.loads(line)
+
+
+if __name__ == "__main__":
+    from base_url import base_url
+
+    parser = argparse.ArgumentParser(description="Export leads as NDJSON to stdout")
+    parser.add_argument("--min-score", type=float)
+    parser.add_argument("--max-score", type=float)
+    parser.add_argument("--sentiment")
+    parser.add_argument("--language")
+    parser.add_argument("--from", dest="date_from", help="ISO date, inclusive")
+    parser.add_argument("--to", dest="date_to", help="ISO date, exclusive")
+    parser.add_argument("--page-size", type=int, default=DEFAULT_PAGE_SIZE)
+    parser.add_argument("--paged", action="store_true", help="use JSON pages instead of the NDJSON stream")
+    args = parser.parse_args()
+
+    export = iter_leads if args.paged else stream_leads
+    count = 0
+    for lead in export(base_url, page_size=args.page_size, min_score=args.min_score, max_score=args.max_score,
+                       sentiment=args.sentiment, language=args.language,
+                       date_from=args.date_from, date_to=args.date_to):
+        sys.stdout.write(json.dumps(lead, ensure_ascii=False) + "\n")
+        count += 1
+    print(f"✅ Exported {count} leads", file=sys.stderr)
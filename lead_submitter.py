@@ -0,0 +1,507 @@
+import asyncio
+import atexit
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+from typing import Dict, Any, Optional
+
+import aiohttp
+
+MAX_ATTEMPTS = 8
+BASE_BACKOFF = 1.0
+MAX_BACKOFF = 60.0
+LEASE_SECONDS = 120
+
+
+def outbox_path() -> str:
+    """LEAD_OUTBOX_PATH, read when used so a .env loaded after import applies."""
+    return os.getenv("LEAD_OUTBOX_PATH", "lead_outbox.sqlite3")
+
+
+def lead_drain_timeout() -> float:
+    """LEAD_DRAIN_TIMEOUT: how long a finished call's process waits for its leads to be delivered before exiting."""
+    return float(os.getenv("LEAD_DRAIN_TIMEOUT", "10"))
+
+
+def lead_batch_size() -> int:
+    """LEAD_BATCH_SIZE, read when used so a .env loaded after import applies.
+
+    Above 1, job processes only persist leads and the worker process posts them to /bulk.
+    """
+    return int(os.getenv("LEAD_BATCH_SIZE", "1"))
+
+
+def lead_batch_wait() -> float:
+    """LEAD_BATCH_WAIT: how often the worker's batcher collects the leads job processes have persisted."""
+    return float(os.getenv("LEAD_BATCH_WAIT", "1.0"))
+
+
+class LeadOutbox:
+    """SQLite-backed outbox so a lead survives a crash or a backend outage."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or outbox_path()
+        self.owner = f"{os.getpid()}"
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS outbox (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    url TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    owner TEXT,
+                    lease_until REAL NOT NULL DEFAULT 0,
+                    last_error TEXT,
+                    created_at REAL NOT NULL
+                )
+                """
+            )
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=10)
+
+    def add(self, url: str, payload: Dict[str, Any], claim: bool = True) -> int:
+        """Persist a lead, leased to this process unless `claim` is False (left for whoever polls next)."""
+        owner, lease_until = (self.owner, time.time() + LEASE_SECONDS) if claim else (None, 0)
+        with self._connect() as conn:
+            cur = conn.execute(
+                "INSERT INTO outbox (url, payload, owner, lease_until, created_at) VALUES (?, ?, ?, ?, ?)",
+                (url, json.dumps(payload), owner, lease_until, time.time()),
+            )
+            return cur.lastrowid
+
+    def claim_pending(self):
+        """Claim every pending row whose lease has expired (e.g. left behind by a dead worker)."""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE outbox SET owner = ?, lease_until = ? WHERE status = 'pending' AND lease_until < ?",
+                (self.owner, now + LEASE_SECONDS, now),
+            )
+            rows = conn.execute(
+                "SELECT id, url, payload, attempts FROM outbox WHERE status = 'pending' AND owner = ?",
+                (self.owner,),
+            ).fetchall()
+        return [(row_id, url, json.loads(payload), attempts) for row_id, url, payload, attempts in rows]
+
+    def renew(self, row_id: int, attempts: int, error: Optional[str]):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE outbox SET attempts = ?, last_error = ?, lease_until = ? WHERE id = ?",
+                (attempts, error, time.time() + LEASE_SECONDS, row_id),
+            )
+
+    def release(self):
+        """Let the next submitter claim this process's undelivered rows right away instead of after the lease."""
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE outbox SET lease_until = 0 WHERE status = 'pending' AND owner = ?",
+                (self.owner,),
+            )
+
+    def done(self, row_id: int):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM outbox WHERE id = ?", (row_id,))
+
+    def done_many(self, row_ids):
+        with self._connect() as conn:
+            conn.executemany("DELETE FROM outbox WHERE id = ?", [(row_id,) for row_id in row_ids])
+
+    def failed(self, row_id: int, error: str):
+        # Kept on disk for inspection, never replayed again
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE outbox SET status = 'failed', last_error = ? WHERE id = ?",
+                (error, row_id),
+            )
+
+
+class LeadSubmitter:
+    """Delivers leads to the backend in the background over a pooled aiohttp session.
+
+    `submit` only persists the lead and queues it, so the calling function tool
+    returns to the LLM without waiting on the network.
+    """
+
+    def __init__(self, outbox: Optional[LeadOutbox] = None, concurrency: int = 4,
+                 request_timeout: float = 30, max_attempts: int = MAX_ATTEMPTS):
+        self.outbox = outbox or LeadOutbox()
+        self.concurrency = concurrency
+        self.request_timeout = request_timeout
+        self.max_attempts = max_attempts
+        self._queue: Optional[asyncio.Queue] = None
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._workers = []
+        self._loop = None
+
+    async def start(self):
+        """Open the HTTP pool, start delivery workers and replay the on-disk outbox."""
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        self._loop = loop
+        self._queue = asyncio.Queue()
+        self._session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.concurrency, keepalive_timeout=60),
+            timeout=aiohttp.ClientTimeout(total=self.request_timeout),
+            headers={"Content-Type": "application/json"},
+        )
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+
+        pending = await asyncio.to_thread(self.outbox.claim_pending)
+        if pending:
+            print(f"[DEBUG] Replaying {len(pending)} lead(s) from outbox")
+        for item in pending:
+            self._enqueue(item)
+
+    def _enqueue(self, item):
+        self._queue.put_nowait(item)
+
+    async def submit(self, url: str, payload: Dict[str, Any]) -> int:
+        """Persist the lead to the outbox and queue it for delivery."""
+        await self.start()
+        row_id = await asyncio.to_thread(self.outbox.add, url, payload)
+        self._enqueue((row_id, url, payload, 0))
+        return row_id
+
+    async def drain(self):
+        """Wait until every queued lead has been delivered or given up on."""
+        if self._queue is not None:
+            await self._queue.join()
+
+    async def flush(self, timeout: Optional[float] = None):
+        """Deliver what is queued (up to `timeout` seconds), then close.
+
+        Called when a call ends: LiveKit runs each job in its own process,
+        which exits afterwards, so leads still queued or backing off would
+        otherwise wait out their lease before another job replays them.
+        """
+        timeout = lead_drain_timeout() if timeout is None else timeout
+        try:
+            await asyncio.wait_for(self.drain(), timeout)
+        except asyncio.TimeoutError:
+            print(f"[ERROR] Leads not delivered within {timeout}s are left in the outbox for the next job")
+        await self.aclose()
+
+    async def aclose(self):
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        if self._loop is not None:
+            await asyncio.to_thread(self.outbox.release)
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+        self._loop = None
+
+    async def _worker(self):
+        while True:
+            row_id, url, payload, attempts = await self._queue.get()
+            try:
+                await self._deliver(row_id, url, payload, attempts)
+            except Exception as e:
+                print(f"[ERROR] Lead {row_id} delivery crashed: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _deliver(self, row_id: int, url: str, payload: Dict[str, Any], attempts: int):
+        while attempts < self.max_attempts:
+            attempts += 1
+            try:
+                async with self._session.post(url, json=payload) as response:
+                    text = await response.text()
+                    if response.status == 200:
+                        print(f"[DEBUG] Lead {row_id} delivered: {text}")
+                        await asyncio.to_thread(self.outbox.done, row_id)
+                        return
+                    error = f"API returned status {response.status}: {text}"
+                    # Validation errors will not fix themselves on retry
+                    if 400 <= response.status < 500 and response.status != 429:
+                        print(f"[ERROR] Lead {row_id} rejected: {error}")
+                        await asyncio.to_thread(self.outbox.failed, row_id, error)
+                        return
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                error = f"{type(e).__name__}: {e}"
+
+            print(f"[ERROR] Lead {row_id} attempt {attempts} failed: {error}")
+            await asyncio.to_thread(self.outbox.renew, row_id, attempts, error)
+            delay = min(MAX_BACKOFF, BASE_BACKOFF * 2 ** (attempts - 1))
+            await asyncio.sleep(delay * random.uniform(0.5, 1.0))
+
+        await asyncio.to_thread(self.outbox.failed, row_id, f"gave up after {attempts} attempts")
+
+
+def bulk_url(url: str) -> str:
+    """/api/user/create -> /api/user/bulk"""
+    return url.rsplit("/", 1)[0] + "/bulk"
+
+
+class LeadBatcher(LeadSubmitter):
+    """Delivers the leads of every job process on the host in /bulk batches.
+
+    Runs once per worker, in the worker's main process (start_lead_drainer);
+    job processes only persist their leads to the shared outbox (LeadSpool).
+    Every `poll_interval` seconds it claims the rows nobody holds a lease on
+    and posts them in batches of up to `max_batch`. Records the backend
+    rejects are marked failed individually; the rest of the batch is still
+    delivered.
+    """
+
+    def __init__(self, max_batch: int = 50, poll_interval: float = 1.0, **kwargs):
+        super().__init__(**kwargs)
+        self.max_batch = max_batch
+        self.poll_interval = poll_interval
+        # Rows queued or being delivered; claim_pending returns them again while we hold the lease
+        self._queued = set()
+        self._poller: Optional[asyncio.Task] = None
+
+    async def start(self):
+        if self._loop is asyncio.get_running_loop():
+            return
+        self._queued = set()
+        await super().start()
+        self._poller = asyncio.create_task(self._poll())
+
+    def _enqueue(self, item):
+        if item[0] not in self._queued:
+            self._queued.add(item[0])
+            self._queue.put_nowait(item)
+
+    async def _poll(self):
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                for item in await asyncio.to_thread(self.outbox.claim_pending):
+                    self._enqueue(item)
+            except sqlite3.Error as e:
+                print(f"[ERROR] Could not read the lead outbox: {e}")
+
+    async def aclose(self):
+        if self._poller is not None:
+            self._poller.cancel()
+            await asyncio.gather(self._poller, return_exceptions=True)
+            self._poller = None
+        await super().aclose()
+
+    async def _next_batch(self):
+        # Everything claimed by the same poll is already queued; the poll interval is the wait
+        batch = [await self._queue.get()]
+        while len(batch) < self.max_batch and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        return batch
+
+    async def _worker(self):
+        while True:
+            batch = await self._next_batch()
+            try:
+                by_url = {}
+                for item in batch:
+                    by_url.setdefault(item[1], []).append(item)
+                for url, items in by_url.items():
+                    await self._deliver_batch(url, items)
+            except Exception as e:
+                print(f"[ERROR] Lead batch delivery crashed: {e}")
+            finally:
+                for item in batch:
+                    self._queued.discard(item[0])
+                    self._queue.task_done()
+
+    async def _deliver_batch(self, url: str, items):
+        attempts = max(item[3] for item in items)
+        ids = [item[0] for item in items]
+        while attempts < self.max_attempts:
+            attempts += 1
+            try:
+                async with self._session.post(bulk_url(url), json=[item[2] for item in items]) as response:
+                    text = await response.text()
+                    if response.status == 200:
+                        created = []
+                        for result in json.loads(text)["results"]:
+                            row_id = ids[result["index"]]
+                            if result["status"] == "created":
+                                created.append(row_id)
+                            else:
+                                print(f"[ERROR] Lead {row_id} rejected: {result.get('error')}")
+                                await asyncio.to_thread(self.outbox.failed, row_id, result.get("error", "invalid"))
+                        await asyncio.to_thread(self.outbox.done_many, created)
+                        print(f"[DEBUG] Lead batch of {len(items)} delivered")
+                        return
+                    error = f"API returned status {response.status}: {text}"
+                    if 400 <= response.status < 500 and response.status != 429:
+                        print(f"[ERROR] Lead batch rejected: {error}")
+                        for row_id in ids:
+                            await asyncio.to_thread(self.outbox.failed, row_id, error)
+                        return
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                error = f"{type(e).__name__}: {e}"
+
+            print(f"[ERROR] Lead batch attempt {attempts} failed: {error}")
+            for row_id in ids:
+                await asyncio.to_thread(self.outbox.renew, row_id, attempts, error)
+            delay = min(MAX_BACKOFF, BASE_BACKOFF * 2 ** (attempts - 1))
+            await asyncio.sleep(delay * random.uniform(0.5, 1.0))
+
+        for row_id in ids:
+            await asyncio.to_thread(self.outbox.failed, row_id, f"gave up after {attempts} attempts")
+
+
+class LeadSpool:
+    """Job-process side of batched delivery: persists each lead for the worker's LeadBatcher and returns.
+
+    The rows are left unleased, so the batcher's next poll claims them.
+    """
+
+    def __init__(self, outbox: Optional[LeadOutbox] = None):
+        self.outbox = outbox or LeadOutbox()
+
+    async def start(self):
+        pass
+
+    async def submit(self, url: str, payload: Dict[str, Any]) -> int:
+        return await asyncio.to_thread(self.outbox.add, url, payload, False)
+
+    async def drain(self):
+        pass
+
+    async def flush(self, timeout: Optional[float] = None):
+        pass
+
+    async def aclose(self):
+        pass
+
+
+_submitter = None
+
+
+def get_lead_submitter():
+    """Process-wide submitter. LiveKit runs every job in its own process, so in practice one per call.
+
+    With LEAD_BATCH_SIZE above 1 this is a LeadSpool, and the worker's
+    batcher (start_lead_drainer) delivers the leads of all its calls together.
+    """
+    global _submitter
+    if _submitter is None:
+        _submitter = LeadSpool() if lead_batch_size() > 1 else LeadSubmitter()
+    return _submitter
+
+
+def start_lead_drainer() -> Optional[threading.Thread]:
+    """Run the host's LeadBatcher on a thread of the worker's main process (only when LEAD_BATCH_SIZE > 1)."""
+    batch_size = lead_batch_size()
+    if batch_size <= 1:
+        return None
+    batcher = LeadBatcher(max_batch=batch_size, poll_interval=lead_batch_wait())
+
+    async def run():
+        await batcher.start()
+        await asyncio.Event().wait()
+
+    thread = threading.Thread(target=asyncio.run, args=(run(),), name="lead-batcher", daemon=True)
+    thread.start()
+    # Rows in flight when the worker exits are picked up by the next batcher at once, not after the lease
+    atexit.register(batcher.outbox.release)
+    return thread
+
+
+def _benchmark_job(outbox_path: str, url: str, payload: Dict[str, Any], batched: bool, exit_times):
+    """One call's job process: submit its lead, then flush before exiting, like entrypoint does."""
+    import contextlib
+    import io
+
+    async def run():
+        outbox = LeadOutbox(outbox_path)
+        submitter = LeadSpool(outbox) if batched else LeadSubmitter(outbox=outbox)
+        start = time.perf_counter()
+        await submitter.submit(url, payload)
+        await submitter.flush()
+        exit_times.put(time.perf_counter() - start)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        asyncio.run(run())
+
+
+async def _benchmark(jobs: int, request_latency: float, row_latency: float):
+    """Per-lead /create posts from every job process against one worker-side batcher posting to /bulk."""
+    import multiprocessing
+    import tempfile
+    from aiohttp import web
+
+    requests = []
+
+    async def create(request):
+        await request.json()
+        requests.append(1)
+        await asyncio.sleep(request_latency + row_latency)
+        return web.json_response({"id": 1})
+
+    async def bulk(request):
+        body = await request.json()
+        requests.append(len(body))
+        # One round trip plus per-row insert cost, like a single createMany
+        await asyncio.sleep(request_latency + row_latency * len(body))
+        return web.json_response({"created": len(body), "invalid": 0,
+                                  "results": [{"index": i, "status": "created"} for i in range(len(body))]})
+
+    app = web.Application()
+    app.router.add_post("/api/user/create", create)
+    app.router.add_post("/api/user/bulk", bulk)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    url = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}/api/user/create"
+
+    payload = {"name": "Rahul Sharma", "preferredlanguage": "Hindi", "interestScore": 8.0,
+               "Sentiment": "Positive", "phoneNumber": "9876543210", "callduration": 300,
+               "car_details": "{\"manufacturer\": \"Tata\", \"model\": \"Nexon\", \"variant\": \"XZ\", \"year\": \"2021\"}"}
+    # Jobs fork from a clean single-threaded server, as LiveKit's job processes start from the worker
+    context = multiprocessing.get_context("forkserver")
+    context.set_forkserver_preload([__name__])
+
+    def run_jobs(outbox_path, batched, exit_times):
+        processes = [context.Process(target=_benchmark_job, args=(outbox_path, url, payload, batched, exit_times))
+                     for _ in range(jobs)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+
+    workdir = tempfile.TemporaryDirectory()
+    try:
+        for label, batched in [("per-lead", False), ("batched", True)]:
+            outbox_path = os.path.join(workdir.name, f"{label}.sqlite3")
+            batcher = LeadBatcher(max_batch=50, poll_interval=0.2, outbox=LeadOutbox(outbox_path))
+            if batched:
+                await batcher.start()
+            requests.clear()
+            exit_times = context.Queue()
+            start = time.perf_counter()
+            await asyncio.to_thread(run_jobs, outbox_path, batched, exit_times)
+            while sum(requests) < jobs:
+                await asyncio.sleep(0.01)
+            elapsed = time.perf_counter() - start
+            await batcher.aclose()
+            exits = sorted(exit_times.get() for _ in range(jobs))
+            print(f"📊 {label:<9} {jobs} job processes: {len(requests)} backend requests, "
+                  f"job submit+flush p50 {exits[jobs // 2] * 1000:.0f}ms max {exits[-1] * 1000:.0f}ms, "
+                  f"all leads in {elapsed:.2f}s")
+    finally:
+        await runner.cleanup()
+        workdir.cleanup()
+
+
+if __name__ == "__main__":
+    import contextlib
+    import io
+
+    # Silence the per-lead [DEBUG] lines so only the numbers are printed
+    with contextlib.redirect_stdout(io.StringIO()) as captured:
+        asyncio.run(_benchmark(jobs=40, request_latency=0.02, row_latency=0.0005))
+    print("\n".join(line for line in captured.getvalue().splitlines() if line.startswith("📊")))
@@ -0,0 +1,355 @@
+"""Offline load test: N concurrent VehicleInsuranceAgent sessions on one event loop.
+
+Every session runs the real agent (tools, lead submitter, vehicle catalog)
+inside an AgentSession in text mode. A scripted FakeLLM replaces
+Gemini, the caller's speech time stands in for STT and the agent's speech
+time for TTS playout, and a local aiohttp server stands in for
+/api/user/create. No network access is needed.
+
+Each session also burns --vad-cost-ms of CPU per 32ms audio frame on the
+event loop, standing in for VAD inference, and reports it through
+worker_load like the real sessions do. The load and admit columns show what
+the worker would report to the dispatcher at each level, so the
+WORKER_* budgets can be checked against where turn latency degrades.
+
+    python loadtest.py --sessions 1 5 10 25 50 --think-delay 0.3 --vad-cost-ms 0.3
+    python loadtest.py --sessions 10 --check-slow-backend
+"""
+import argparse
+import asyncio
+import gc
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+import types
+import uuid
+from datetime import datetime
+
+# The outbox must point somewhere disposable before agent.py loads .env
+os.environ.setdefault("LEAD_OUTBOX_PATH", os.path.join(tempfile.mkdtemp(), "loadtest_outbox.sqlite3"))
+os.environ.setdefault("WORKER_LOAD_DIR", tempfile.mkdtemp())
+
+from aiohttp import web
+from livekit.agents import AgentSession, llm, metrics, utils
+from livekit.agents.types import DEFAULT_API_CONNECT_OPTIONS
+
+try:
+    import base_url  # noqa: F401
+except ModuleNotFoundError:
+    # Each deployment provides base_url.py (it is not in the repo); main() points agent at the stub backend anyway
+    sys.modules["base_url"] = types.ModuleType("base_url")
+    sys.modules["base_url"].base_url = ""
+
+import agent
+from latency_metrics import LatencyHistogram, get_worker_metrics
+from lead_submitter import get_lead_submitter
+from prompts import build_instructions
+from vehicle_catalog import get_vehicle_catalog
+from worker_load import collect_latency, compute_load, get_load_reporter, load_settings, read_reports
+
+VAD_FRAME = 0.032
+# Stands in for the worker's shared silero VAD, whose streams emit VADMetrics
+SIMULATED_VAD = utils.EventEmitter()
+
+LEAD = {
+    "name": "Rahul Sharma",
+    "interestScore": 8.0,
+    "Sentiment": "Positive",
+    "phoneNumber": "9876543210",
+    "car_details": "{\"manufacturer\": \"Tata\", \"model\": \"Nexon\", \"variant\": \"XZ\", \"year\": \"2021\"}",
+}
+
+# Each turn: what the caller says, the stage the agent answers it in, an optional
+# tool the LLM calls, and the spoken reply
+SCRIPTS = {
+    "Hindi": [
+        {"user": "हिंदी में बात करते हैं",
+         "stage": "greeting",
+         "tool": None,
+         "reply": "बहुत अच्छा! आपका नाम क्या है?"},
+        {"user": "मेरा नाम राहुल है, मेरे पास टाटा नेक्सन है",
+         "stage": "info_gathering",
+         "tool": ("lookup_vehicle", {"manufacturer": "टाटा", "model": "नेक्सन"}),
+         "reply": "अच्छा, टाटा नेक्सन बहुत अच्छी गाड़ी है। आपका नंबर क्या है?"},
+        {"user": "मेरा नंबर नौ आठ सात छह पांच चार तीन दो एक शून्य है",
+         "stage": "benefits",
+         "tool": None,
+         "reply": "धन्यवाद। हमारे पास zero depreciation और cashless claims हैं।"},
+        {"user": "ठीक है, शाम को बात करते हैं",
+         "stage": "benefits",
+         "tool": ("send_user_details", {"context_variables": {**LEAD, "preferredlanguage": "Hindi"}}),
+         "reply": "राहुल जी, क्या आपका कोई और सवाल है?"},
+        {"user": "नहीं, धन्यवाद",
+         "stage": "closing",
+         "tool": None,
+         "reply": "धन्यवाद राहुल जी! बात करके अच्छा लगा। नमस्ते!"},
+    ],
+    "English": [
+        {"user": "English please",
+         "stage": "greeting",
+         "tool": None,
+         "reply": "Great! May I know your name?"},
+        {"user": "I'm Rahul and I drive a Hyundai Creta",
+         "stage": "info_gathering",
+         "tool": ("lookup_vehicle", {"manufacturer": "Hyundai", "model": "Creta"}),
+         "reply": "The Creta is a great choice. What's the best number to reach you?"},
+        {"user": "nine eight seven six five four three two one zero",
+         "stage": "benefits",
+         "tool": None,
+         "reply": "Thanks. We offer zero depreciation cover and cashless claims at 4000+ garages."},
+        {"user": "Sounds good, evening works for me",
+         "stage": "benefits",
+         "tool": ("send_user_details", {"context_variables": {**LEAD, "preferredlanguage": "English"}}),
+         "reply": "Rahul, do you have any other questions about vehicle insurance?"},
+        {"user": "No, thank you",
+         "stage": "closing",
+         "tool": None,
+         "reply": "Thank you Rahul! It was great talking with you. Have a great day!"},
+    ],
+}
+
+
+class FakeLLM(llm.LLM):
+    """Replays a script: the turn is chosen by the latest user message."""
+
+    def __init__(self, script, language: str, think_delay: float, token_delay: float):
+        super().__init__()
+        self.turns = {turn["user"]: turn for turn in script}
+        self.language = language
+        self.think_delay = think_delay
+        self.token_delay = token_delay
+        # Round trips, and turns answered with another stage's instructions
+        self.requests = 0
+        self.wrong_stage = []
+
+    def chat(self, *, chat_ctx, tools=None, conn_options=DEFAULT_API_CONNECT_OPTIONS, **kwargs):
+        self.requests += 1
+        return FakeLLMStream(self, chat_ctx=chat_ctx, tools=tools or [], conn_options=conn_options)
+
+
+class FakeLLMStream(llm.LLMStream):
+    async def _run(self):
+        items = self._chat_ctx.items
+        user_text = next(
+            (item.text_content for item in reversed(items) if getattr(item, "role", None) == "user"), ""
+        )
+        turn = self._llm.turns.get(user_text, {"tool": None, "reply": "OK"})
+        await asyncio.sleep(self._llm.think_delay)
+
+        request_id = str(uuid.uuid4())
+        after_tool = items and items[-1].type == "function_call_output"
+        instructions = next((item.text_content for item in items if getattr(item, "role", None) == "system"), "")
+        if not after_tool and "stage" in turn and instructions != build_instructions(turn["stage"], self._llm.language):
+            self._llm.wrong_stage.append((user_text, turn["stage"]))
+        if turn["tool"] and not after_tool:
+            name, arguments = turn["tool"]
+            call = llm.FunctionToolCall(name=name, arguments=json.dumps(arguments), call_id=request_id)
+            self._event_ch.send_nowait(llm.ChatChunk(id=request_id, delta=llm.ChoiceDelta(
+                role="assistant", tool_calls=[call])))
+            return
+
+        for word in turn["reply"].split(" "):
+            self._event_ch.send_nowait(llm.ChatChunk(id=request_id, delta=llm.ChoiceDelta(
+                role="assistant", content=word + " ")))
+            await asyncio.sleep(self._llm.token_delay)
+
+
+async def start_stub_backend(delay: float):
+    """Local stand-in for POST /api/user/create and /bulk; returns (runner, base url, received leads)."""
+    received = []
+
+    async def create(request):
+        await asyncio.sleep(delay)
+        received.append(await request.json())
+        return web.json_response({"id": str(uuid.uuid4())})
+
+    async def bulk(request):
+        await asyncio.sleep(delay)
+        body = await request.json()
+        received.extend(body)
+        return web.json_response({"created": len(body), "invalid": 0,
+                                  "results": [{"index": i, "status": "created"} for i in range(len(body))]})
+
+    app = web.Application()
+    app.router.add_post("/api/user/create", create)
+    app.router.add_post("/api/user/bulk", bulk)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}", received
+
+
+async def monitor_loop_lag(histogram: LatencyHistogram, stop: asyncio.Event, interval: float = 0.01):
+    """How late the event loop wakes a sleeper; high values mean the loop is blocked."""
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        histogram.observe(time.perf_counter() - start - interval)
+
+
+async def simulate_vad(vad, cost: float, interval: float = 0.1):
+    """Blocking CPU work per audio frame, reported the way a VAD stream reports it."""
+    frames = int(interval / VAD_FRAME)
+    while True:
+        await asyncio.sleep(interval)
+        start = time.perf_counter()
+        while time.perf_counter() - start < cost * frames:
+            pass
+        vad.emit("metrics_collected", metrics.VADMetrics(
+            label="simulated", timestamp=time.time(), idle_time=0.0,
+            inference_duration_total=time.perf_counter() - start, inference_count=frames))
+
+
+async def monitor_load(samples: list, stop: asyncio.Event, interval: float = 0.5):
+    """What get_worker_load would have reported to the dispatcher during the level."""
+    while not stop.is_set():
+        await asyncio.sleep(interval)
+        samples.append(compute_load(read_reports()))
+
+
+def rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def run_session(language: str, args, turn_latency: LatencyHistogram):
+    script = SCRIPTS[language]
+    context_variables = {"callduration": datetime.now()}
+    assistant = agent.VehicleInsuranceAgent(context_variables)
+    fake_llm = FakeLLM(script, language, args.think_delay, args.token_delay)
+    async with AgentSession(llm=fake_llm) as session:
+        get_load_reporter().attach(session)
+        vad = asyncio.create_task(simulate_vad(SIMULATED_VAD, args.vad_cost_ms / 1000)) if args.vad_cost_ms else None
+        await session.start(assistant)
+        for turn in script:
+            # Caller speaking, then STT finalizing
+            await asyncio.sleep(args.speak_delay * len(turn["user"].split()))
+            start = time.perf_counter()
+            await session.run(user_input=turn["user"])
+            turn_latency.observe(time.perf_counter() - start)
+            # Agent reply being played out
+            await asyncio.sleep(args.speak_delay * len(turn["reply"].split()))
+        if vad:
+            vad.cancel()
+    assert not fake_llm.wrong_stage, f"turns answered outside their stage: {fake_llm.wrong_stage}"
+    # What a job process does when its call ends
+    get_load_reporter().report_latency(assistant.session_metrics)
+    return fake_llm.requests
+
+
+async def run_level(sessions: int, args):
+    turn_latency = LatencyHistogram()
+    loop_lag = LatencyHistogram()
+    stop = asyncio.Event()
+    loads = []
+    monitor = asyncio.create_task(monitor_loop_lag(loop_lag, stop))
+    load_monitor = asyncio.create_task(monitor_load(loads, stop))
+
+    cpu_start, wall_start = time.process_time(), time.perf_counter()
+    languages = list(SCRIPTS)
+    results = await asyncio.gather(*(run_session(languages[i % len(languages)], args, turn_latency)
+                                     for i in range(sessions)))
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+    stop.set()
+    await monitor
+    await load_monitor
+
+    llm_requests = sum(results) / sessions
+    q, lag = turn_latency.quantiles(), loop_lag.quantiles()
+    # Load while every session was up (the level's last samples are taken as sessions end)
+    peak = max(loads, key=lambda state: state["load"], default={"load": 0.0, "limit": "-"})
+    print(f"{sessions:>8} {q[0.5] * 1000:>9.0f} {q[0.95] * 1000:>9.0f} {q[0.99] * 1000:>9.0f} "
+          f"{lag[0.99] * 1000:>10.1f} {max(loop_lag.samples) * 1000:>9.1f} "
+          f"{cpu / wall:>6.0%} {rss_mb():>8.0f} {llm_requests:>8.1f} "
+          f"{peak['load']:>5.2f} {peak['limit']:>8} {'yes' if peak['load'] < load_settings()['threshold'] else 'no':>6}")
+    return q
+
+
+async def check_slow_backend(sessions: int, args) -> bool:
+    """A slow /api/user/create must not add latency to any session's turns.
+
+    Runs the same level against a prompt stub backend and one that takes
+    --slow-backend-delay seconds per lead, and compares turn p95.
+    """
+    p95 = {}
+    for label, delay in [("fast", 0.0), ("slow", args.slow_backend_delay)]:
+        runner, url, received = await start_stub_backend(delay)
+        agent.base_url = url
+        submitter = get_lead_submitter()
+        await submitter.start()
+        # Collect the previous run's sessions now rather than in a pause mid-level
+        gc.collect()
+        try:
+            p95[label] = (await run_level(sessions, args))[0.95]
+            await submitter.drain()
+        finally:
+            await submitter.aclose()
+            await runner.cleanup()
+        print(f"  {label} backend ({delay}s per lead) received {len(received)} leads")
+    added = p95["slow"] - p95["fast"]
+    # Scheduling noise between two runs of the same level stays well inside this
+    ok = added < max(0.05, 0.1 * p95["fast"])
+    print(f"{'✅' if ok else '❌'} turn p95 {p95['fast'] * 1000:.0f}ms with a fast backend, "
+          f"{p95['slow'] * 1000:.0f}ms with a {args.slow_backend_delay}s backend ({added * 1000:+.0f}ms)")
+    return ok
+
+
+async def main(args):
+    runner, url, received = await start_stub_backend(args.backend_delay)
+    agent.base_url = url
+    # What the worker's prewarm does before any call arrives
+    get_vehicle_catalog()
+    get_load_reporter().watch_vad(SIMULATED_VAD)
+    # One unmeasured session so lazy imports and first-use setup don't count as lag
+    await run_session("English", args, LatencyHistogram())
+    submitter = get_lead_submitter()
+    await submitter.start()
+
+    # A turn's floor is think delay + reply tokens; anything above it is contention
+    print(f"think={args.think_delay}s token={args.token_delay}s speak={args.speak_delay}s/word "
+          f"backend={args.backend_delay}s vad={args.vad_cost_ms}ms/frame admit below load {load_settings()['threshold']}")
+    print(f"{'sessions':>8} {'turn p50':>9} {'turn p95':>9} {'turn p99':>9} "
+          f"{'lag p99ms':>10} {'lag max':>9} {'cpu':>6} {'rss MB':>8} {'llm/call':>8} "
+          f"{'load':>5} {'limit':>8} {'admit':>6}")
+    try:
+        if args.check_slow_backend:
+            await submitter.aclose()
+            return await check_slow_backend(max(args.sessions), args)
+        for sessions in args.sessions:
+            await run_level(sessions, args)
+        await submitter.drain()
+        print(f"\n✅ Backend stub received {len(received)} leads (1 from warm-up)")
+        # What the worker's load_fnc does with the reports the calls left behind
+        calls = 1 + sum(args.sessions)
+        merged = collect_latency()
+        lookups = get_worker_metrics().histograms["tool_lookup_vehicle"].count
+        print(f"{'✅' if merged == calls == lookups else '❌'} worker merged latency reports of "
+              f"{merged}/{calls} calls ({lookups} lookup_vehicle samples)")
+        return merged == calls == lookups
+    finally:
+        await submitter.aclose()
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 5, 10, 25, 50])
+    parser.add_argument("--think-delay", type=float, default=0.3, help="LLM time to first token (s)")
+    parser.add_argument("--token-delay", type=float, default=0.01, help="delay between LLM tokens (s)")
+    parser.add_argument("--speak-delay", type=float, default=0.05, help="speech time per word (s)")
+    parser.add_argument("--backend-delay", type=float, default=0.5, help="stub /api/user/create latency (s)")
+    parser.add_argument("--vad-cost-ms", type=float, default=0.0,
+                        help="simulated VAD inference CPU per 32ms audio frame (ms)")
+    parser.add_argument("--check-slow-backend", action="store_true",
+                        help="fail unless a slow lead backend leaves turn latency unchanged")
+    parser.add_argument("--slow-backend-delay", type=float, default=5.0)
+    sys.exit(0 if asyncio.run(main(parser.parse_args())) else 1)
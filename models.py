@@ -16,4 +16,24 @@ class Car(BaseModel):
     power_bhp: str
     transmission: str
     safety_rating: str
-    features: List[str]
\ No newline at end of file
+    features: List[str]
+
+
+# Column order of the car dataset CSVs
+CSV_COLUMNS = [
+    'manufacturer',
+    'model_name',
+    'variant_name',
+    'manufacturing_year',
+    'showroom_price',
+    'fuel_type',
+    'engine_capacity_cc',
+    'body_type',
+    'seating_capacity',
+    'transmission',
+    'power_bhp',
+    'torque_nm',
+    'mileage_kmpl',
+    'safety_rating',
+    'features'
+]
@@ -0,0 +1,125 @@
+import glob
+import os
+
+import pandas as pd
+
+LAKH = 100_000
+CRORE = 10_000_000
+UNIT_MULTIPLIER = {"lakh": LAKH, "cr": CRORE, "crore": CRORE}
+
+# Scraped values outside these bounds are extraction errors, not real cars
+ENGINE_CC_RANGE = (50, 9000)
+SEATING_RANGE = (1, 15)
+
+# Typed columns added by normalize_car_data, with their nullable dtypes
+NUMERIC_COLUMNS = {
+    "price_min_inr": "Int64",
+    "price_max_inr": "Int64",
+    "power_bhp_value": "Float64",
+    "torque_nm_value": "Float64",
+    "mileage_kmpl_value": "Float64",
+    "range_km": "Float64",
+    "engine_cc": "Int64",
+    "seating": "Int64",
+    "safety_stars": "Int64",
+}
+
+_PRICE_PATTERN = (
+    r"(?P<low>\d+(?:\.\d+)?)\s*(?P<low_unit>lakh|crore|cr)?"
+    r"(?:\s*-\s*₹?\s*(?P<high>\d+(?:\.\d+)?)\s*(?P<high_unit>lakh|crore|cr)?)?"
+)
+_NUMBER_UNIT_PATTERN = r"(?P<value>\d+(?:\.\d+)?)\s*(?P<unit>[a-z]+)?"
+
+
+def _text(series: pd.Series) -> pd.Series:
+    """Lowercased string view of a column; missing values stay NA."""
+    return series.astype("string").str.lower().str.replace(",", "", regex=False)
+
+
+def _bounded(values: pd.Series, low: float, high: float) -> pd.Series:
+    return values.where((values >= low) & (values <= high))
+
+
+def parse_price(series: pd.Series):
+    """'₹59.89 - 73.89 Lakh' / '₹97.80 Lakh - 1.12 Cr' -> (min, max) in rupees."""
+    parts = _text(series).str.extract(_PRICE_PATTERN)
+    # A unit written once applies to both ends of the range
+    low_unit = parts["low_unit"].fillna(parts["high_unit"])
+    high_unit = parts["high_unit"].fillna(parts["low_unit"])
+    low = pd.to_numeric(parts["low"]) * low_unit.map(UNIT_MULTIPLIER).astype("Float64")
+    high = pd.to_numeric(parts["high"]).fillna(pd.to_numeric(parts["low"])) * high_unit.map(UNIT_MULTIPLIER).astype("Float64")
+    return low.round().astype("Int64"), high.round().astype("Int64")
+
+
+def parse_quantity(series: pd.Series, units) -> pd.Series:
+    """First number in each value, kept only when its unit is in `units` (a bare number is accepted)."""
+    parts = _text(series).str.extract(_NUMBER_UNIT_PATTERN)
+    value = pd.to_numeric(parts["value"]).astype("Float64")
+    return value.where(parts["unit"].isna() | parts["unit"].isin(units))
+
+
+def normalize_car_data(df: pd.DataFrame) -> pd.DataFrame:
+    """Return a copy of the scraped car table with typed numeric columns added.
+
+    The original string columns are left untouched. Unparseable values such as
+    "Not Applicable" become <NA> in the nullable Int64/Float64 columns.
+    """
+    out = df.copy()
+    out["price_min_inr"], out["price_max_inr"] = parse_price(df["showroom_price"])
+    out["power_bhp_value"] = parse_quantity(df["power_bhp"], ["bhp", "hp", "ps"])
+    out["torque_nm_value"] = parse_quantity(df["torque_nm"], ["nm"])
+
+    mileage = _text(df["mileage_kmpl"]).str.extract(_NUMBER_UNIT_PATTERN)
+    mileage_value = pd.to_numeric(mileage["value"]).astype("Float64")
+    # Electric cars report range in km instead of kmpl
+    is_range = mileage["unit"].isin(["km", "kms"])
+    out["mileage_kmpl_value"] = mileage_value.where(~is_range)
+    out["range_km"] = mileage_value.where(is_range)
+
+    engine = pd.to_numeric(df["engine_capacity_cc"], errors="coerce")
+    out["engine_cc"] = _bounded(engine, *ENGINE_CC_RANGE).round().astype("Int64")
+    seating = pd.to_numeric(df["seating_capacity"], errors="coerce")
+    out["seating"] = _bounded(seating, *SEATING_RANGE).round().astype("Int64")
+
+    stars = _text(df["safety_rating"]).str.extract(r"(\d)\s*star", expand=False)
+    out["safety_stars"] = pd.to_numeric(stars).astype("Int64")
+
+    for column, dtype in NUMERIC_COLUMNS.items():
+        out[column] = out[column].astype(dtype)
+    return out
+
+
+def normalized_path(csv_filename: str) -> str:
+    return os.path.splitext(csv_filename)[0] + ".parquet"
+
+
+def write_normalized(df: pd.DataFrame, csv_filename: str) -> str:
+    """Normalize `df` and write it as Parquet next to `csv_filename`."""
+    path = normalized_path(csv_filename)
+    normalized = normalize_car_data(df)
+    # The index column pandas adds to some of the combined CSVs carries no data
+    normalized = normalized.loc[:, ~normalized.columns.str.startswith("Unnamed")]
+    normalized.to_parquet(path, index=False)
+    return path
+
+
+def load_normalized(path: str) -> pd.DataFrame:
+    return pd.read_parquet(path, dtype_backend="numpy_nullable")
+
+
+if __name__ == "__main__":
+    import tempfile
+
+    # Round trip every scraped CSV through Parquet and check nothing is lost (in a temp dir, not data/)
+    workdir = tempfile.mkdtemp()
+    for csv_file in sorted(glob.glob(os.path.join("data", "*.csv"))):
+        df = pd.read_csv(csv_file)
+        path = write_normalized(df, os.path.join(workdir, os.path.basename(csv_file)))
+        loaded = load_normalized(path)
+        expected = normalize_car_data(df)
+        for column, dtype in NUMERIC_COLUMNS.items():
+            assert str(loaded[column].dtype) == dtype, (column, loaded[column].dtype)
+            pd.testing.assert_series_equal(loaded[column], expected[column].reset_index(drop=True),
+                                           check_names=False)
+        coverage = ", ".join(f"{c}={loaded[c].notna().mean():.0%}" for c in NUMERIC_COLUMNS)
+        print(f"✅ {csv_file} -> {path} ({len(loaded)} rows) {coverage}")
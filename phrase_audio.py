@@ -0,0 +1,417 @@
+"""Pre-rendered audio for the agent's fixed script lines.
+
+Every static line (and the static parts of name-templated lines) is
+synthesized once and stored as raw 16-bit PCM in a single file that every
+worker process on the host memory-maps read-only, so the audio lives once
+in the page cache. A reply whose text is exactly one of these lines is
+played from the file instead of going through TTS; for "धन्यवाद {name} जी!"
+only the name is synthesized and spliced between the cached parts.
+
+File layout: MAGIC, a little-endian u32 index length, the JSON index
+(version, sample rate, channels, text -> [offset, length]), then the PCM.
+"""
+import asyncio
+import fcntl
+import hashlib
+import json
+import mmap
+import os
+import re
+import struct
+import time
+from typing import AsyncIterable, Callable, Dict, List, Optional
+
+from livekit import rtc
+
+from prompts import GREETING, PHRASES
+
+MAGIC = b"PHRPCM01"
+FRAME_MS = 20
+# Longest name spliced into a template, in characters and in words
+MAX_NAME_CHARS = 30
+MAX_NAME_WORDS = 3
+NAME_PATTERN = re.compile(r"\{name\}")
+# A name never runs across punctuation
+NAME_BREAK = re.compile(r"[.,!?।\n]")
+
+# A TTS node: text chunks in, audio frames out
+Synthesize = Callable[[AsyncIterable[str]], AsyncIterable[rtc.AudioFrame]]
+
+
+def phrase_audio_path() -> str:
+    """PHRASE_AUDIO_PATH, read when used so a .env loaded after import applies."""
+    return os.getenv("PHRASE_AUDIO_PATH", "phrase_audio.pcm")
+
+
+def _normalize(text: str) -> str:
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def _could_be_name(text: str) -> bool:
+    """Whether `text` can be (the start of) a customer's name."""
+    return len(text) <= MAX_NAME_CHARS and len(text.split()) <= MAX_NAME_WORDS and not NAME_BREAK.search(text)
+
+
+class _Template:
+    """A script line split around its {name} slot (or a static line with no slot)."""
+
+    def __init__(self, text: str):
+        parts = NAME_PATTERN.split(_normalize(text), maxsplit=1)
+        self.prefix = parts[0]
+        self.suffix = parts[1] if len(parts) > 1 else None
+        self.max_chars = len(self.prefix) + (len(self.suffix) + MAX_NAME_CHARS if self.suffix is not None else 0)
+
+    def segments(self) -> List[str]:
+        return [s for s in (self.prefix, self.suffix) if s]
+
+    def could_match(self, text: str) -> bool:
+        """Whether `text` can still grow into this line."""
+        if len(text) > self.max_chars:
+            return False
+        if len(text) <= len(self.prefix):
+            return self.prefix.startswith(text)
+        if self.suffix is None or not text.startswith(self.prefix):
+            return False
+        rest = text[len(self.prefix):]
+        # Some split of rest into name + start of suffix must exist. For a line that opens with
+        # the name this is what lets an ordinary reply go to TTS after its first few words.
+        return any(self.suffix.startswith(rest[i:]) and _could_be_name(rest[:i])
+                   for i in range(min(len(rest), MAX_NAME_CHARS) + 1))
+
+    def match(self, text: str) -> Optional[str]:
+        """The name if `text` is exactly this line, "" for a static line, else None."""
+        if self.suffix is None:
+            return "" if text == self.prefix else None
+        if not (text.startswith(self.prefix) and text.endswith(self.suffix)):
+            return None
+        name = text[len(self.prefix):len(text) - len(self.suffix)].strip()
+        if name and _could_be_name(name):
+            return name
+        return None
+
+
+def script_lines() -> List[str]:
+    """Every line the cache covers: the call greeting plus the scripted lines in both languages."""
+    return [GREETING] + [text for phrases in PHRASES.values() for text in phrases.values()]
+
+
+def phrase_version(voice: str, sample_rate: int, num_channels: int, lines: List[str]) -> str:
+    """Changes whenever a line, the voice or the audio format changes, so stale audio is never played."""
+    payload = json.dumps([voice, sample_rate, num_channels, sorted(lines)], ensure_ascii=False)
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+
+class PhraseAudio:
+    """Read-only, memory-mapped view of a phrase audio file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self.inode = os.fstat(f.fileno()).st_ino
+        if self._mmap[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a phrase audio file")
+        (index_len,) = struct.unpack_from("<I", self._mmap, len(MAGIC))
+        start = len(MAGIC) + 4
+        index = json.loads(self._mmap[start:start + index_len])
+        self.version = index["version"]
+        self.sample_rate = index["sample_rate"]
+        self.num_channels = index["num_channels"]
+        self.segments: Dict[str, List[int]] = index["segments"]
+        self.data_offset = start + index_len
+        self.templates = [_Template(line) for line in index["lines"]]
+        self.hits = 0
+        self.spliced = 0
+        self.misses = 0
+
+    def pcm(self, text: str) -> memoryview:
+        offset, length = self.segments[text]
+        start = self.data_offset + offset
+        return memoryview(self._mmap)[start:start + length]
+
+    def frames(self, text: str) -> List[rtc.AudioFrame]:
+        """The cached segment cut into FRAME_MS frames; the bytes are copied out of the map per frame."""
+        pcm = self.pcm(text)
+        samples = self.sample_rate * FRAME_MS // 1000
+        step = samples * self.num_channels * 2
+        return [
+            rtc.AudioFrame(bytes(pcm[i:i + step]), self.sample_rate, self.num_channels,
+                           len(pcm[i:i + step]) // (2 * self.num_channels))
+            for i in range(0, len(pcm), step)
+        ]
+
+    def could_match(self, text: str) -> bool:
+        text = _normalize(text)
+        return any(t.could_match(text) for t in self.templates)
+
+    def match(self, text: str):
+        """(template, name) for a reply that is exactly a cached line, else None."""
+        text = _normalize(text)
+        for template in self.templates:
+            name = template.match(text)
+            if name is not None:
+                return template, name
+        return None
+
+    async def speak(self, text: AsyncIterable[str], synthesize: Synthesize,
+                    sample_rate: Optional[int] = None) -> AsyncIterable[rtc.AudioFrame]:
+        """TTS node: play a cached line from the file, otherwise stream `text` through `synthesize`.
+
+        Text is only held back while it can still turn into a cached line,
+        so other replies start synthesizing after their first chunk or two.
+        """
+        chunks = text.__aiter__()
+        buffered = ""
+        ended = False
+        if sample_rate in (None, self.sample_rate):
+            while True:
+                try:
+                    buffered += await chunks.__anext__()
+                except StopAsyncIteration:
+                    ended = True
+                    break
+                if not self.could_match(buffered):
+                    break
+
+        matched = self.match(buffered) if ended else None
+        if matched is None:
+            self.misses += 1
+
+            async def replay():
+                if buffered:
+                    yield buffered
+                async for chunk in chunks:
+                    yield chunk
+
+            async for frame in synthesize(replay()):
+                yield frame
+            return
+
+        template, name = matched
+        self.hits += 1
+        if not name:
+            for frame in self.frames(template.prefix):
+                yield frame
+            return
+
+        # Synthesize the name while the cached prefix is already playing
+        self.spliced += 1
+        name_frames = asyncio.Queue()
+
+        async def synthesize_name():
+            try:
+                async def name_text():
+                    yield name
+                async for frame in synthesize(name_text()):
+                    name_frames.put_nowait(frame)
+            finally:
+                name_frames.put_nowait(None)
+
+        task = asyncio.create_task(synthesize_name())
+        try:
+            if template.prefix:
+                for frame in self.frames(template.prefix):
+                    yield frame
+            while (frame := await name_frames.get()) is not None:
+                yield frame
+            await task
+            for frame in self.frames(template.suffix):
+                yield frame
+        finally:
+            task.cancel()
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "spliced": self.spliced, "misses": self.misses}
+
+    def close(self):
+        self._mmap.close()
+
+
+def tts_synthesizer(tts) -> Callable[[str], AsyncIterable[rtc.AudioFrame]]:
+    """One-shot synthesis of a whole text with a livekit TTS, for build_phrase_audio."""
+
+    async def synthesize_text(text: str):
+        async with tts.synthesize(text) as stream:
+            async for audio in stream:
+                yield audio.frame
+
+    return synthesize_text
+
+
+async def build_phrase_audio(synthesize_text: Callable[[str], AsyncIterable[rtc.AudioFrame]], voice: str,
+                             sample_rate: int, num_channels: int, path: Optional[str] = None,
+                             lines: Optional[List[str]] = None) -> Optional[str]:
+    """Synthesize every cached segment once and write the phrase audio file.
+
+    Only one process on the host builds at a time; if another holds the lock
+    this returns None and the caller keeps using live TTS until the file appears.
+    """
+    path = path or phrase_audio_path()
+    lines = lines or script_lines()
+    version = phrase_version(voice, sample_rate, num_channels, lines)
+    lock = open(f"{path}.lock", "w")
+    try:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return None
+        if _file_version(path) == version:
+            return path
+
+        segments, chunks, offset = {}, [], 0
+        for text in dict.fromkeys(s for line in lines for s in _Template(line).segments()):
+            pcm = b"".join([bytes(frame.data) async for frame in synthesize_text(text)])
+            segments[text] = [offset, len(pcm)]
+            chunks.append(pcm)
+            offset += len(pcm)
+
+        index = json.dumps({
+            "version": version,
+            "sample_rate": sample_rate,
+            "num_channels": num_channels,
+            "lines": lines,
+            "segments": segments,
+        }, ensure_ascii=False).encode()
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(MAGIC + struct.pack("<I", len(index)) + index)
+            for pcm in chunks:
+                f.write(pcm)
+        os.replace(tmp, path)
+        print(f"[DEBUG] Phrase audio written to {path}: {len(segments)} segments, {offset / 2**20:.1f} MB")
+        return path
+    finally:
+        lock.close()
+
+
+def _file_version(path: str) -> Optional[str]:
+    try:
+        audio = PhraseAudio(path)
+    except (OSError, ValueError):
+        return None
+    version = audio.version
+    audio.close()
+    return version
+
+
+_phrase_audio: Optional[PhraseAudio] = None
+
+
+def get_phrase_audio(voice: str, sample_rate: int, num_channels: int,
+                     path: Optional[str] = None) -> Optional[PhraseAudio]:
+    """This process's map of the phrase audio file, or None if no file for this voice exists yet.
+
+    The file is re-opened when another worker has replaced it.
+    """
+    global _phrase_audio
+    path = path or phrase_audio_path()
+    version = phrase_version(voice, sample_rate, num_channels, script_lines())
+    try:
+        inode = os.stat(path).st_ino
+    except OSError:
+        return None
+    if _phrase_audio is None or _phrase_audio.inode != inode:
+        try:
+            _phrase_audio = PhraseAudio(path)
+        except (OSError, ValueError) as e:
+            print(f"[ERROR] Could not open phrase audio {path}: {e}")
+            _phrase_audio = None
+            return None
+    return _phrase_audio if _phrase_audio.version == version else None
+
+
+_build_task: Optional[asyncio.Task] = None
+
+
+def ensure_phrase_audio(tts, voice: str, path: Optional[str] = None) -> Optional[PhraseAudio]:
+    """get_phrase_audio, starting a background build with `tts` if the file is missing or stale."""
+    global _build_task
+    path = path or phrase_audio_path()
+    audio = get_phrase_audio(voice, tts.sample_rate, tts.num_channels, path)
+    if audio is None and (_build_task is None or _build_task.done()):
+
+        async def build():
+            try:
+                await build_phrase_audio(tts_synthesizer(tts), voice, tts.sample_rate, tts.num_channels, path)
+            except Exception as e:
+                print(f"[ERROR] Building phrase audio failed: {e}")
+
+        _build_task = asyncio.create_task(build())
+    return audio
+
+
+if __name__ == "__main__":
+    import math
+    import tempfile
+
+    SAMPLE_RATE = 22050
+    TTS_LATENCY = 0.3  # time to first audio of a typical cloud TTS request
+
+    class FakeTTS:
+        """Deterministic stand-in for sarvam.TTS: a tone per character after a fixed latency."""
+
+        def __init__(self):
+            self.requests = 0
+            self.characters = 0
+
+        async def synthesize(self, text: AsyncIterable[str]) -> AsyncIterable[rtc.AudioFrame]:
+            self.requests += 1
+            first = True
+            async for chunk in text:
+                self.characters += len(chunk)
+                if first:
+                    await asyncio.sleep(TTS_LATENCY)
+                    first = False
+                samples = SAMPLE_RATE * 30 // 1000  # 30ms of audio per character
+                for ch in chunk:
+                    tone = [int(3000 * math.sin(2 * math.pi * (200 + ord(ch) % 300) * i / SAMPLE_RATE))
+                            for i in range(samples)]
+                    yield rtc.AudioFrame(struct.pack(f"<{samples}h", *tone), SAMPLE_RATE, 1, samples)
+
+        def synthesize_text(self, text: str) -> AsyncIterable[rtc.AudioFrame]:
+            async def once():
+                yield text
+            return self.synthesize(once())
+
+    async def chunked(text: str, size: int = 12, delay: float = 0.005):
+        """LLM-like text stream."""
+        for i in range(0, len(text), size):
+            await asyncio.sleep(delay)
+            yield text[i:i + size]
+
+    async def first_audio(audio: PhraseAudio, fake: FakeTTS, text: str, size: int, delay: float):
+        start = time.perf_counter()
+        first, total = None, 0
+        async for frame in audio.speak(chunked(text, size, delay), fake.synthesize):
+            first = first or time.perf_counter() - start
+            total += frame.samples_per_channel
+        return first, total / SAMPLE_RATE
+
+    async def main():
+        path = os.path.join(tempfile.mkdtemp(), "phrase_audio.pcm")
+        fake = FakeTTS()
+        start = time.perf_counter()
+        await build_phrase_audio(fake.synthesize_text, "fake", SAMPLE_RATE, 1, path)
+        print(f"🎙️ Built {path} in {time.perf_counter() - start:.1f}s with {fake.requests} TTS requests")
+        again = await build_phrase_audio(fake.synthesize_text, "fake", SAMPLE_RATE, 1, path)
+        print(f"🎙️ Rebuild with the same version: {fake.requests} TTS requests in total (reused: {again == path})")
+
+        audio = get_phrase_audio("fake", SAMPLE_RATE, 1, path)
+        replies = [
+            # session.say() hands over the whole text at once; LLM replies arrive in chunks
+            ("greeting (say)", GREETING, len(GREETING), 0.005),
+            ("goodbye (spliced)", PHRASES["Hindi"]["goodbye"].format(name="राहुल"), 12, 0.005),
+            ("questions (spliced)", PHRASES["English"]["final_questions"].format(name="Rahul"), 12, 0.005),
+            ("other reply", "अच्छा, टाटा नेक्सन बहुत अच्छी गाड़ी है। आपका नंबर क्या है?", 12, 0.005),
+            # Short replies at a token's pace: could be a name-first line until a few words in
+            ("short reply", "जी हाँ, बिल्कुल। बताइए", 4, 0.04),
+            ("short reply (no ,)", "Sure thing let me check", 4, 0.04),
+        ]
+        print(f"{'reply':<22} {'first audio':>12} {'audio':>8} {'TTS chars':>10}")
+        for label, text, size, delay in replies:
+            chars = fake.characters
+            first, seconds = await first_audio(audio, fake, text, size, delay)
+            print(f"{label:<22} {first * 1000:>10.1f}ms {seconds:>7.1f}s {fake.characters - chars:>10}")
+        print(f"📊 {audio.stats()} (live TTS first audio is ~{TTS_LATENCY * 1000:.0f}ms plus LLM time)")
+
+    asyncio.run(main())
@@ -0,0 +1,169 @@
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from normalize import normalize_car_data
+from vehicle_catalog import VehicleCatalog, get_vehicle_catalog
+
+# IRDAI depreciation for IDV by vehicle age in whole years: under 1 year 5%, 1-2 years 20%,
+# 2-3 years 30%, 3-4 years 40%, 4 years and older 50%
+DEPRECIATION = np.array([0.05, 0.20, 0.30, 0.40, 0.50, 0.50])
+MAX_AGE = len(DEPRECIATION) - 1
+
+# Own-damage rate (share of IDV) and third-party premium (₹) by engine size
+CC_BANDS = np.array([1000, 1500])          # upper bounds: <=1000, <=1500, >1500
+OD_RATES = np.array([0.03127, 0.03283, 0.03440])
+TP_PREMIUMS = np.array([2094, 3416, 7897])
+
+# Electric cars: third-party premium by motor power in kW, flat own-damage rate
+KW_BANDS = np.array([30, 65])              # upper bounds: <=30, <=65, >65
+EV_TP_PREMIUMS = np.array([1780, 2904, 6712])
+EV_OD_RATE = 0.03127
+BHP_TO_KW = 0.7457
+
+# Catalog columns the premium bands are computed from
+RATING_COLUMNS = ["manufacturer", "model_name", "showroom_price", "fuel_type", "engine_capacity_cc", "power_bhp", "torque_nm",
+                  "mileage_kmpl", "seating_capacity", "safety_rating"]
+
+# Typical own-damage discount plus no-claim bonus a renewing customer can get
+MAX_OD_DISCOUNT = 0.50
+GST = 0.18
+
+
+class RatingTable:
+    """Premium bands for every catalog row and every vehicle age, computed up front.
+
+    All arrays are indexed by catalog row id (the row's position in the
+    dataset file); the 2-D ones have one column per age from 0 to MAX_AGE.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        specs = normalize_car_data(df)
+        price_min = specs["price_min_inr"].astype("float64").to_numpy(na_value=np.nan)
+        price_max = specs["price_max_inr"].astype("float64").to_numpy(na_value=np.nan)
+        engine_cc = specs["engine_cc"].astype("float64").to_numpy(na_value=np.nan)
+        power_kw = specs["power_bhp_value"].astype("float64").to_numpy(na_value=np.nan) * BHP_TO_KW
+        electric = df["fuel_type"].astype(str).str.contains("electric", case=False).to_numpy()
+        # A variant without a listed power takes its model's median
+        model = (df["manufacturer"].astype(str).str.strip().str.lower() + "|"
+                 + df["model_name"].astype(str).str.strip().str.lower()).to_numpy()
+        power_kw = np.where(np.isnan(power_kw), pd.Series(power_kw).groupby(model).transform("median").to_numpy(),
+                            power_kw)
+
+        # Rows x ages
+        keep = 1 - DEPRECIATION[np.newaxis, :]
+        idv_min = price_min[:, np.newaxis] * keep
+        idv_max = price_max[:, np.newaxis] * keep
+
+        cc_band = np.searchsorted(CC_BANDS, np.nan_to_num(engine_cc, nan=0), side="left")
+        kw_band = np.searchsorted(KW_BANDS, np.nan_to_num(power_kw, nan=0), side="left")
+        od_rate = np.where(electric, EV_OD_RATE, OD_RATES[cc_band])
+        third_party = np.where(electric, EV_TP_PREMIUMS[kw_band], TP_PREMIUMS[cc_band]).astype("float64")
+        # Without an engine size for a non-EV, or any power figure for an EV model, the third-party slab is unknown
+        third_party[np.isnan(engine_cc) & ~electric] = np.nan
+        third_party[np.isnan(power_kw) & electric] = np.nan
+
+        own_damage_min = idv_min * od_rate[:, np.newaxis] * (1 - MAX_OD_DISCOUNT)
+        own_damage_max = idv_max * od_rate[:, np.newaxis]
+        third_party = np.repeat(third_party[:, np.newaxis], len(DEPRECIATION), axis=1)
+        total_min = (own_damage_min + third_party) * (1 + GST)
+        total_max = (own_damage_max + third_party) * (1 + GST)
+
+        # Rounded to ₹100 and turned into nested lists once, so a lookup is plain indexing
+        self.bands = {
+            name: (_rounded(low), _rounded(high))
+            for name, low, high in [
+                ("idv_inr", idv_min, idv_max),
+                ("own_damage_premium_inr", own_damage_min, own_damage_max),
+                ("third_party_premium_inr", third_party, third_party),
+                ("total_premium_with_gst_inr", total_min, total_max),
+            ]
+        }
+        self.size = len(df)
+
+    @classmethod
+    def load(cls, catalog: Optional[VehicleCatalog] = None) -> "RatingTable":
+        """Built from the catalog's own columns, so row ids line up with it whatever it was loaded from."""
+        catalog = catalog or get_vehicle_catalog()
+        return cls(pd.DataFrame({name: list(catalog.columns[name]) for name in RATING_COLUMNS}))
+
+    def estimate(self, row_id: int, age: int) -> Dict[str, Any]:
+        """Indexed read of the precomputed bands for one catalog row."""
+        age = min(max(age, 0), MAX_AGE)
+        estimate = {"vehicle_age_years": age}
+        for name, (low, high) in self.bands.items():
+            lo, hi = low[row_id][age], high[row_id][age]
+            estimate[name] = {"min": lo, "max": hi} if lo is not None and hi is not None else None
+        return estimate
+
+
+def _rounded(values: np.ndarray) -> list:
+    """Rows x ages floats as nested lists of ints rounded to ₹100, None where unknown."""
+    rounded = np.nan_to_num(np.round(values, -2)).astype(np.int64).astype(object)
+    rounded[np.isnan(values)] = None
+    return rounded.tolist()
+
+
+def vehicle_age(year: Any, today: Optional[datetime] = None) -> int:
+    """Age in whole years from a model year like "2021"; unknown years count as new."""
+    try:
+        return max(0, (today or datetime.now()).year - int(str(year).strip()[:4]))
+    except ValueError:
+        return 0
+
+
+_rating_table: Optional[RatingTable] = None
+
+
+def get_rating_table() -> RatingTable:
+    """Process-wide rating table over the process's vehicle catalog."""
+    global _rating_table
+    if _rating_table is None:
+        _rating_table = RatingTable.load()
+    return _rating_table
+
+
+def estimate_premium(manufacturer: str, model: str, variant: str = "", year: str = "", limit: int = 3):
+    catalog = get_vehicle_catalog()
+    table = get_rating_table()
+    age = vehicle_age(year)
+    estimates = []
+    for row_id in catalog.match_ids(manufacturer, model, variant)[:limit]:
+        columns = catalog.columns
+        estimates.append({
+            "manufacturer": columns["manufacturer"][row_id],
+            "model": columns["model_name"][row_id],
+            "variant": columns["variant_name"][row_id],
+            **table.estimate(row_id, age),
+        })
+    return estimates
+
+
+if __name__ == "__main__":
+    catalog = get_vehicle_catalog()
+    df = pd.DataFrame({name: list(catalog.columns[name]) for name in RATING_COLUMNS})
+    for label, frame in [("catalog", df), ("synthetic", pd.concat([df] * 422, ignore_index=True))]:
+        start = time.perf_counter()
+        table = RatingTable(frame)
+        elapsed = time.perf_counter() - start
+        start = time.perf_counter()
+        normalize_car_data(frame)
+        parse = time.perf_counter() - start
+        print(f"📊 {label:<9} rating table for {table.size} rows x {MAX_AGE + 1} ages in {elapsed * 1000:.1f}ms "
+              f"(parsing the scraped strings alone: {parse * 1000:.1f}ms)")
+
+    table = get_rating_table()
+    row_id = catalog.match_ids("Tata", "Nexon")[0]
+    repeat = 10_000
+    start = time.perf_counter()
+    for _ in range(repeat):
+        table.estimate(row_id, 3)
+    print(f"📊 single estimate (indexed read): {(time.perf_counter() - start) / repeat * 1e6:.1f}µs")
+    start = time.perf_counter()
+    for _ in range(repeat):
+        estimate_premium("Tata", "Nexon", "", "2022")
+    print(f"📊 estimate_premium with catalog match: {(time.perf_counter() - start) / repeat * 1e6:.1f}µs")
+    print(estimate_premium("Tata", "Nexon", "", "2022"))
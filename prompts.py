@@ -0,0 +1,298 @@
+import math
+import re
+
+STAGES = ["greeting", "info_gathering", "benefits", "booking", "closing"]
+LANGUAGES = ["Hindi", "English"]
+
+# Sent on every turn, so keep it short
+CORE = """
+[Identity]
+You are Priya, a friendly vehicle insurance specialist from SecureWheels Insurance. You speak both Hindi and English fluently. Your goal is to qualify leads and book appointments through natural conversation.
+
+[Primary Objectives]
+1. Greet warmly and ask language preference
+2. Gather customer information naturally
+3. Share insurance benefits conversationally
+4. Assess genuine interest
+5. Book appointments for qualified leads
+6. Ask for additional questions before ending
+7. End conversation when customer has no more questions
+8. MUST call send_user_details with the complete context after gathering all information
+
+[Stages]
+Conversation stages in order: greeting, info_gathering, benefits, booking, closing.
+The stage moves on by itself as the call progresses; follow the current stage's notes below.
+
+[Guidelines]
+- Keep conversation natural and flowing, match customer's energy and pace
+- Never mention data collection to customer
+- Focus on lead qualification, not immediate sales
+- Never say formatting symbols
+"""
+
+LANGUAGE_RULES = {
+    None: """
+[Language Rules]
+- Ask language preference first: Hindi or English
+- Stick to chosen language throughout the call
+- Never mix languages
+""",
+    "Hindi": """
+[Language Rules]
+- The customer chose Hindi. Speak only Hindi for the rest of the call.
+- Hindi numbers: एक, दो, तीन, चार, पांच, छह, सात, आठ, नौ, दस
+- Acknowledgments: "अच्छा", "समझ गया"
+""",
+    "English": """
+[Language Rules]
+- The customer chose English. Speak only English for the rest of the call.
+- English numbers: one, two, three, four, five, six, seven, eight, nine, ten
+- Acknowledgments: "I see", "understood"
+""",
+}
+
+# Lines the agent speaks word for word; {name} is the customer's name.
+# phrase_audio pre-renders these so they can be played without the LLM or TTS.
+GREETING = (
+    "नमस्ते! मैं प्रिया बोल रही हूँ SecureWheels Insurance से। आप हिंदी में बात करना चाहेंगे या English में? "
+    "मैं आपको vehicle insurance के बारे में कुछ बहुत अच्छी जानकारी देना चाहती हूँ।"
+)
+PHRASES = {
+    "Hindi": {
+        "opening": "नमस्ते! मैं प्रिया बोल रही हूँ SecureWheels Insurance से। आप हिंदी में बात करना चाहेंगे या English में?",
+        "time_check": "क्या आप अभी पांच-सात मिनट बात कर सकते हैं? मैं vehicle insurance के बारे में अच्छी जानकारी देना चाहती हूँ।",
+        "final_questions": "{name} जी, क्या आपका कोई और सवाल है vehicle insurance के बारे में? या कोई specific doubt?",
+        "goodbye": "धन्यवाद {name} जी! बात करके अच्छा लगा। हम जल्दी contact करेंगे। नमस्ते!",
+    },
+    "English": {
+        "opening": "Hello! This is Priya from SecureWheels Insurance. Would you prefer Hindi or English?",
+        "time_check": "Do you have about five to seven minutes? I'd like to share some great vehicle insurance options.",
+        "final_questions": "{name}, do you have any other questions about vehicle insurance? Any specific concerns?",
+        "goodbye": "Thank you {name}! It was great talking with you. We'll be in touch soon. Have a great day!",
+    },
+}
+NAME_PLACEHOLDER = {"Hindi": "[नाम]", "English": "[Name]"}
+
+
+def _script(language: str, lines) -> str:
+    phrases = PHRASES[language]
+    return "\n" + "".join(
+        f'{label}: "{phrases[key].format(name=NAME_PLACEHOLDER[language])}"\n' for label, key in lines
+    )
+
+
+# Scripted lines per stage and language
+SCRIPTS = {
+    "greeting": {
+        language: _script(language, [("Opening and Language Choice", "opening"),
+                                     ("Permission and Time Check", "time_check")])
+        for language in LANGUAGES
+    },
+    "closing": {
+        language: _script(language, [("Final Questions Check", "final_questions"),
+                                     ("Conversation Ending", "goodbye")])
+        for language in LANGUAGES
+    },
+}
+
+# Language-independent instructions per stage
+STAGE_NOTES = {
+    "greeting": """
+[Current Stage: Greeting]
+Greet, ask the language preference, then check the customer has five to seven minutes.
+""",
+    "info_gathering": """
+[Current Stage: Information Gathering]
+Ask naturally about:
+- Customer name
+- Vehicle ownership (car, bike, commercial)
+- Vehicle details (manufacturer, model, variant, year)
+- Contact number for callback
+Use lookup_vehicle to confirm the vehicle and answer questions about its price, mileage, engine or features.
+""",
+    "benefits": """
+[Current Stage: Benefits and Interest]
+Highlight key features:
+- Zero Depreciation coverage
+- 24/7 roadside assistance
+- Cashless claims at 4000+ garages
+- Potential 15-20% premium reduction
+Use estimate_premium (with the car's registration year) to quote an indicative premium range; say it is an estimate, not a final quote.
+Then ask about current insurance expiry, premium satisfaction and previous claims experience.
+""",
+    "booking": """
+[Current Stage: Appointment Booking]
+For interested customers, ask preferred time: morning, afternoon, or evening.
+""",
+    "closing": """
+[Current Stage: Closing]
+ALWAYS ask for additional questions before ending. End the conversation when the customer has no more questions or says goodbye.
+""",
+}
+
+# Needed from the moment send_user_details may be called
+CONTEXT_RULES = """
+[Context Management - CRITICAL]
+Track silently and pass to send_user_details:
+- name: Customer's full name (string)
+- preferredlanguage: "Hindi" or "English" (string)
+- interestScore: interest level from 1-10 (float, not string)
+- Sentiment: "Positive", "Neutral", or "Negative" (string)
+- phoneNumber: Customer's contact number (string)
+- callduration: filled in automatically
+- car_details: JSON string "{\\"manufacturer\\": \\"[brand]\\", \\"model\\": \\"[model]\\", \\"variant\\": \\"[variant]\\", \\"year\\": \\"[year]\\"}"
+
+[Function Calling Rules - MANDATORY]
+After gathering name, phone, vehicle details and language preference, and before the final questions, call send_user_details with the complete context. If context is incomplete, continue gathering missing information first.
+
+Example:
+{"name": "Rahul Sharma", "preferredlanguage": "Hindi", "interestScore": 8.0, "Sentiment": "Positive", "phoneNumber": "9876543210", "callduration": 300, "car_details": "{\\"manufacturer\\": \\"Maruti\\", \\"model\\": \\"Swift\\", \\"variant\\": \\"VXI\\", \\"year\\": \\"2021\\"}"}
+"""
+
+# send_user_details may be called as soon as the customer's details are being gathered
+CONTEXT_STAGES = {"info_gathering", "benefits", "booking", "closing"}
+
+# What a stage waits for before the next user turn moves the call on; the agent's
+# tools record these. A not_found counts too, so a bike, a commercial vehicle or a
+# car missing from the catalog does not hold the call in a stage. send_user_details
+# moves the call to closing itself.
+STAGE_MILESTONES = {
+    "info_gathering": {"vehicle_found", "vehicle_not_found"},
+    "benefits": {"premium_quoted", "premium_not_found"},
+}
+# Replies a stage gets before the call moves on anyway (a caller who won't name a car, ...)
+STAGE_MAX_TURNS = {"greeting": 2, "info_gathering": 6, "benefits": 4, "booking": 4}
+# The STT's language (hi-IN); the call goes on in it when the caller answers the greeting without naming one
+DEFAULT_LANGUAGE = "Hindi"
+# Replies that only return the greeting
+PLEASANTRIES = {"नमस्ते", "नमस्कार", "हेलो", "हैलो", "हलो", "namaste", "hello", "hi", "hey"}
+
+# A language the caller names, as a whole word ("हिंदी में बात करते हैं", "English please")
+LANGUAGE_WORDS = {
+    "hindi": "Hindi", "हिंदी": "Hindi", "हिन्दी": "Hindi",
+    "english": "English", "इंग्लिश": "English", "अंग्रेज़ी": "English", "अंग्रेजी": "English",
+}
+
+
+def normalize_language(language) -> str:
+    """Map what the caller or LLM said ("hindi", "हिंदी", "en") to "Hindi"/"English", else None."""
+    text = (language or "").strip().lower()
+    if text.startswith(("hi", "हिं", "हिन")):
+        return "Hindi"
+    if text.startswith(("en", "इंग्लिश", "अंग्रेज़ी", "अंग्रेजी")):
+        return "English"
+    return None
+
+
+def detect_language(transcript: str) -> str:
+    """The language the caller asks for by name in `transcript`, else None (also when both are named)."""
+    named = {LANGUAGE_WORDS.get(word.strip(".,!?।")) for word in (transcript or "").lower().split()}
+    named.discard(None)
+    return named.pop() if len(named) == 1 else None
+
+
+def is_substantive(transcript: str) -> bool:
+    """Whether a reply says more than a greeting back ("हाँ जी बोलिए" does, "नमस्ते" does not)."""
+    words = (word.strip(".,!?।") for word in (transcript or "").lower().split())
+    return any(word and word not in PLEASANTRIES for word in words)
+
+
+def next_stage(stage: str, language: str, transcript: str, milestones, turns: int = 0) -> tuple:
+    """(stage, language) for the reply to the user turn that just ended.
+
+    `turns` is how many replies the call has already had in `stage`. Worked
+    out in code from what the call has established, so moving on never costs
+    the LLM a tool call and an extra round trip.
+    """
+    chosen = language or detect_language(transcript)
+    if stage == "greeting":
+        if language:
+            return "info_gathering", language
+        if chosen:
+            # The turn that picks the language still gets the greeting's time check
+            return "greeting", chosen
+        if is_substantive(transcript) or turns >= STAGE_MAX_TURNS[stage]:
+            return "info_gathering", DEFAULT_LANGUAGE
+        return "greeting", None
+    if STAGE_MILESTONES.get(stage, set()) & set(milestones) or turns >= STAGE_MAX_TURNS.get(stage, math.inf):
+        return STAGES[STAGES.index(stage) + 1], chosen
+    return stage, chosen
+
+
+def build_instructions(stage: str = "greeting", language: str = None) -> str:
+    """Core prompt plus only the snippets for `stage` in the chosen language.
+
+    Before a language is chosen both scripts are included; after that the
+    caller only pays for one.
+    """
+    if stage not in STAGES:
+        raise ValueError(f"Unknown stage {stage!r}, expected one of {STAGES}")
+    language = normalize_language(language)
+    parts = [CORE, LANGUAGE_RULES[language], STAGE_NOTES[stage]]
+    scripts = SCRIPTS.get(stage, {})
+    for lang in ([language] if language else LANGUAGES):
+        if lang in scripts:
+            parts.append(scripts[lang])
+    if stage in CONTEXT_STAGES:
+        parts.append(CONTEXT_RULES)
+    return "\n\n".join(part.strip() for part in parts) + "\n"
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate: ~4 characters per token for Latin text, ~2 for Devanagari."""
+    devanagari = len(re.findall(r"[ऀ-ॿ]", text))
+    return math.ceil((len(text) - devanagari) / 4 + devanagari / 2)
+
+
+if __name__ == "__main__":
+    every_snippet = "\n".join(
+        [CORE, *LANGUAGE_RULES.values(), *STAGE_NOTES.values(), CONTEXT_RULES]
+        + [script for scripts in SCRIPTS.values() for script in scripts.values()]
+    )
+    full = estimate_tokens(every_snippet)
+    print(f"📊 Estimated input tokens per turn (all snippets: {full})")
+    for stage in STAGES:
+        row = [f"{stage:<15}"]
+        for language in [None, *LANGUAGES]:
+            tokens = estimate_tokens(build_instructions(stage, language))
+            row.append(f"{language or 'undecided'}={tokens:<5} ({1 - tokens / full:.0%} less)")
+        print("  " + "  ".join(row))
+
+    # The stages one scripted call goes through; the tool in brackets runs during that turn
+    call = [
+        ("नमस्ते", None),
+        ("हिंदी में बात करते हैं", None),
+        ("हाँ, बताइए", None),
+        ("मेरे पास टाटा नेक्सन है", "vehicle_found"),
+        ("मेरा नंबर नौ आठ सात छह है", None),
+        ("कितना प्रीमियम होगा?", "premium_quoted"),
+        ("शाम को ठीक रहेगा", None),
+    ]
+    # A caller who never names a language, owns a bike the catalog doesn't have and never gets a quote
+    bike_call = [
+        ("हाँ जी बोलिए", None),
+        ("मेरा नाम सुनील है, मेरे पास Splendor बाइक है", "vehicle_not_found"),
+        ("अच्छा", None),
+        ("ठीक है", None),
+        ("और बताइए", None),
+        ("हम्म", None),
+        ("कल सुबह", None),
+    ]
+
+    def run_call(turns):
+        stage, language, milestones, in_stage = "greeting", None, set(), 0
+        for transcript, milestone in turns:
+            new_stage, language = next_stage(stage, language, transcript, milestones, in_stage)
+            in_stage = 1 if new_stage != stage else in_stage + 1
+            stage = new_stage
+            milestones.add(milestone)
+            print(f"🗣️ {transcript!r:45} -> {stage:<15} {language}")
+        return stage, language
+
+    assert run_call(call) == ("booking", "Hindi")
+    assert run_call(bike_call) == ("booking", "Hindi")
+    # Returning the greeting doesn't end it, but a second time does
+    assert next_stage("greeting", None, "नमस्ते", set()) == ("greeting", None)
+    assert next_stage("greeting", None, "hello", set(), turns=2) == ("info_gathering", "Hindi")
+    assert detect_language("Hindi or English?") is None and detect_language("hi there") is None
+    assert "[Context Management" in build_instructions("info_gathering", "Hindi")
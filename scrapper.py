@@ -4,68 +4,142 @@ from firecrawl import AsyncFirecrawlApp, JsonConfig
 import json
 from dotenv import load_dotenv
 import asyncio
+import time
 import pandas as pd
 from datetime import datetime
-# Assuming 'Car' model is defined as before
-from models import Car
 
+# Before the local imports: clean_pipeline reads RAW_ARCHIVE_DIR when it is imported
 load_dotenv()
+
+from models import CSV_COLUMNS
+from clean_pipeline import RAW_ARCHIVE_DIR, archive_raw_json, validate_records
+from normalize import write_normalized
+
 app = AsyncFirecrawlApp(api_key=os.getenv("FIRECRAWL_API_KEY"))
 
-async def extract_cars(url: str, schema: dict, prompt: str):
-    """Extracts car data using the correct formats and json_options parameters."""
-    try:
-        json_cfg = JsonConfig(schema=schema, prompt=prompt)
-
-        # THE FIX IS HERE: Add formats=['json'] alongside json_options
-        response = await asyncio.wait_for(
-            app.scrape_url(
-                url,
-                formats=['json'], 
-                json_options=json_cfg
-            ),
-            timeout=600
-        )
-        
-        # The rest of your function remains the same
-        if response and response.json:
-            extracted_data = response.json
-            
-            items = extracted_data.get('variants', []) if 'variants' in extracted_data else [extracted_data]
-
-            props = []
-            for obj in items:
-                if isinstance(obj, dict):
-                    props.append(Car(
-                        manufacturer=obj.get("manufacturer", ""),
-                        model_name=obj.get("model_name", ""),
-                        manufacturing_year=obj.get("manufacturing_year", "2025"),
-                        variant_name=obj.get("variant_name", ""),
-                        showroom_price=obj.get("showroom_price", ""),
-                        fuel_type=obj.get("fuel_type", ""),
-                        engine_capacity_cc=str(obj.get("engine_capacity_cc", "")),
-                        body_type=obj.get("body_type", ""),
-                        seating_capacity=str(obj.get("seating_capacity", "")),
-                        torque_nm=obj.get("torque_nm", ""),
-                        mileage_kmpl=obj.get("mileage_kmpl", ""),
-                        power_bhp=obj.get("power_bhp", ""),
-                        transmission=obj.get("transmission", ""),
-                        safety_rating=obj.get("safety_rating", ""),
-                        features=obj.get("features", []),
-                    ))
-            
-            print(f"✅ Extracted {len(props)} car variants from {url}")
-            return props
-        else:
-            print(f"⚠️ No '.json' data found in the response object from {url}")
-            return []
-
-    except asyncio.TimeoutError:
-        print(f"❌ Timeout occurred while scraping {url} after 180 seconds.")
-        return []
-    except Exception as e:
-        print(f"❌ Error scraping {url}: {str(e)}")
-        return []
+SCRAPE_CONCURRENCY = int(os.getenv("SCRAPE_CONCURRENCY", "5"))
+SCRAPE_REQUESTS_PER_MINUTE = float(os.getenv("SCRAPE_REQUESTS_PER_MINUTE", "10"))
+SCRAPE_TIMEOUT = 600
+SCRAPE_MAX_ATTEMPTS = 3
+SCRAPE_BACKOFF = 5.0
+
+
+class TokenBucket:
+    """Async token bucket: at most `rate` acquisitions per second, bursts up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: float = 1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+def cars_from_json(extracted_data):
+    """Build Car objects from one Firecrawl JSON extraction result, skipping records that don't validate."""
+    items = extracted_data.get('variants', []) if 'variants' in extracted_data else [extracted_data]
+    props, rejected = validate_records(items)
+    if rejected:
+        print(f"⚠️ Skipped {rejected} invalid car records")
+    return props
+
+
+async def extract_cars(url: str, schema: dict, prompt: str, stats: dict = None,
+                       limiter: TokenBucket = None, scrape_url=None, raw_sink=None):
+    """Extracts car data from one URL, retrying with backoff on timeouts and errors.
+
+    `scrape_url` defaults to the Firecrawl client and can be replaced by any
+    coroutine with the same signature (e.g. an offline stand-in). `raw_sink`,
+    if given, is called with (url, raw JSON) for every extraction result,
+    e.g. clean_pipeline.archive_raw_json or CleaningPipeline.feed.
+    """
+    scrape_url = scrape_url or app.scrape_url
+    json_cfg = JsonConfig(schema=schema, prompt=prompt)
+    stat = {"url": url, "attempts": 0, "seconds": 0.0, "variants": 0, "status": "failed"}
+    if stats is not None:
+        stats[url] = stat
+    started = time.perf_counter()
+
+    for attempt in range(1, SCRAPE_MAX_ATTEMPTS + 1):
+        if limiter is not None:
+            await limiter.acquire()
+        stat["attempts"] = attempt
+        try:
+            response = await asyncio.wait_for(
+                scrape_url(
+                    url,
+                    formats=['json'], 
+                    json_options=json_cfg
+                ),
+                timeout=SCRAPE_TIMEOUT
+            )
+
+            stat["seconds"] = time.perf_counter() - started
+            if response and response.json:
+                if raw_sink is not None:
+                    raw_sink(url, response.json)
+                props = cars_from_json(response.json)
+                stat["variants"] = len(props)
+                stat["status"] = "ok"
+                print(f"✅ Extracted {len(props)} car variants from {url}")
+                return props
+            else:
+                stat["status"] = "empty"
+                print(f"⚠️ No '.json' data found in the response object from {url}")
+                return []
+
+        except asyncio.TimeoutError:
+            print(f"❌ Timeout occurred while scraping {url} after {SCRAPE_TIMEOUT} seconds (attempt {attempt}).")
+        except Exception as e:
+            print(f"❌ Error scraping {url} (attempt {attempt}): {str(e)}")
+
+        if attempt < SCRAPE_MAX_ATTEMPTS:
+            await asyncio.sleep(SCRAPE_BACKOFF * 2 ** (attempt - 1))
+
+    stat["seconds"] = time.perf_counter() - started
+    return []
+
+
+async def scrape_all(urls, schema: dict, prompt: str, concurrency: int = SCRAPE_CONCURRENCY,
+                     requests_per_minute: float = SCRAPE_REQUESTS_PER_MINUTE, scrape_url=None, raw_sink=None):
+    """Scrape `urls` with at most `concurrency` in flight and a global request rate limit.
+
+    Returns the per-URL Car lists in input order and a dict of per-URL stats.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    limiter = TokenBucket(rate=requests_per_minute / 60, capacity=concurrency)
+    stats = {}
+
+    async def run(url):
+        async with semaphore:
+            print(f"\nScraping: {url}")
+            return await extract_cars(url, schema, prompt, stats=stats, limiter=limiter, scrape_url=scrape_url,
+                                     raw_sink=raw_sink)
+
+    results = await asyncio.gather(*(run(url) for url in urls))
+    return results, [stats[url] for url in urls]
+
+
+def print_scrape_summary(stats, wall_seconds: float):
+    print("\n📊 Scrape summary")
+    for stat in sorted(stats, key=lambda s: s["seconds"], reverse=True):
+        print(f"  {stat['status']:<6} {stat['seconds']:7.1f}s  attempts={stat['attempts']}  "
+              f"variants={stat['variants']:<3} {stat['url']}")
+    total = sum(s["seconds"] for s in stats)
+    print(f"⏱️ Wall clock {wall_seconds:.1f}s for {len(stats)} URLs "
+          f"({total:.1f}s of scrape time, {total / wall_seconds if wall_seconds else 0:.1f}x overlap)")
+
 
 def convert_to_csv(car_details, filename=None):
     """Convert car data to pandas DataFrame and export as CSV"""
@@ -86,23 +160,7 @@ def convert_to_csv(car_details, filename=None):
     df = pd.DataFrame(car_dicts)
     
     # Reorder columns for better readability
-    column_order = [
-        'manufacturer',
-        'model_name', 
-        'variant_name',
-        'manufacturing_year',
-        'showroom_price',
-        'fuel_type',
-        'engine_capacity_cc',
-        'body_type',
-        'seating_capacity',
-        'transmission',
-        'power_bhp',
-        'torque_nm',
-        'mileage_kmpl',
-        'safety_rating',
-        'features'
-    ]
+    column_order = CSV_COLUMNS
     
     # Reorder columns (only include columns that exist)
     existing_columns = [col for col in column_order if col in df.columns]
@@ -117,6 +175,10 @@ def convert_to_csv(car_details, filename=None):
     df.to_csv(filename, index=False, encoding='utf-8')
     
     print(f"✅ Successfully exported {len(df)} cars to {filename}")
+
+    # Typed numeric columns (price, power, torque, mileage, cc, seating) for downstream lookups
+    normalized_file = write_normalized(df, filename)
+    print(f"✅ Normalized specs written to {normalized_file}")
     print(f"📊 Columns: {', '.join(df.columns.tolist())}")
     print(f"📈 Data shape: {df.shape}")
     
@@ -126,54 +188,52 @@ def convert_to_csv(car_details, filename=None):
     
     return df
 
-async def fetch_vehicle_data():
-    test_urls = [
-        "https://www.cardekho.com/cars/Tesla",
-        "https://www.cardekho.com/cars/Pravaig",
-        "https://www.cardekho.com/cars/Rolls-Royce",
-        "https://www.cardekho.com/cars/BYD",
-        "https://www.cardekho.com/cars/Jaguar",
-        "https://www.cardekho.com/cars/Lotus",
-        "https://www.cardekho.com/cars/Isuzu",
-        "https://www.cardekho.com/cars/Lexus",
-        "https://www.cardekho.com/cars/Ferrari",
-        "https://www.cardekho.com/cars/Land_Rover",
-        "https://www.cardekho.com/cars/Force",
-        "https://www.cardekho.com/cars/Mercedes-Benz",
-        "https://www.cardekho.com/cars/Lamborghini",
-        "https://www.cardekho.com/cars/Mclaren",
-        "https://www.cardekho.com/cars/Maserati",
-        "https://www.cardekho.com/cars/PMV",
-        "https://www.cardekho.com/cars/Mini",
-        "https://www.cardekho.com/porsche-cars",
-        "https://www.cardekho.com/cars/Strom_Motors",
-        "https://www.cardekho.com/cars/Vayve_Mobility",
-        "https://www.cardekho.com/cars/Volvo",
-        "https://www.cardekho.com/bmw-cars",
-        "https://www.cardekho.com/cars/Bentley",
-        "https://www.cardekho.com/cars/Bajaj",
-        "https://www.cardekho.com/cars/Audi",
-        "https://www.cardekho.com/cars/Aston_Martin",
-        "https://www.cardekho.com/cars/Citroen",
-        "https://www.cardekho.com/cars/Volkswagen",
-        "https://www.cardekho.com/cars/Nissan",
-        "https://www.cardekho.com/cars/Jeep",
-        "https://www.cardekho.com/cars/Renault",
-        "https://www.cardekho.com/cars/Skoda",
-        "https://www.cardekho.com/cars/MG",
-        "https://www.cardekho.com/cars/Honda",
-        "https://www.cardekho.com/cars/Mahindra",
-        "https://www.cardekho.com/cars/Hyundai",
-        "https://www.cardekho.com/toyota-cars",
-        "https://www.cardekho.com/cars/Kia",
-        "https://www.cardekho.com/cars/Tata",
-        "https://www.cardekho.com/maruti-suzuki-cars"
-    ]
-    
-    car_details = []
 
-    # Comprehensive prompt to guide extraction of all car models
-    extraction_prompt = """
+BRAND_URLS = [
+    "https://www.cardekho.com/cars/Tesla",
+    "https://www.cardekho.com/cars/Pravaig",
+    "https://www.cardekho.com/cars/Rolls-Royce",
+    "https://www.cardekho.com/cars/BYD",
+    "https://www.cardekho.com/cars/Jaguar",
+    "https://www.cardekho.com/cars/Lotus",
+    "https://www.cardekho.com/cars/Isuzu",
+    "https://www.cardekho.com/cars/Lexus",
+    "https://www.cardekho.com/cars/Ferrari",
+    "https://www.cardekho.com/cars/Land_Rover",
+    "https://www.cardekho.com/cars/Force",
+    "https://www.cardekho.com/cars/Mercedes-Benz",
+    "https://www.cardekho.com/cars/Lamborghini",
+    "https://www.cardekho.com/cars/Mclaren",
+    "https://www.cardekho.com/cars/Maserati",
+    "https://www.cardekho.com/cars/PMV",
+    "https://www.cardekho.com/cars/Mini",
+    "https://www.cardekho.com/porsche-cars",
+    "https://www.cardekho.com/cars/Strom_Motors",
+    "https://www.cardekho.com/cars/Vayve_Mobility",
+    "https://www.cardekho.com/cars/Volvo",
+    "https://www.cardekho.com/bmw-cars",
+    "https://www.cardekho.com/cars/Bentley",
+    "https://www.cardekho.com/cars/Bajaj",
+    "https://www.cardekho.com/cars/Audi",
+    "https://www.cardekho.com/cars/Aston_Martin",
+    "https://www.cardekho.com/cars/Citroen",
+    "https://www.cardekho.com/cars/Volkswagen",
+    "https://www.cardekho.com/cars/Nissan",
+    "https://www.cardekho.com/cars/Jeep",
+    "https://www.cardekho.com/cars/Renault",
+    "https://www.cardekho.com/cars/Skoda",
+    "https://www.cardekho.com/cars/MG",
+    "https://www.cardekho.com/cars/Honda",
+    "https://www.cardekho.com/cars/Mahindra",
+    "https://www.cardekho.com/cars/Hyundai",
+    "https://www.cardekho.com/toyota-cars",
+    "https://www.cardekho.com/cars/Kia",
+    "https://www.cardekho.com/cars/Tata",
+    "https://www.cardekho.com/maruti-suzuki-cars"
+]
+
+# Comprehensive prompt to guide extraction of all car models
+EXTRACTION_PROMPT = """
     You are an expert automotive data extractor. Your task is to comprehensively extract detailed information about ALL car models from this specific brand/company page on cardekho.com.
 
     BRAND-SPECIFIC EXTRACTION INSTRUCTIONS:
@@ -224,44 +284,47 @@ async def fetch_vehicle_data():
     For the given example: Tesla page should extract complete details for Model Y including its ₹59.89 - 73.89 Lakh price, 622 km range, 295 bhp power, 5-seat capacity, electric fuel type, etc.
     """
 
-    # 3. Define the schema as a Python dictionary, not a prompt string
-    extraction_schema = {
-        "type": "object",
-        "properties": {
-            "variants": {
-                "type": "array",
-                "items": {
-                    "type": "object",
-                    "properties": {
-                        "manufacturer": {"type": "string", "description": "Brand name, e.g., Tata"},
-                        "model_name": {"type": "string", "description": "Car model, e.g., Tiago"},
-                        "manufacturing_year": {"type": "string", "description": "The model year, e.g., 2025"},
-                        "variant_name": {"type": "string", "description": "The specific variant name from the table row"},
-                        "showroom_price": {"type": "string", "description": "The ex-showroom price for this variant"},
-                        "fuel_type": {"type": "string", "description": "e.g., Petrol/Diesel/CNG"},
-                        "engine_capacity_cc": {"type": "integer", "description": "Engine displacement in cc"},
-                        "body_type": {"type": "string", "description": "Hatchback/Sedan/SUV"},
-                        "seating_capacity": {"type": "integer", "description": "Number of seats"},
-                        "torque_nm": {"type": "string", "description": "Torque value with units, e.g., 95 Nm"},
-                        "mileage_kmpl": {"type": "string", "description": "Fuel efficiency, e.g., 19.01 kmpl"},
-                        "power_bhp": {"type": "string", "description": "Power output, e.g., 72.41 bhp"},
-                        "transmission": {"type": "string", "description": "Manual or Automatic"},
-                        "safety_rating": {"type": "string", "description": "Global NCAP rating, e.g., 4 Star"},
-                        "features": {"type": "array", "items": {"type": "string"}, "description": "List of key features"}
-                    }
+# 3. Define the schema as a Python dictionary, not a prompt string
+EXTRACTION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "variants": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "manufacturer": {"type": "string", "description": "Brand name, e.g., Tata"},
+                    "model_name": {"type": "string", "description": "Car model, e.g., Tiago"},
+                    "manufacturing_year": {"type": "string", "description": "The model year, e.g., 2025"},
+                    "variant_name": {"type": "string", "description": "The specific variant name from the table row"},
+                    "showroom_price": {"type": "string", "description": "The ex-showroom price for this variant"},
+                    "fuel_type": {"type": "string", "description": "e.g., Petrol/Diesel/CNG"},
+                    "engine_capacity_cc": {"type": "integer", "description": "Engine displacement in cc"},
+                    "body_type": {"type": "string", "description": "Hatchback/Sedan/SUV"},
+                    "seating_capacity": {"type": "integer", "description": "Number of seats"},
+                    "torque_nm": {"type": "string", "description": "Torque value with units, e.g., 95 Nm"},
+                    "mileage_kmpl": {"type": "string", "description": "Fuel efficiency, e.g., 19.01 kmpl"},
+                    "power_bhp": {"type": "string", "description": "Power output, e.g., 72.41 bhp"},
+                    "transmission": {"type": "string", "description": "Manual or Automatic"},
+                    "safety_rating": {"type": "string", "description": "Global NCAP rating, e.g., 4 Star"},
+                    "features": {"type": "array", "items": {"type": "string"}, "description": "List of key features"}
                 }
             }
         }
     }
+}
 
-    for url in test_urls:
-        print(f"\nScraping: {url}")
-        props = await extract_cars(url, extraction_schema, extraction_prompt)
-        if props:
-            car_details.extend(props)
-        
-        print("Waiting 10 seconds before next request...")
-        await asyncio.sleep(10)
+
+async def fetch_vehicle_data():
+    car_details = []
+
+    started = time.perf_counter()
+    # Keep the raw extraction results so they can be re-cleaned without scraping again
+    raw_sink = archive_raw_json(RAW_ARCHIVE_DIR) if RAW_ARCHIVE_DIR else None
+    results, stats = await scrape_all(BRAND_URLS, EXTRACTION_SCHEMA, EXTRACTION_PROMPT, raw_sink=raw_sink)
+    for props in results:
+        car_details.extend(props)
+    print_scrape_summary(stats, time.perf_counter() - started)
     
     print(f"\n🎉 Total cars extracted: {len(car_details)}")
     
@@ -278,5 +341,49 @@ async def fetch_vehicle_data():
         print("❌ No car data extracted")
         return [], None
 
+async def _demo(url_count: int = 16, latency: float = 0.2):
+    """Offline check of scrape_all against a fake scrape_url: wall time follows the concurrency limit."""
+    import math
+    from types import SimpleNamespace
+
+    in_flight = {"now": 0, "max": 0}
+
+    async def fake_scrape_url(url, **kwargs):
+        in_flight["now"] += 1
+        in_flight["max"] = max(in_flight["max"], in_flight["now"])
+        await asyncio.sleep(latency)
+        in_flight["now"] -= 1
+        return SimpleNamespace(json={"variants": [{"manufacturer": "Tata", "model_name": "Nexon",
+                                                  "variant_name": url.rsplit("/", 1)[-1]}]})
+
+    urls = [f"https://example.test/cars/{i}" for i in range(url_count)]
+    runs = [(1, 6000), (4, 6000), (8, 6000), (8, 120)]
+    for concurrency, per_minute in runs:
+        in_flight["max"] = 0
+        started = time.perf_counter()
+        results, stats = await scrape_all(urls, EXTRACTION_SCHEMA, EXTRACTION_PROMPT, concurrency=concurrency,
+                                          requests_per_minute=per_minute, scrape_url=fake_scrape_url)
+        wall = time.perf_counter() - started
+        # The bucket starts full (one token per slot), then refills at the rate limit
+        rate = per_minute / 60
+        expected = max(math.ceil(url_count / concurrency) * latency, (url_count - concurrency) / rate + latency)
+        assert sum(len(r) for r in results) == url_count and all(s["status"] == "ok" for s in stats)
+        assert in_flight["max"] <= concurrency, in_flight
+        assert expected * 0.9 <= wall <= expected * 1.25 + 0.05, (concurrency, per_minute, wall, expected)
+        print(f"📊 concurrency={concurrency} rate={per_minute:g}/min: {url_count} URLs in {wall:.2f}s "
+              f"(expected {expected:.2f}s, max in flight {in_flight['max']})")
+
+
 if __name__ == "__main__":
-    asyncio.run(fetch_vehicle_data())
\ No newline at end of file
+    import sys
+
+    if sys.argv[1:] == ["demo"]:
+        import contextlib
+        import io
+
+        # Keep only the summary lines, not the per-URL progress output
+        with contextlib.redirect_stdout(io.StringIO()) as captured:
+            asyncio.run(_demo())
+        print("\n".join(line for line in captured.getvalue().splitlines() if line.startswith("📊")))
+    else:
+        asyncio.run(fetch_vehicle_data())
\ No newline at end of file
@@ -0,0 +1,261 @@
+"""In-memory "cars like mine" and "feature X under price Y" search over the catalog.
+
+Each variant is encoded once as a feature bitmap (the same u64 words the
+catalog snapshot stores), a body type code, a fuel bitmask and a row of
+standardized numeric specs. A query scores every row with a few
+vectorized NumPy operations, so it stays well inside a turn's latency
+budget without the multi-hop Cypher the graph notebook needs.
+"""
+import difflib
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from catalog_snapshot import feature_bitmap, open_snapshot, split_features
+from normalize import normalize_car_data
+from vehicle_catalog import COLUMNS, VehicleCatalog, get_vehicle_catalog, name_key
+
+FUELS = ["petrol", "diesel", "cng", "electric", "hybrid", "lpg"]
+# Log price so a ₹10L vs ₹12L gap counts like ₹1Cr vs ₹1.2Cr
+NUMERIC_SPECS = ["log_price", "engine_cc", "power_bhp_value", "mileage_kmpl_value", "seating", "safety_stars"]
+WEIGHTS = {"features": 0.45, "specs": 0.30, "body": 0.15, "fuel": 0.10}
+# Feature differences listed per similar car; enough for the LLM to explain an upgrade
+MAX_DIFF_FEATURES = 8
+
+_bitwise_count = getattr(np, "bitwise_count", None)
+_BYTE_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def popcount(words: np.ndarray) -> np.ndarray:
+    """Set bits per row of a rows x u64 words array."""
+    if _bitwise_count is not None:
+        return _bitwise_count(words).sum(axis=1, dtype=np.int32)
+    # NumPy < 2.0
+    return _BYTE_POPCOUNT[words.view(np.uint8)].sum(axis=1, dtype=np.int32)
+
+
+def fuel_mask(fuel_types: pd.Series) -> np.ndarray:
+    """"Diesel/Petrol/CNG" -> bitmask over FUELS."""
+    text = fuel_types.fillna("").astype(str).str.lower()
+    mask = np.zeros(len(text), dtype=np.uint8)
+    for bit, fuel in enumerate(FUELS):
+        mask |= text.str.contains(fuel, regex=False).to_numpy().astype(np.uint8) << bit
+    return mask
+
+
+class SimilarityIndex:
+    """Vectorized similarity scoring over every catalog row (row ids as in VehicleCatalog)."""
+
+    def __init__(self, feature_names: Sequence[str], bitmap: np.ndarray, body: np.ndarray, fuel: np.ndarray,
+                 specs: np.ndarray, price_min: np.ndarray, model_keys: Optional[np.ndarray] = None,
+                 catalog: Optional[VehicleCatalog] = None):
+        self.feature_names = list(feature_names)
+        self.feature_ids = {name_key(f): i for i, f in enumerate(self.feature_names)}
+        self.bitmap = bitmap
+        self.feature_counts = popcount(bitmap)
+        self.body = body
+        self.fuel = fuel
+        self.fuel_counts = popcount(fuel.astype(np.uint64)[:, np.newaxis])
+        # Standardized, with missing specs at the mean so they neither help nor hurt
+        mean, std = np.nanmean(specs, axis=0), np.nanstd(specs, axis=0)
+        self.specs = np.nan_to_num((specs - mean) / np.where(std > 0, std, 1)).astype(np.float32)
+        self.spec_known = ~np.isnan(specs)
+        self.price_min = price_min
+        self.model_keys = model_keys
+        self.catalog = catalog
+        self.size = len(bitmap)
+
+    @classmethod
+    def from_catalog(cls, catalog: VehicleCatalog, snapshot=None) -> "SimilarityIndex":
+        """Encode a catalog; the feature bitmap is taken from `snapshot` when it has one."""
+        df = pd.DataFrame({name: catalog.columns[name] for name in COLUMNS})
+        specs = normalize_car_data(df)
+        price_min = specs["price_min_inr"].astype("float64").to_numpy(na_value=np.nan)
+        specs["log_price"] = np.log(price_min)
+        spec_matrix = np.column_stack([specs[c].astype("float64").to_numpy(na_value=np.nan)
+                                       for c in NUMERIC_SPECS])
+
+        if snapshot is not None:
+            names, bitmap = snapshot.feature_names, np.asarray(snapshot.feature_bitmap)
+        else:
+            index: Dict[str, int] = {}
+            offsets, ids = [0], []
+            for value in catalog.columns["features"]:
+                ids.extend(index.setdefault(f, len(index)) for f in split_features(value))
+                offsets.append(len(ids))
+            names = list(index)
+            bitmap = feature_bitmap(np.asarray(offsets, dtype=np.uint32), np.asarray(ids, dtype=np.uint32), len(names))
+
+        body_keys = df["body_type"].map(name_key)
+        body = pd.factorize(body_keys)[0].astype(np.int32)
+        model_keys = pd.factorize(pd.Series(catalog._manufacturer_keys)
+                                  + "|" + df["model_name"].map(name_key))[0].astype(np.int32)
+        return cls(names, bitmap, body, fuel_mask(df["fuel_type"]), spec_matrix, price_min, model_keys, catalog)
+
+    def scores(self, row_id: int) -> np.ndarray:
+        """Similarity of every row to `row_id`, 0..1."""
+        shared = popcount(self.bitmap & self.bitmap[row_id])
+        union = self.feature_counts + self.feature_counts[row_id] - shared
+        features = np.divide(shared, union, out=np.zeros(self.size, dtype=np.float32), where=union > 0)
+
+        fuel_shared = popcount((self.fuel & self.fuel[row_id]).astype(np.uint64)[:, np.newaxis])
+        fuel_union = self.fuel_counts + self.fuel_counts[row_id] - fuel_shared
+        fuel = np.divide(fuel_shared, fuel_union, out=np.zeros(self.size, dtype=np.float32), where=fuel_union > 0)
+
+        known = self.spec_known[row_id]
+        diff = self.specs[:, known] - self.specs[row_id, known]
+        specs = np.exp(-0.5 * np.mean(diff * diff, axis=1)) if known.any() else np.zeros(self.size)
+
+        body = (self.body == self.body[row_id]).astype(np.float32)
+        return (WEIGHTS["features"] * features + WEIGHTS["specs"] * specs
+                + WEIGHTS["body"] * body + WEIGHTS["fuel"] * fuel)
+
+    def similar(self, row_id: int, k: int = 5, same_model: bool = False) -> List[tuple]:
+        """Top-k (row id, score) most similar rows: other variants of the same model, or other models."""
+        scores = self.scores(row_id)
+        scores[row_id] = -1
+        if self.model_keys is not None:
+            own_model = self.model_keys == self.model_keys[row_id]
+            scores[~own_model if same_model else own_model] = -1
+        k = min(k, self.size)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(r), float(scores[r])) for r in top if scores[r] >= 0]
+
+    def resolve_features(self, names: Sequence[str]) -> List[int]:
+        """Feature ids for spoken names ("cruise" -> "Cruise Control"), skipping unknown ones."""
+        ids = []
+        keys = list(self.feature_ids)
+        for name in names:
+            key = name_key(name)
+            if key in self.feature_ids:
+                ids.append(self.feature_ids[key])
+                continue
+            contained = [k for k in keys if key and key in k]
+            matches = contained or difflib.get_close_matches(key, keys, n=1, cutoff=0.7)
+            ids.extend(self.feature_ids[m] for m in matches)
+        return sorted(set(ids))
+
+    def with_features(self, feature_groups: Sequence[Sequence[int]], max_price: Optional[float] = None,
+                      k: int = 5) -> List[int]:
+        """Cheapest rows under `max_price` having, for every group, at least one of its feature ids."""
+        mask = np.ones(self.size, dtype=bool)
+        for group in feature_groups:
+            has_any = np.zeros(self.size, dtype=bool)
+            for feature_id in group:
+                bit = np.uint64(1) << np.uint64(feature_id % 64)
+                has_any |= (self.bitmap[:, feature_id // 64] & bit) != 0
+            mask &= has_any
+        if max_price:
+            mask &= self.price_min <= max_price
+        rows = np.flatnonzero(mask)
+        rows = rows[np.argsort(np.nan_to_num(self.price_min[rows], nan=np.inf), kind="stable")]
+        return rows[:k].tolist()
+
+    def feature_diff(self, row_id: int, other: int) -> Dict[str, List[str]]:
+        """Features `other` adds over `row_id`, and the ones it lacks."""
+        def names(words):
+            bits = np.unpackbits(words.view(np.uint8), bitorder="little")
+            return [self.feature_names[i] for i in np.flatnonzero(bits) if i < len(self.feature_names)]
+
+        mine, theirs = self.bitmap[row_id], self.bitmap[other]
+        return {"extra_features": names(theirs & ~mine), "missing_features": names(mine & ~theirs)}
+
+    def describe(self, row_id: int) -> Dict[str, Any]:
+        columns = self.catalog.columns
+        return {name: columns[name][row_id] for name in
+                ("manufacturer", "model_name", "variant_name", "showroom_price", "fuel_type", "body_type")}
+
+
+def find_similar(manufacturer: str, model: str, variant: str = "", k: int = 3,
+                 same_model: bool = False) -> Optional[Dict[str, Any]]:
+    index = get_similarity_index()
+    rows = index.catalog.match_ids(manufacturer, model, variant)
+    if not rows:
+        return None
+    row_id = rows[0]
+    return {
+        "vehicle": index.describe(row_id),
+        "similar": [{**index.describe(r), "similarity": round(score, 2),
+                     **{name: features[:MAX_DIFF_FEATURES] for name, features in index.feature_diff(row_id, r).items()}}
+                    for r, score in index.similar(row_id, k, same_model)],
+    }
+
+
+def find_with_features(features: str, max_price_inr: Optional[float] = None, k: int = 5) -> Dict[str, Any]:
+    """Cheapest variants having every comma-separated feature; a feature matching several names accepts any."""
+    index = get_similarity_index()
+    wanted = [f.strip() for f in features.split(",") if f.strip()]
+    groups = [index.resolve_features([f]) for f in wanted]
+    unknown = [f for f, group in zip(wanted, groups) if not group]
+    rows = [] if unknown or not groups else index.with_features(groups, max_price_inr, k)
+    return {
+        "matched_features": {f: [index.feature_names[i] for i in group] for f, group in zip(wanted, groups)},
+        "unknown_features": unknown,
+        "vehicles": [index.describe(r) for r in rows],
+    }
+
+
+_index: Optional[SimilarityIndex] = None
+
+
+def get_similarity_index() -> SimilarityIndex:
+    """Process-wide index over get_vehicle_catalog(), using the snapshot's bitmap when one is mapped."""
+    global _index
+    if _index is None:
+        _index = SimilarityIndex.from_catalog(get_vehicle_catalog(), open_snapshot())
+    return _index
+
+
+def synthetic_index(count: int, feature_count: int = 320, seed: int = 7) -> SimilarityIndex:
+    """Random index of `count` rows with catalog-like feature density, for benchmarks."""
+    rng = np.random.default_rng(seed)
+    words = (feature_count + 63) // 64
+    # ~20 of 320 features per variant, like the scraped catalog
+    bitmap = np.zeros((count, words), dtype=np.uint64)
+    for _ in range(20):
+        ids = rng.integers(0, feature_count, count)
+        bitmap[np.arange(count), ids // 64] |= np.left_shift(np.uint64(1), (ids % 64).astype(np.uint64))
+    specs = rng.normal(size=(count, len(NUMERIC_SPECS)))
+    specs[rng.random(specs.shape) < 0.1] = np.nan
+    price_min = np.exp(rng.uniform(np.log(4e5), np.log(5e7), count))
+    return SimilarityIndex([f"Feature {i}" for i in range(feature_count)], bitmap,
+                           rng.integers(0, 8, count).astype(np.int32), rng.integers(1, 32, count).astype(np.uint8),
+                           specs, price_min, rng.integers(0, count // 10, count).astype(np.int32))
+
+
+def _bench(label: str, index: SimilarityIndex, row_id: int, feature_groups: List[List[int]], repeat: int):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        index.similar(row_id, 5)
+    top_k = (time.perf_counter() - start) / repeat
+    start = time.perf_counter()
+    for _ in range(repeat):
+        index.with_features(feature_groups, 15e5)
+    feature_query = (time.perf_counter() - start) / repeat
+    print(f"  {label:<10} {index.size:>9} rows  top-5 similar {top_k * 1000:8.2f}ms  "
+          f"feature under price {feature_query * 1000:8.2f}ms")
+
+
+if __name__ == "__main__":
+    start = time.perf_counter()
+    index = get_similarity_index()
+    print(f"📊 Encoded {index.size} variants, {len(index.feature_names)} features in "
+          f"{(time.perf_counter() - start) * 1000:.1f}ms")
+    result = find_similar("Tata", "Nexon")
+    print(f"🚗 Like {result['vehicle']['manufacturer']} {result['vehicle']['model_name']}: " + ", ".join(
+        f"{v['manufacturer']} {v['model_name']} {v['variant_name']} ({v['similarity']})" for v in result["similar"]))
+    found = find_with_features("sunroof, cruise control", 15e5)
+    print(f"🔎 Sunroof + cruise control under ₹15 lakh ({found['matched_features']}): " + ", ".join(
+        f"{v['manufacturer']} {v['model_name']} {v['showroom_price']}" for v in found["vehicles"]))
+
+    print("📊 Query latency")
+    row_id = index.catalog.match_ids("Tata", "Nexon")[0]
+    _bench("catalog", index, row_id, [index.resolve_features(["Cruise Control"])], repeat=2000)
+    start = time.perf_counter()
+    synthetic = synthetic_index(1_000_000)
+    print(f"  (synthetic 1M-row index built in {time.perf_counter() - start:.1f}s, "
+          f"{(synthetic.bitmap.nbytes + synthetic.specs.nbytes) / 2**20:.0f} MB)")
+    _bench("synthetic", synthetic, 12345, [[3], [70]], repeat=20)
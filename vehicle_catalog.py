@@ -0,0 +1,350 @@
+import bisect
+import csv
+import difflib
+import os
+import re
+import time
+import unicodedata
+from collections import defaultdict
+from functools import lru_cache
+from typing import Dict, Any, List, Optional, Sequence
+
+from models import Car
+
+CATALOG_PATH = os.getenv(
+    "VEHICLE_CATALOG_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "car_dataset_combined.csv"),
+)
+
+# Same column set as models.Car
+COLUMNS = list(Car.model_fields.keys())
+
+# Spoken / transliterated forms callers use for brands and popular models.
+# Keys are matched after normalize_name(), values are canonical names.
+ALIASES = {
+    "मारुति": "maruti suzuki",
+    "मारुती": "maruti suzuki",
+    "मारुति सुजुकी": "maruti suzuki",
+    "maruti suzuki": "maruti suzuki",
+    "maruti": "maruti suzuki",
+    "maruthi": "maruti suzuki",
+    "suzuki": "maruti suzuki",
+    "टाटा": "tata",
+    "ह्युंडई": "hyundai",
+    "हुंडई": "hyundai",
+    "ह्यूंदै": "hyundai",
+    "hundai": "hyundai",
+    "hyundi": "hyundai",
+    "महिंद्रा": "mahindra",
+    "महिन्द्रा": "mahindra",
+    "mahendra": "mahindra",
+    "टोयोटा": "toyota",
+    "होंडा": "honda",
+    "किआ": "kia",
+    "किया": "kia",
+    "एमजी": "mg",
+    "एम जी": "mg",
+    "बीएमडब्ल्यू": "bmw",
+    "ऑडी": "audi",
+    "स्कोडा": "skoda",
+    "फोक्सवैगन": "volkswagen",
+    "वोक्सवैगन": "volkswagen",
+    "vw": "volkswagen",
+    "रेनॉल्ट": "renault",
+    "रेनो": "renault",
+    "निसान": "nissan",
+    "जीप": "jeep",
+    "सिट्रोएन": "citroen",
+    "फोर्स": "force",
+    "इसुज़ु": "isuzu",
+    "इसुजु": "isuzu",
+    "वोल्वो": "volvo",
+    "टेस्ला": "tesla",
+    "लेक्सस": "lexus",
+    "पोर्श": "porsche",
+    "फरारी": "ferrari",
+    "लैंबॉर्गिनी": "lamborghini",
+    "रोल्स रॉयस": "rolls royce",
+    "लैंड रोवर": "land rover",
+    "मिनी": "mini",
+    "बीवाईडी": "byd",
+    # Models
+    "नेक्सन": "nexon",
+    "पंच": "punch",
+    "टियागो": "tiago",
+    "हैरियर": "harrier",
+    "सफारी": "safari",
+    "स्विफ्ट": "swift",
+    "बलेनो": "baleno",
+    "ब्रेज़ा": "brezza",
+    "ब्रेजा": "brezza",
+    "अर्टिगा": "ertiga",
+    "डिजायर": "dzire",
+    "वैगनआर": "wagon r",
+    "वैगन आर": "wagon r",
+    "क्रेटा": "creta",
+    "वेन्यू": "venue",
+    "वेरना": "verna",
+    "i20": "i20",
+    "स्कॉर्पियो": "scorpio",
+    "स्कॉर्पियो एन": "scorpio n",
+    "थार": "thar",
+    "एक्सयूवी": "xuv",
+    "बोलेरो": "bolero",
+    "फॉर्च्यूनर": "fortuner",
+    "इनोवा": "innova",
+    "सिटी": "city",
+    "अमेज़": "amaze",
+    "सेल्टोस": "seltos",
+    "सोनेट": "sonet",
+    "हेक्टर": "hector",
+}
+
+
+def _clean(value: Any) -> str:
+    text = unicodedata.normalize("NFKD", str(value))
+    # Drop Latin accents ("Citroën", "Coupé") but keep Devanagari vowel signs
+    text = "".join(ch for ch in text if not unicodedata.combining(ch) or "\u0900" <= ch <= "\u097f")
+    text = re.sub(r"[^\w\u0900-\u097f]+", " ", text.lower())
+    return re.sub(r"\s+", " ", text).strip()
+
+
+_ALIASES = {_clean(k): v for k, v in ALIASES.items()}
+_MAX_ALIAS_WORDS = max(len(k.split(" ")) for k in _ALIASES)
+
+
+def normalize_name(value: Any) -> str:
+    """Lowercase, strip accents and punctuation, collapse spaces and apply ALIASES."""
+    if value is None:
+        return ""
+    text = _clean(value)
+    if text in _ALIASES:
+        return _ALIASES[text]
+    # Alias replacement inside a longer phrase, e.g. "टाटा नेक्सन"; the longest alias phrase wins
+    words, out, i = text.split(" "), [], 0
+    while i < len(words):
+        for n in range(min(_MAX_ALIAS_WORDS, len(words) - i), 0, -1):
+            phrase = " ".join(words[i:i + n])
+            if phrase in _ALIASES:
+                expansion = _ALIASES[phrase].split(" ")
+                # "maruti suzuki swift": "maruti" is already followed by the rest of its expansion
+                if words[i:i + len(expansion)] == expansion:
+                    n = len(expansion)
+                out.extend(expansion)
+                i += n
+                break
+        else:
+            out.append(words[i])
+            i += 1
+    return " ".join(out)
+
+
+def name_key(value: Any) -> str:
+    """Index key: normalized name with spaces and hyphens removed ("Land-Rover" == "landrover")."""
+    return normalize_name(value).replace(" ", "").replace("_", "")
+
+
+class _KeyIndex:
+    """Exact, prefix and fuzzy lookup from a name key to row ids."""
+
+    def __init__(self, rows_by_key: Dict[str, List[int]]):
+        self.rows = {k: tuple(v) for k, v in rows_by_key.items()}
+        self.sorted_keys = sorted(self.rows)
+
+    def resolve(self, key: str, cutoff: float = 0.75) -> List[str]:
+        if not key:
+            return []
+        if key in self.rows:
+            return [key]
+        # Prefix: "scorp" -> "scorpio", "scorpion"
+        i = bisect.bisect_left(self.sorted_keys, key)
+        prefixed = []
+        while i < len(self.sorted_keys) and self.sorted_keys[i].startswith(key):
+            prefixed.append(self.sorted_keys[i])
+            i += 1
+        if prefixed:
+            return prefixed
+        return difflib.get_close_matches(key, self.sorted_keys, n=3, cutoff=cutoff)
+
+
+class VehicleCatalog:
+    """Column-oriented, in-memory copy of the scraped car catalog.
+
+    Each column is a sequence of strings indexed by row id: a tuple when
+    loaded from the CSV, a catalog_snapshot.CodedColumn over the shared map
+    when loaded from a snapshot. Indexes by manufacturer,
+    (manufacturer, model) and (manufacturer, model, variant) are built once
+    at load so a lookup during a call is a handful of dict reads.
+    """
+
+    def __init__(self, columns: Dict[str, Sequence[str]], keys: Optional[Dict[str, Sequence[str]]] = None):
+        self.columns = columns
+        self.size = len(columns["manufacturer"])
+
+        # A snapshot ships the name keys precomputed
+        keys = keys or {name: tuple(name_key(v) for v in columns[name])
+                        for name in ("manufacturer", "model_name", "variant_name")}
+        manufacturer_keys = keys["manufacturer"]
+        model_keys = keys["model_name"]
+        variant_keys = keys["variant_name"]
+
+        by_manufacturer = defaultdict(list)
+        by_model = defaultdict(lambda: defaultdict(list))
+        by_any_model = defaultdict(list)
+        by_variant = defaultdict(lambda: defaultdict(list))
+        for row, (m, mo, va) in enumerate(zip(manufacturer_keys, model_keys, variant_keys)):
+            by_manufacturer[m].append(row)
+            by_model[m][mo].append(row)
+            by_any_model[mo].append(row)
+            by_variant[(m, mo)][va].append(row)
+
+        self.manufacturer_index = _KeyIndex(by_manufacturer)
+        self.model_index = {m: _KeyIndex(models) for m, models in by_model.items()}
+        self.any_model_index = _KeyIndex(by_any_model)
+        self.variant_index = {mm: _KeyIndex(variants) for mm, variants in by_variant.items()}
+        self._manufacturer_keys = manufacturer_keys
+
+    @classmethod
+    def from_rows(cls, rows) -> "VehicleCatalog":
+        columns = {name: [] for name in COLUMNS}
+        for row in rows:
+            for name in COLUMNS:
+                value = row.get(name, "")
+                if name == "features" and isinstance(value, list):
+                    value = ", ".join(value)
+                columns[name].append("" if value is None else str(value))
+        return cls({name: tuple(values) for name, values in columns.items()})
+
+    @classmethod
+    def load(cls, path: str = CATALOG_PATH) -> "VehicleCatalog":
+        with open(path, newline="", encoding="utf-8") as f:
+            return cls.from_rows(csv.DictReader(f))
+
+    @classmethod
+    def from_snapshot(cls, snapshot) -> "VehicleCatalog":
+        """Build from a catalog_snapshot.CatalogSnapshot without parsing the CSV or re-normalizing names.
+
+        The columns stay on the map, so row data is shared between worker processes.
+        """
+        columns = {name: snapshot.column(name) for name in COLUMNS}
+        keys = {name: snapshot.keys(name) for name in ("manufacturer", "model_name", "variant_name")}
+        return cls(columns, keys)
+
+    def row(self, row_id: int) -> Dict[str, Any]:
+        record = {name: self.columns[name][row_id] for name in COLUMNS}
+        record["features"] = [f.strip() for f in record["features"].split(",") if f.strip()]
+        return record
+
+    @lru_cache(maxsize=4096)
+    def _match(self, manufacturer: str, model: str, variant: str) -> tuple:
+        m_key, mo_key, va_key = name_key(manufacturer), name_key(model), name_key(variant)
+
+        if m_key:
+            manufacturers = self.manufacturer_index.resolve(m_key)
+        elif mo_key:
+            # Callers often name only the model ("मेरे पास Nexon है")
+            manufacturers = sorted({self._manufacturer_keys[r] for k in self.any_model_index.resolve(mo_key)
+                                    for r in self.any_model_index.rows[k]})
+        else:
+            return ()
+
+        rows = []
+        for m in manufacturers:
+            if not mo_key:
+                rows.extend(self.manufacturer_index.rows[m])
+                continue
+            model_index = self.model_index[m]
+            for mo in model_index.resolve(mo_key):
+                variant_index = self.variant_index[(m, mo)]
+                variants = variant_index.resolve(va_key, cutoff=0.6) if va_key else []
+                if variants:
+                    for va in variants:
+                        rows.extend(variant_index.rows[va])
+                else:
+                    rows.extend(model_index.rows[mo])
+        return tuple(rows)
+
+    def match_ids(self, manufacturer: str = "", model: str = "", variant: str = "") -> tuple:
+        """Row ids (positions in the dataset file) matching the names, best matches first."""
+        return self._match(manufacturer or "", model or "", variant or "")
+
+    def lookup(self, manufacturer: str = "", model: str = "", variant: str = "",
+               limit: int = 5) -> List[Dict[str, Any]]:
+        """Return up to `limit` catalog rows matching the (possibly partial, misspelled) names."""
+        rows = self.match_ids(manufacturer, model, variant)
+        return [self.row(r) for r in rows[:limit]]
+
+
+_catalog: Optional[VehicleCatalog] = None
+
+
+def get_vehicle_catalog() -> VehicleCatalog:
+    """Process-wide catalog, loaded on first use (normally from the worker prewarm).
+
+    Comes from the memory-mapped snapshot when one matching the CSV exists.
+    """
+    global _catalog
+    if _catalog is None:
+        from catalog_snapshot import open_snapshot
+
+        snapshot = open_snapshot()
+        _catalog = VehicleCatalog.from_snapshot(snapshot) if snapshot else VehicleCatalog.load()
+    return _catalog
+
+
+def _synthetic_rows(count: int):
+    brands = ["Tata", "Maruti Suzuki", "Hyundai", "Mahindra", "Toyota", "Honda", "Kia", "MG"]
+    for i in range(count):
+        yield {
+            "manufacturer": brands[i % len(brands)] if i % 10 else f"Brand {i // 10 % 500}",
+            "model_name": f"Model {i // 40}",
+            "manufacturing_year": "2025",
+            "variant_name": f"V{i % 40}",
+            "showroom_price": "₹10 - 12 Lakh",
+            "fuel_type": "Petrol",
+            "engine_capacity_cc": "1199",
+            "body_type": "SUV",
+            "seating_capacity": "5",
+            "torque_nm": "170 Nm",
+            "mileage_kmpl": "17 kmpl",
+            "power_bhp": "118 bhp",
+            "transmission": "Manual",
+            "safety_rating": "5 Star",
+            "features": "Cruise Control, Alloy Wheels",
+        }
+
+
+def _bench(name: str, catalog: VehicleCatalog, queries, repeat: int = 2000):
+    for label, query in queries:
+        catalog._match.cache_clear()
+        start = time.perf_counter()
+        catalog.lookup(*query)
+        cold = time.perf_counter() - start
+        start = time.perf_counter()
+        for _ in range(repeat):
+            catalog.lookup(*query)
+        warm = (time.perf_counter() - start) / repeat
+        print(f"  {name:<10} {label:<28} cold={cold * 1e6:8.1f}µs warm={warm * 1e6:6.1f}µs "
+              f"hits={len(catalog.lookup(*query))}")
+
+
+if __name__ == "__main__":
+    start = time.perf_counter()
+    catalog = VehicleCatalog.load()
+    print(f"📊 Loaded {catalog.size} rows in {(time.perf_counter() - start) * 1e3:.1f}ms")
+    _bench("real", catalog, [
+        ("exact model+variant", ("Tata", "Nexon", "")),
+        ("hindi brand + model", ("टाटा", "नेक्सन", "")),
+        ("model only", ("", "Creta", "")),
+        ("prefix model", ("Mahindra", "Scorp", "")),
+        ("misspelled brand", ("Hundai", "Venue", "")),
+    ])
+
+    start = time.perf_counter()
+    synthetic = VehicleCatalog.from_rows(_synthetic_rows(100_000))
+    print(f"📊 Built synthetic catalog of {synthetic.size} rows in {(time.perf_counter() - start):.2f}s")
+    _bench("synthetic", synthetic, [
+        ("exact model+variant", ("Tata", "Model 10", "V7")),
+        ("prefix model", ("Hyundai", "Model 25", "")),
+        ("misspelled brand", ("Hundai", "Model 250", "V3")),
+    ])
@@ -0,0 +1,309 @@
+"""Worker load reporting and admission for the LiveKit dispatcher.
+
+Every job process measures what its sessions actually cost: process CPU
+(VAD, noise cancellation and audio handling all run there), VAD and
+turn-detector inference time, event-loop lag and active sessions. It writes
+them once a second to a small report file under
+WORKER_LOAD_DIR/<worker pid>/. The worker's load_fnc (get_worker_load)
+reads the fresh reports of its own job processes and reports the most
+exhausted budget as the load:
+
+    load = max(sessions / WORKER_MAX_SESSIONS, cpu / WORKER_CPU_BUDGET,
+               loop lag p95 / WORKER_LAG_BUDGET_MS, turn-detector p95 / WORKER_EOU_BUDGET_MS)
+
+A budget is the point where callers start to hear it (choppy audio, slow
+turn taking), so a load of 1.0 means degraded. The worker stops accepting
+jobs at WORKER_LOAD_THRESHOLD, before that happens.
+
+LiveKit runs each call in its own job process, so per-call latency is
+aggregated here too: a job process leaves its call's samples in the same
+directory when it ends (report_latency), and the worker merges them and
+writes one Prometheus textfile for the whole worker (collect_latency).
+"""
+import asyncio
+import atexit
+import glob
+import json
+import os
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+from livekit.agents import metrics
+
+from latency_metrics import LatencyHistogram, LatencyMetrics, export_path, get_worker_metrics, remove_stale_exports
+
+REPORT_INTERVAL = 1.0
+# Reports older than this belong to job processes that have exited
+REPORT_STALE = 5.0
+LAG_SAMPLE_INTERVAL = 0.05
+# Set by the worker before it starts job processes, so they report to it
+WORKER_PID_ENV = "VEHICLE_AGENT_WORKER_PID"
+
+
+def load_settings() -> Dict[str, Any]:
+    """Admission settings from the environment, read when used so values from a .env loaded later apply."""
+    return {
+        "dir": os.getenv("WORKER_LOAD_DIR") or os.path.join(tempfile.gettempdir(), "vehicle_agent_load"),
+        "threshold": float(os.getenv("WORKER_LOAD_THRESHOLD", "0.75")),
+        "max_sessions": int(os.getenv("WORKER_MAX_SESSIONS", "25")),
+        # Share of the host's cores the job processes may use
+        "cpu_budget": float(os.getenv("WORKER_CPU_BUDGET", "0.8")),
+        "lag_budget": float(os.getenv("WORKER_LAG_BUDGET_MS", "50")) / 1000,
+        "eou_budget": float(os.getenv("WORKER_EOU_BUDGET_MS", "500")) / 1000,
+    }
+
+
+def _worker_dir(worker_pid: Optional[int] = None) -> str:
+    pid = worker_pid or int(os.environ.get(WORKER_PID_ENV) or os.getpid())
+    return os.path.join(load_settings()["dir"], str(pid))
+
+
+def _cpu_count() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+class LoadReporter:
+    """Per job process: measures the cost of the sessions it runs and publishes it for the worker."""
+
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = directory or _worker_dir()
+        self.path = os.path.join(self.directory, f"{os.getpid()}.json")
+        self.sessions = 0
+        self.inference = {"vad": 0.0, "eou": 0.0}
+        self.loop_lag = LatencyHistogram(max_samples=int(REPORT_INTERVAL / LAG_SAMPLE_INTERVAL))
+        self.eou_latency = LatencyHistogram()
+        self.last_report: Dict[str, Any] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def watch_vad(self, vad):
+        """Record the inference time of every stream of the process's shared VAD model."""
+
+        @vad.on("metrics_collected")
+        def _on_metrics_collected(m: metrics.VADMetrics):
+            self.inference["vad"] += m.inference_duration_total
+
+    def attach(self, session):
+        """Count `session` as active until it closes."""
+        self.sessions += 1
+        self.start()
+
+        @session.on("close")
+        def _on_close(ev):
+            self.sessions -= 1
+
+    def observe_eou(self, seconds: float):
+        self.inference["eou"] += seconds
+        self.eou_latency.observe(seconds)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        os.makedirs(self.directory, exist_ok=True)
+        cpu, wall = time.process_time(), time.perf_counter()
+        inference = dict(self.inference)
+        next_report = wall + REPORT_INTERVAL
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(LAG_SAMPLE_INTERVAL)
+            now = time.perf_counter()
+            self.loop_lag.observe(now - start - LAG_SAMPLE_INTERVAL)
+            if now < next_report:
+                continue
+            elapsed = now - wall
+            self.last_report = {
+                "pid": os.getpid(),
+                "time": time.time(),
+                "sessions": self.sessions,
+                # Cores' worth of CPU this process used since the last report
+                "cpu": (time.process_time() - cpu) / elapsed,
+                "inference": {k: (v - inference[k]) / elapsed for k, v in self.inference.items()},
+                "lag_p95": self.loop_lag.quantiles().get(0.95, 0.0),
+                "eou_p95": self.eou_latency.quantiles().get(0.95, 0.0),
+            }
+            self.eou_latency = LatencyHistogram()
+            self._write(self.last_report)
+            cpu, wall, inference = time.process_time(), now, dict(self.inference)
+            next_report = now + REPORT_INTERVAL
+
+    def _write(self, report: Dict[str, Any]):
+        tmp = f"{self.path}.tmp"
+        try:
+            with open(tmp, "w") as f:
+                json.dump(report, f)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            print(f"[ERROR] Could not write load report {self.path}: {e}")
+
+    def report_latency(self, session_metrics: LatencyMetrics):
+        """Hand a finished call's latency samples to the worker, which exports them."""
+        path = os.path.join(self.directory, f"{os.getpid()}-{time.time_ns()}.latency")
+        tmp = f"{path}.tmp"
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(tmp, "w") as f:
+                json.dump(session_metrics.to_report(), f)
+            os.replace(tmp, path)
+        except OSError as e:
+            print(f"[ERROR] Could not write latency report {path}: {e}")
+
+    def close(self):
+        if self._task is not None:
+            self._task.cancel()
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+class TimedTurnDetector:
+    """Wraps the turn-detection model to time each end-of-turn prediction.
+
+    The model runs in the worker's shared inference process, so this time
+    includes waiting behind every other session's predictions.
+    """
+
+    def __init__(self, model):
+        self._model = model
+
+    @property
+    def model(self) -> str:
+        return self._model.model
+
+    @property
+    def provider(self) -> str:
+        return self._model.provider
+
+    async def unlikely_threshold(self, language):
+        return await self._model.unlikely_threshold(language)
+
+    async def supports_language(self, language) -> bool:
+        return await self._model.supports_language(language)
+
+    async def predict_end_of_turn(self, chat_ctx, *, timeout: Optional[float] = 3):
+        start = time.perf_counter()
+        try:
+            return await self._model.predict_end_of_turn(chat_ctx, timeout=timeout)
+        finally:
+            get_load_reporter().observe_eou(time.perf_counter() - start)
+
+
+def read_reports(directory: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Fresh load reports of the worker's job processes; stale ones are removed."""
+    directory = directory or _worker_dir()
+    reports = []
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return reports
+    now = time.time()
+    for name in names:
+        if not name.endswith(".json"):
+            continue
+        path = os.path.join(directory, name)
+        try:
+            with open(path) as f:
+                report = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if now - report.get("time", 0) > REPORT_STALE:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            continue
+        reports.append(report)
+    return reports
+
+
+def compute_load(reports: List[Dict[str, Any]], cpu_count: Optional[int] = None,
+                 settings: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """The worker's load (0-1) and which budget drives it, from its job processes' reports."""
+    settings = settings or load_settings()
+    sessions = sum(r["sessions"] for r in reports)
+    cpu = sum(r["cpu"] for r in reports) / (cpu_count or _cpu_count())
+    lag = max((r["lag_p95"] for r in reports), default=0.0)
+    eou = max((r["eou_p95"] for r in reports), default=0.0)
+    ratios = {
+        "sessions": sessions / settings["max_sessions"],
+        "cpu": cpu / settings["cpu_budget"],
+        "lag": lag / settings["lag_budget"],
+        "eou": eou / settings["eou_budget"],
+    }
+    limit = max(ratios, key=ratios.get)
+    return {
+        "load": min(1.0, ratios[limit]),
+        "limit": limit,
+        "sessions": sessions,
+        "cpu": round(cpu, 3),
+        "lag_p95_ms": round(lag * 1000, 1),
+        "eou_p95_ms": round(eou * 1000, 1),
+        "inference_cpu": round(sum(sum(r["inference"].values()) for r in reports), 3),
+        "cpu_per_session": round(sum(r["cpu"] for r in reports) / sessions, 3) if sessions else None,
+    }
+
+
+def collect_latency(directory: Optional[str] = None, into: Optional[LatencyMetrics] = None) -> int:
+    """Merge and remove the latency reports job processes have left; returns how many were merged."""
+    into = into or get_worker_metrics()
+    merged = 0
+    for path in glob.glob(os.path.join(directory or _worker_dir(), "*.latency")):
+        try:
+            with open(path) as f:
+                report = json.load(f)
+            os.remove(path)
+        except (OSError, ValueError) as e:
+            print(f"[ERROR] Could not read latency report {path}: {e}")
+            continue
+        into.merge_report(report)
+        merged += 1
+    return merged
+
+
+_accepting = True
+
+
+def get_worker_load() -> float:
+    """load_fnc for WorkerOptions: runs in the worker process every half second."""
+    global _accepting
+    if collect_latency():
+        get_worker_metrics().export()
+    settings = load_settings()
+    state = compute_load(read_reports(), settings=settings)
+    accepting = state["load"] < settings["threshold"]
+    if accepting != _accepting:
+        _accepting = accepting
+        print(f"[METRICS] worker {'accepting' if accepting else 'full'} {json.dumps(state)}")
+    return state["load"]
+
+
+def worker_options() -> Dict[str, Any]:
+    """load_fnc / load_threshold for WorkerOptions; also points job processes at this worker's report dir."""
+    os.environ[WORKER_PID_ENV] = str(os.getpid())
+    # node_exporter would otherwise keep serving the series of workers that have exited
+    remove_stale_exports()
+    atexit.register(_remove_export)
+    return {"load_fnc": get_worker_load, "load_threshold": load_settings()["threshold"]}
+
+
+def _remove_export():
+    try:
+        os.remove(export_path())
+    except OSError:
+        pass
+
+
+_reporter: Optional[LoadReporter] = None
+
+
+def get_load_reporter() -> LoadReporter:
+    """The job process's load reporter."""
+    global _reporter
+    if _reporter is None:
+        _reporter = LoadReporter()
+    return _reporter